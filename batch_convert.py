@@ -0,0 +1,165 @@
+import argparse
+import glob
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from extract_twbx import get_directories
+from dataset_automate import process_twbx_file
+from output_sinks import SINKS, sink_option_names
+
+
+def collect_twbx_files(inputs, recursive=False):
+    """
+    Expands directories, glob patterns and file paths into a sorted list of .twbx files.
+    """
+    found = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, "**", "*.twbx") if recursive else os.path.join(item, "*.twbx")
+            found.extend(glob.glob(pattern, recursive=recursive))
+        elif any(ch in item for ch in "*?["):
+            found.extend(glob.glob(item, recursive=recursive))
+        elif os.path.isfile(item):
+            found.append(item)
+        else:
+            print(f"⚠ No such file or directory: {item}")
+    twbx_files = sorted({os.path.abspath(f) for f in found if f.lower().endswith(".twbx")})
+    return twbx_files
+
+
+def _workspaces(twbx_files, output_root):
+    """One output directory per workbook, named after it (suffixed if names collide)."""
+    workspaces = {}
+    used = set()
+    for twbx_file in twbx_files:
+        name = os.path.splitext(os.path.basename(twbx_file))[0]
+        candidate = name
+        counter = 1
+        while candidate.lower() in used:
+            candidate = f"{name}_{counter}"
+            counter += 1
+        used.add(candidate.lower())
+        workspaces[twbx_file] = os.path.join(output_root, candidate)
+    return workspaces
+
+
+def convert_workbook(twbx_file, workspace, options):
+    """
+    Runs process_twbx_file for one workbook inside its own workspace.
+
+    Returns:
+        dict with the workbook, status ('ok' or 'failed'), elapsed seconds,
+        the output path and the error message (if any).
+    """
+    extract_dir = os.path.join(workspace, "extracted")
+    # a clean extraction directory, so no leftovers from earlier runs are picked up
+    shutil.rmtree(extract_dir, ignore_errors=True)
+    start = time.perf_counter()
+    try:
+        output = process_twbx_file(twbx_file, output_dir=workspace, extract_dir=extract_dir, **options)
+        status, error = ("ok", "") if output else ("failed", "no output produced")
+    except Exception as e:
+        output, status, error = None, "failed", str(e)
+    return {
+        "workbook": twbx_file,
+        "status": status,
+        "seconds": time.perf_counter() - start,
+        "output": output,
+        "error": error,
+    }
+
+
+def run_batch(twbx_files, output_root, workers=None, **options):
+    """
+    Converts many workbooks across a process pool, each in an isolated workspace.
+
+    Args:
+        twbx_files: List of .twbx paths.
+        output_root: Directory that receives one workspace per workbook.
+        workers: Number of worker processes (None: one per CPU).
+        options: Extra keyword arguments for process_twbx_file.
+    Returns:
+        List of result dicts (see convert_workbook), in the order of twbx_files.
+    """
+    workspaces = _workspaces(twbx_files, output_root)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            (twbx_file, pool.submit(convert_workbook, twbx_file, workspaces[twbx_file], options))
+            for twbx_file in twbx_files
+        ]
+        for twbx_file, future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({
+                    "workbook": twbx_file, "status": "failed", "seconds": 0.0,
+                    "output": None, "error": str(e),
+                })
+    return results
+
+
+def print_results_table(results):
+    """Prints a per-workbook timing and status table."""
+    name_width = max([len("Workbook")] + [len(os.path.basename(r["workbook"])) for r in results])
+    print(f"\n{'Workbook':<{name_width}}  {'Status':<6}  {'Seconds':>8}  Details")
+    print(f"{'-' * name_width}  {'-' * 6}  {'-' * 8}  {'-' * 7}")
+    for r in results:
+        details = r["output"] if r["status"] == "ok" else r["error"]
+        print(f"{os.path.basename(r['workbook']):<{name_width}}  {r['status']:<6}  {r['seconds']:>8.1f}  {details}")
+    ok = sum(1 for r in results if r["status"] == "ok")
+    total_seconds = sum(r["seconds"] for r in results)
+    print(f"\n📊 {ok}/{len(results)} workbooks converted ({total_seconds:.1f}s of work).")
+
+
+def main(argv=None):
+    _, OUTPUT_DIR, _ = get_directories()
+    parser = argparse.ArgumentParser(description="Convert a batch of Tableau .twbx workbooks.")
+    parser.add_argument("inputs", nargs="+", help=".twbx files, directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", default=os.path.join(OUTPUT_DIR, "batch"),
+                        help="directory receiving one workspace per workbook")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="workbooks processed at once")
+    parser.add_argument("-r", "--recursive", action="store_true", help="search directories recursively")
+    parser.add_argument("--chunk-size", type=int, default=None, help="stream tables in chunks of this many rows")
+    parser.add_argument("--extract-backend", choices=["rows", "parquet", "arrow"], default="rows")
+    parser.add_argument("-f", "--format", choices=list(SINKS), default="excel", help="output format")
+    parser.add_argument("--compression", default=None, help="compression for parquet/csv/feather outputs")
+    parser.add_argument("--partition-by", default=None,
+                        help="comma-separated partition columns for partitioned-parquet output")
+    parser.add_argument("--incremental", action="store_true",
+                        help="update each workbook's previous output, recomputing only changed sheets")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and do not update the result cache")
+    parser.add_argument("--cache-dir", default=None, help="result cache location (default: output/cache)")
+    parser.add_argument("--cache-size", type=int, default=None, help="result cache size limit in MB")
+    args = parser.parse_args(argv)
+
+    sink_options = {}
+    if args.compression:
+        sink_options["compression"] = args.compression
+    if args.partition_by:
+        sink_options["partition_cols"] = [c.strip() for c in args.partition_by.split(",") if c.strip()]
+    flags = {"compression": "--compression", "partition_cols": "--partition-by"}
+    for name in sink_options:
+        if name not in sink_option_names(args.format):
+            parser.error(f"{flags[name]} is not supported with --format {args.format}")
+
+    twbx_files = collect_twbx_files(args.inputs, args.recursive)
+    if not twbx_files:
+        print("❌ No .twbx files found.")
+        return 1
+
+    print(f"🔹 Converting {len(twbx_files)} workbooks into {args.output_dir}")
+    results = run_batch(
+        twbx_files, args.output_dir, args.workers,
+        chunk_size=args.chunk_size, extract_backend=args.extract_backend,
+        output_format=args.format, sink_options=sink_options,
+        incremental=args.incremental, use_cache=not args.no_cache, cache_dir=args.cache_dir,
+        cache_size=args.cache_size * 1024 ** 2 if args.cache_size else None,
+    )
+    print_results_table(results)
+    return 0 if all(r["status"] == "ok" for r in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+from tableau_formula import compile_formula
+
+
+def field_aliases(fields):
+    """
+    Maps the internal name of each calculated field (e.g. Calculation_123,
+    its 'name' without brackets) to its caption, the column it is stored in.
+    Formulas refer to other calculated fields by their internal name.
+    """
+    aliases = {}
+    for caption, details in fields.items():
+        name = (details.get("name") or "").strip()
+        if name.startswith("[") and name.endswith("]"):
+            name = name[1:-1].replace("]]", "]")
+        if name and name != caption:
+            aliases[name] = caption
+    return aliases
+
+
+def build_calc_graph(fields, available_columns):
+    """
+    Builds the dependency graph of calculated fields from their [Field] references.
+
+    Args:
+        fields: dict mapping field name (caption) to details (with a 'formula'
+            key, and the internal 'name' other formulas may refer to it by).
+        available_columns: Columns already present in the table.
+    Returns:
+        levels: list of lists of field names; every field only depends on input
+            columns or on fields in earlier levels, so a level can run concurrently.
+        dependencies: dict mapping field name to the calculated fields it uses.
+        problems: dict mapping field name to the reason it can't be evaluated
+            (syntax error, missing input, dependency cycle, or a broken dependency).
+    """
+    available = set(available_columns)
+    dependencies = {}
+    problems = {}
+    # Field references ignore case, as in Tableau; calculated fields win over
+    # columns, and may also be named by their internal name (see field_aliases)
+    aliases = {name.lower(): caption for name, caption in field_aliases(fields).items()}
+    by_lower = {}
+    for column in list(fields) + list(available_columns):
+        by_lower.setdefault(str(column).lower(), column)
+
+    for name, details in fields.items():
+        formula = details.get("formula") or ""
+        if not formula.strip():
+            dependencies[name] = set()
+            continue
+        try:
+            references = compile_formula(formula).references
+        except ValueError as e:
+            problems[name] = f"invalid formula: {e}"
+            continue
+        deps = set()
+        missing = []
+        for ref in references:
+            if ref in fields or ref in available:
+                target = ref
+            else:
+                target = aliases.get(ref.lower()) or by_lower.get(ref.lower())
+            if target in fields and target != name:
+                deps.add(target)
+            elif target is None:
+                missing.append(ref)
+        if missing:
+            problems[name] = f"missing input(s): {', '.join(missing)}"
+        else:
+            dependencies[name] = deps
+
+    # Kahn's algorithm, one level per round
+    dependents = {name: [] for name in fields}
+    pending = {}
+    for name, deps in dependencies.items():
+        pending[name] = len(deps)
+        for dep in deps:
+            dependents[dep].append(name)
+
+    levels = []
+    ready = [name for name in dependencies if pending[name] == 0]
+    done = set()
+    while ready:
+        levels.append(ready)
+        done.update(ready)
+        next_ready = []
+        for name in ready:
+            for dependent in dependents[name]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    next_ready.append(dependent)
+        ready = next_ready
+
+    # Anything left either sits on a cycle or depends on a field that can't run
+    remaining = [name for name in dependencies if name not in done]
+    cyclic = [name for name in remaining if _reaches_itself(name, dependencies, done)]
+    for name in cyclic:
+        problems[name] = f"dependency cycle among: {', '.join(sorted(cyclic))}"
+    for name in remaining:
+        if name not in cyclic:
+            bad = sorted(dep for dep in dependencies[name] if dep not in done)
+            problems[name] = f"depends on unavailable field(s): {', '.join(bad)}"
+
+    return levels, {name: dependencies.get(name, set()) for name in fields}, problems
+
+
+def _reaches_itself(start, dependencies, done):
+    stack = [dep for dep in dependencies[start] if dep not in done]
+    seen = set()
+    while stack:
+        name = stack.pop()
+        if name == start:
+            return True
+        if name in seen or name not in dependencies:
+            continue
+        seen.add(name)
+        stack.extend(dep for dep in dependencies[name] if dep not in done)
+    return False
@@ -1,209 +1,127 @@
 import os
-import re
 import pandas as pd
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from extract_twbx import extract_twbx, get_directories
-from find_table_names import find_table_names
-from find_hyper_files import find_hyper_files, list_tables_in_hyper
-from extract_hyper_to_excel import extract_hyper_to_excel_direct
-from write_to_excel import write_dataframes_to_excel
-
-
-try:
-    from tableauhyperapi import Timestamp as HyperTimestamp
-except ImportError:
-    HyperTimestamp = ()
-
-
-
-def preprocess_formula(formula):
+from find_table_names import find_table_names, build_field_index
+from find_hyper_files import list_tables_in_hyper
+from extract_hyper_to_excel import extract_hyper_to_excel_direct, extract_hyper_chunks, extract_hyper_files_parallel
+from write_to_excel import patch_excel_sheets
+from output_sinks import write_outputs, output_path_for, remove_tables
+from hyper_session import close_hyper_connection
+import result_cache
+from tableau_formula import compile_formula, formula_cache_info, ROW_GLOBALS, VECTOR_GLOBALS
+from calc_graph import build_calc_graph, field_aliases
+
+
+def evaluate_tableau_formula(df, formula, field_name, fallbacks=None, verbose=True, aliases=None):
     """
-    1) Collapse whitespace  
-    2) TODAY() → NOW() → pd.Timestamp("today")  
-    3) Ensure INDEX() becomes INDEX(row)
+    Evaluates a Tableau formula over df and returns the values for field_name.
+
+    The formula is parsed and compiled once (see tableau_formula.compile_formula).
+    Its column-wise form runs over the whole DataFrame when the vectorizer supports
+    every construct in it; otherwise the row-wise form is eval'd row by row.
+    Fields that fell back are appended to `fallbacks` as (field_name, reason).
+    aliases maps other names of fields (see calc_graph.field_aliases) to their columns.
+    Raises on formulas that can't be parsed or evaluated.
     """
-    if not formula:
+    # empty formula → blank column
+    if not formula or not formula.strip():
         return ""
-    # collapse all runs of whitespace
-    formula = " ".join(formula.split())
-    # Tableau TODAY() → NOW() → pandas Timestamp
-    formula = re.sub(r'TODAY\(\)', 'NOW()', formula, flags=re.IGNORECASE)
-    formula = re.sub(r'NOW\(\)', 'pd.Timestamp("today")', formula, flags=re.IGNORECASE)
-    # make INDEX() call pass the row
-    formula = re.sub(r'\bINDEX\(\)', 'INDEX(row)', formula, flags=re.IGNORECASE)
-    return formula
-
-
-def transform_if_then_else(formula):
-    """
-    Turn IF … THEN … ELSEIF … THEN … ELSE … END
-    into nested Python ternaries.
-    """
-    # normalize keywords
-    f = re.sub(r'\belseif\b', 'ELSEIF', formula, flags=re.IGNORECASE)
-    f = re.sub(r'\bif\b',     'IF',     f, flags=re.IGNORECASE)
-    f = re.sub(r'\bthen\b',   'THEN',   f, flags=re.IGNORECASE)
-    f = re.sub(r'\belse\b',   'ELSE',   f, flags=re.IGNORECASE)
-    f = re.sub(r'\bend\b',    'END',    f, flags=re.IGNORECASE)
-
-    # capture the IF, any ELSEIFs, optional ELSE, then END
-    pattern = re.compile(
-        r'IF\s+(.+?)\s+THEN\s+(.+?)'               # IF cond THEN expr
-        r'(?:\s+ELSEIF\s+(.+?)\s+THEN\s+(.+?))*'   # 0+ ELSEIF blocks
-        r'(?:\s+ELSE\s+(.+?))?'                    # optional ELSE
-        r'\s+END',                                 # END
-        flags=re.DOTALL
-    )
-    m = pattern.search(f)
-    if not m:
-        return formula
-
-    # first IF
-    conds = [(m.group(1).strip(), m.group(2).strip())]
-    # then any ELSEIFs
-    elseif_matches = re.findall(
-        r'ELSEIF\s+(.+?)\s+THEN\s+(.+?)(?=\s+ELSEIF|\s+ELSE|\s+END)',
-        f, flags=re.DOTALL
-    )
-    for c, e in elseif_matches:
-        conds.append((c.strip(), e.strip()))
-    # final ELSE (if present)
-    final_else = m.group(5).strip() if m.group(5) else "None"
 
-    # build nested Python expression
-    expr = final_else
-    for cond, res in reversed(conds):
-        expr = f"({res} if {cond} else {expr})"
-    return expr
-
-
-
-# helpers to compare possibly-mixed datetime types
-def LT(a, b):
-    return pd.to_datetime(str(a), errors='coerce') <  pd.to_datetime(str(b), errors='coerce')
-
-def LTE(a, b):
-    return pd.to_datetime(str(a), errors='coerce') <= pd.to_datetime(str(b), errors='coerce')
-
-def GT(a, b):
-    return pd.to_datetime(str(a), errors='coerce') >  pd.to_datetime(str(b), errors='coerce')
-
-def GTE(a, b):
-    return pd.to_datetime(str(a), errors='coerce') >= pd.to_datetime(str(b), errors='coerce')
-
-
-def DATEDIFF(part, start, end):
-    """
-    Works even if start/end are tableauhyperapi.Timestamp.
-    """
-    # coerce any HyperTimestamp (or string) into pandas.Timestamp
-    start = pd.to_datetime(str(start), errors='coerce')
-    end   = pd.to_datetime(str(end),   errors='coerce')
-
-    p = part.lower()
-    if p == 'year':
-        return end.year - start.year
-    if p == 'month':
-        return (end.year - start.year) * 12 + (end.month - start.month)
-    if p == 'day':
-        return (end - start).days
-    if p == 'hour':
-        return (end - start).total_seconds() / 3600
-    return None
-
-
-def DATEPART(part, dt):
-    """
-    Works even if dt is tableauhyperapi.Timestamp.
-    """
-    # coerce into pandas.Timestamp
-    dt = pd.to_datetime(str(dt), errors='coerce')
-    p = part.lower()
-    if p == 'year':    return dt.year
-    if p == 'month':   return dt.month
-    if p == 'day':     return dt.day
-    if p == 'quarter': return (dt.month - 1) // 3 + 1
-    if p == 'weekday': return dt.dayofweek
-    return None
-
-
-def apply_tableau_formula(df, formula, field_name):
+    compiled = compile_formula(formula, df.columns, aliases)
+
+    # evaluate over whole columns when possible
+    reason = compiled.vector_error
+    if compiled.vector_code is not None:
+        try:
+            result = eval(compiled.vector_code, VECTOR_GLOBALS, {"row": df})
+            if isinstance(result, pd.Series) and len(result) != len(df):
+                raise ValueError("result length does not match the table")
+            return result
+        except Exception as e:
+            reason = str(e)
+    if fallbacks is not None:
+        fallbacks.append((field_name, reason))
+    if verbose:
+        print(f"  ↩️ Falling back to row-wise evaluation for '{field_name}': {reason}")
+
+    # apply row‑by‑row
+    return df.apply(lambda row: eval(compiled.row_code, ROW_GLOBALS, {"row": row}), axis=1)
+
+
+def apply_tableau_formula(df, formula, field_name, fallbacks=None):
+    """Evaluates a Tableau formula into df[field_name]; returns True on success."""
     try:
-        # 1) normalize TODAY()/INDEX()
-        formula = preprocess_formula(formula)
-
-        # 2) handle IF/ELSEIF/ELSE/END
-        if "IF" in formula and "THEN" in formula and "END" in formula:
-            formula = transform_if_then_else(formula)
-
-        # 3) turn [Field] into row["Field"]
-        formula = translate_tableau_formula(formula)
-
-        # 4) wrap any direct date comparisons against "today"
-        formula = re.sub(
-            r'row\["([^"]+)"\]\s*<\s*pd\.Timestamp\("today"\)',
-            r'LT(row["\1"], pd.Timestamp("today"))',
-            formula
-        )
-        formula = re.sub(
-            r'row\["([^"]+)"\]\s*<=\s*pd\.Timestamp\("today"\)',
-            r'LTE(row["\1"], pd.Timestamp("today"))',
-            formula
-        )
-        formula = re.sub(
-            r'row\["([^"]+)"\]\s*>\s*pd\.Timestamp\("today"\)',
-            r'GT(row["\1"], pd.Timestamp("today"))',
-            formula
-        )
-        formula = re.sub(
-            r'row\["([^"]+)"\]\s*>=\s*pd\.Timestamp\("today"\)',
-            r'GTE(row["\1"], pd.Timestamp("today"))',
-            formula
-        )
-
-        # 5) literal min/max → number
-        formula = re.sub(r'min\(([-0-9\.]+)\)', r'\1', formula, flags=re.IGNORECASE)
-        formula = re.sub(r'max\(([-0-9\.]+)\)', r'\1', formula, flags=re.IGNORECASE)
-
-        # empty formula → blank column
-        if not formula.strip():
-            df[field_name] = ""
-            return True
-
-        safe_globals = {
-            "pd": pd,
-            "DATEDIFF": DATEDIFF,
-            "DATEPART": DATEPART,
-            "ISNULL": ISNULL,
-            "INDEX": lambda row: row.name + 1,
-            "LT": LT,
-            "LTE": LTE,
-            "GT": GT,
-            "GTE": GTE,
-        }
-
-        # 6) apply row‑by‑row
-        df[field_name] = df.apply(lambda row: eval(formula, safe_globals, {"row": row}), axis=1)
+        df[field_name] = evaluate_tableau_formula(df, formula, field_name, fallbacks)
         return True
-
     except Exception as e:
         print(f"  ❌ Error applying formula '{formula}' to field '{field_name}': {e}")
         return False
 
 
-def translate_tableau_formula(formula):
-    return re.sub(r'\[([^\]]+)\]', r'row["\1"]', formula)
-
-
-def ISNULL(x):
-    return pd.isna(x)
-
-def INDEX(row_index):
-    return row_index + 1
-
-
-
+def apply_calculated_fields(df, fields, stats, fallbacks=None, max_workers=None, verbose=True):
+    """
+    Applies calculated fields to df in dependency order.
 
+    The dependency graph is built once from the [Field] references; missing inputs
+    and cycles are reported before anything runs. Fields at the same depth are
+    evaluated concurrently in a thread pool and assigned once the level finishes.
 
+    Args:
+        df: DataFrame to add the calculated columns to.
+        fields: dict mapping field name to details (with a 'formula' key).
+        stats: dict with 'applied', 'failed' and 'total' counters to update.
+        fallbacks: Optional list collecting fields evaluated row by row.
+        max_workers: Thread pool size (None lets the executor decide).
+        verbose: Print per-field progress (errors are always printed).
+    Returns:
+        Set of field names that were applied.
+    """
+    levels, dependencies, problems = build_calc_graph(fields, df.columns)
+    stats["total"] += len(fields)
+
+    if problems and verbose:
+        print(f"  ⚠️ {len(problems)} calculated fields can't be evaluated:")
+        for field_name, reason in problems.items():
+            print(f"    - {field_name}: {reason}")
+    stats["failed"] += len(problems)
+
+    aliases = field_aliases(fields)
+    applied = set()
+    failed = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for depth, level in enumerate(levels, start=1):
+            futures = {}
+            for field_name in level:
+                broken = dependencies[field_name] & failed
+                if broken:
+                    print(f"  ⚠️ Skipping '{field_name}': depends on failed field(s) {', '.join(sorted(broken))}")
+                    failed.add(field_name)
+                    stats["failed"] += 1
+                    continue
+                if verbose:
+                    print(f"  🔄 Applying '{field_name}' calculation (depth {depth})")
+                futures[field_name] = pool.submit(
+                    evaluate_tableau_formula, df, fields[field_name]["formula"], field_name, fallbacks, verbose, aliases
+                )
+            # Wait for the whole level before assigning, so no field of the
+            # level reads df while another one is being added to it
+            results = {}
+            for field_name, future in futures.items():
+                try:
+                    results[field_name] = future.result()
+                except Exception as e:
+                    print(f"  ❌ Error applying formula '{fields[field_name]['formula']}' to field '{field_name}': {e}")
+                    failed.add(field_name)
+                    stats["failed"] += 1
+            for field_name, result in results.items():
+                df[field_name] = result
+                applied.add(field_name)
+                stats["applied"] += 1
+                if verbose:
+                    print(f"  ✅ Successfully applied '{field_name}' calculation")
+    return applied
 
 
 def ensure_unique_column_names(df):
@@ -235,21 +153,199 @@ def ensure_unique_column_names(df):
     return df
 
 
-def process_twbx_file(twbx_file):
-    """Orchestrates the full process from extraction to Excel with calculated fields."""
-    BASE_DIR, OUTPUT_DIR, _ = get_directories()
-    MSCRIPT_FILE = os.path.join(OUTPUT_DIR, "powerbi_mscript.txt")
-    CALC_FIELDS_FILE = os.path.join(OUTPUT_DIR, "calculated_fields.txt")
+def _fields_for_sheet(sheet_name, calculated_fields, param_fields):
+    """
+    Finds the datasource matching a sheet and its calculated fields,
+    skipping pure parameter fields. Returns (matching_ds, fields_to_apply).
+    """
+    # find matching datasource
+    matching_ds = None
+    for ds in calculated_fields:
+        if ds == sheet_name or ds in sheet_name or sheet_name in ds:
+            matching_ds = ds
+            break
+    if not matching_ds:
+        return None, {}
+
+    # filter out pure parameter fields
+    fields_to_apply = {
+        fn: details
+        for fn, details in calculated_fields[matching_ds].items()
+        if fn not in param_fields
+    }
+    return matching_ds, fields_to_apply
+
+
+def _report_unapplied(fields_to_apply, applied_fields):
+    unapplied = set(fields_to_apply) - applied_fields
+    if unapplied:
+        print(f"\n⚠️ Could not apply {len(unapplied)} calculated fields:")
+        for f in unapplied:
+            print(f"  - {f}")
+
+
+def _print_calculated_field_summary(calculated_field_stats, row_wise_fallbacks):
+    print(f"\n📊 Calculated fields summary:")
+    print(f"  - Total: {calculated_field_stats['total']}")
+    print(f"  - Applied: {calculated_field_stats['applied']}")
+    print(f"  - Failed: {calculated_field_stats['failed']}")
+    print(f"  - Row-wise fallback: {len(row_wise_fallbacks)}")
+    for field_name, reason in row_wise_fallbacks:
+        print(f"    - {field_name}: {reason}")
+    cache = formula_cache_info()
+    print(f"  - Formula cache: {cache.hits} hits, {cache.misses} misses ({cache.currsize}/{cache.maxsize} cached)")
+
+
+def _stream_sheet(sheet_name, chunks, fields_to_apply, matching_ds, stats, fallbacks, calc_workers, sheet_heads):
+    """
+    Applies calculated fields and unique column names to each chunk of a sheet.
+
+    The first chunk is processed like a full table (and reported); later chunks
+    reuse the fields that succeeded and the column names chosen for the first.
+    The first row of the first chunk is stored in sheet_heads for the metadata.
+    """
+    applied_fields = None
+    source_columns = None
+    columns = None
+    for chunk in chunks:
+        if fields_to_apply:
+            if applied_fields is None:
+                print(f"\n📊 Applying calculated fields to '{sheet_name}' (matched with '{matching_ds}')")
+                applied_fields = apply_calculated_fields(chunk, fields_to_apply, stats, fallbacks, calc_workers)
+                _report_unapplied(fields_to_apply, applied_fields)
+            else:
+                chunk_stats = {"applied": 0, "failed": 0, "total": 0}
+                fields = {fn: fields_to_apply[fn] for fn in applied_fields}
+                apply_calculated_fields(chunk, fields, chunk_stats, None, calc_workers, verbose=False)
+        if columns is None:
+            source_columns = list(chunk.columns)
+            chunk = ensure_unique_column_names(chunk)
+            columns = list(chunk.columns)
+            sheet_heads[sheet_name] = chunk.head(1)
+        else:
+            # Same columns, in the same order, as the first chunk; a field that
+            # failed on this chunk (or depends on one that did) is left empty
+            chunk = chunk.reindex(columns=source_columns)
+            chunk.columns = columns
+        yield chunk
+
+
+def describe_columns(df):
+    """[column, dtype, sample value] for each column of df (or of its first rows)."""
+    return [
+        [col, str(df[col].dtype), str(df[col].iloc[0]) if not df.empty else '']
+        for col in df.columns
+    ]
+
+
+def build_column_metadata(sheet_columns, field_index):
+    """
+    Builds the Column_Metadata sheet.
+
+    Args:
+        sheet_columns: dict mapping sheet name to its describe_columns() list.
+        field_index: Calculated fields by caption (see build_field_index).
+    """
+    column_metadata = []
+    for name, columns in sheet_columns.items():
+        for col, dtype, sample in columns:
+            is_calc = col in field_index
+            formula_text = field_index[col]['formula'] if is_calc else ""
+            column_metadata.append({
+                'Sheet': name,
+                'Column': col,
+                'Data Type': dtype,
+                'Sample Value': sample,
+                'Is Calculated': 'Yes' if is_calc else 'No',
+                'Formula': formula_text
+            })
+    return pd.DataFrame(column_metadata)
+
+
+def _lazy_column_metadata(sheet_heads, field_index):
+    # Runs when the writer reaches Column_Metadata, after every sheet streamed
+    yield build_column_metadata(
+        {name: describe_columns(df) for name, df in sheet_heads.items()}, field_index
+    )
+
+
+def _load_chunks(sheet_name, chunks, table_loader):
+    # Hands each chunk to the table loader as the writer (or a drain) pulls it
+    for chunk in chunks:
+        table_loader(sheet_name, chunk)
+        yield chunk
+
+
+def _sheet_fingerprint(hyper_key, sheet_name, calculated_fields, param_fields):
+    _, fields_to_apply = _fields_for_sheet(sheet_name, calculated_fields, param_fields)
+    return result_cache.sheet_fingerprint(hyper_key, sheet_name, fields_to_apply)
+
+
+def _unchanged_hyper_files(manifest, hyper_keys, table_mapping, calculated_fields, param_fields):
+    """
+    .hyper files from the previous run whose content and sheet naming are the
+    same and whose sheets all keep their calculated fields; none of their
+    sheets needs recomputing.
+    """
+    unchanged = set()
+    for hyper_filename, entry in manifest["hyper"].items():
+        if hyper_keys.get(hyper_filename) != entry["key"]:
+            continue
+        if table_mapping.get(hyper_filename) != entry["mapped_name"]:
+            continue
+        if all(
+            manifest["sheets"].get(name, {}).get("fingerprint")
+            == _sheet_fingerprint(entry["key"], name, calculated_fields, param_fields)
+            for name in entry["sheets"]
+        ):
+            unchanged.add(hyper_filename)
+    return unchanged
+
+
+# Options of one process_twbx_file run, handed to its stages
+RunSettings = namedtuple("RunSettings", [
+    "calc_workers", "chunk_size", "extract_backend", "extract_workers", "extract_dir",
+    "use_cache", "cache_dir", "output_format", "sink_options", "table_loader",
+])
 
-    # Step 1: Extract the .twbx file
-    extract_twbx(twbx_file)
+# What the workbook's .twb describes: table naming and calculated fields
+WorkbookMetadata = namedtuple("WorkbookMetadata", [
+    "table_mapping", "table_names", "calculated_fields", "field_index", "param_fields",
+])
 
-    # Step 2: Extract dataset names, table names, and calculated fields
-    table_mapping, table_names, calculated_fields = find_table_names()
-    # Identify and skip pure parameter fields (they just echo the parameter)
-    param_fields = set(calculated_fields.get("Parameters", {}).keys())
+# Sheets read from the .hyper files (see _extract_sheets): data by sheet name,
+# the .hyper file each comes from, their fingerprints, the sheets kept as they
+# are in the previous output, and the unpacked .hyper file paths
+ExtractedSheets = namedtuple("ExtractedSheets", ["data", "sources", "fingerprints", "reused", "hyper_files"])
+
+
+def _read_workbook_metadata(twbx_file, use_cache, cache_dir):
+    """
+    Reads dataset names, table names and calculated fields from the .twb inside
+    the archive (nothing is unpacked for this), or from the cache.
+    """
+    metadata = None
+    if use_cache:
+        twb_key = result_cache.twb_hash(twbx_file)
+        metadata = result_cache.load_metadata(twb_key, cache_dir)
+    if metadata is not None:
+        print(f"♻ Reusing cached workbook metadata for {twbx_file}")
+        table_mapping, table_names, calculated_fields = metadata
+    else:
+        table_mapping, table_names, calculated_fields = find_table_names(twbx_file)
+        if use_cache and (table_mapping or table_names or calculated_fields):
+            result_cache.store_metadata(twb_key, (table_mapping, table_names, calculated_fields), cache_dir)
+    return WorkbookMetadata(
+        table_mapping, table_names, calculated_fields,
+        # Calculated fields by caption, for O(1) "is this column calculated?" lookups
+        build_field_index(calculated_fields),
+        # Pure parameter fields just echo the parameter; they are skipped
+        set(calculated_fields.get("Parameters", {}).keys()),
+    )
 
-    with open(CALC_FIELDS_FILE, 'w', encoding='utf-8') as f:
+
+def _write_calculated_fields(path, calculated_fields):
+    with open(path, 'w', encoding='utf-8') as f:
         f.write("# Tableau Calculated Fields\n\n")
         for datasource, fields in calculated_fields.items():
             f.write(f"## Datasource: {datasource}\n\n")
@@ -257,150 +353,411 @@ def process_twbx_file(twbx_file):
                 f.write(f"### {field_name}\n")
                 f.write(f"Formula: {details['formula']}\n")
                 f.write(f"Type: {details.get('datatype', 'Unknown')}\n\n")
-    print(f"✅ Saved calculated field definitions to {CALC_FIELDS_FILE}")
+    print(f"✅ Saved calculated field definitions to {path}")
+
+
+def _plan_incremental(twbx_file, settings, workbook, output_path, hyper_keys):
+    """
+    For an incremental run, the previous run's manifest and the .hyper files
+    whose content, naming and calculated fields are unchanged (none of their
+    sheets is touched); (None, set()) for a full run.
+    """
+    if settings.table_loader is not None or output_path is None:
+        print("⚠ Incremental mode does not apply when loading tables or writing no output; doing a full run.")
+        return None, set()
+    if settings.chunk_size:
+        return None, set()
+    manifest = result_cache.load_manifest(output_path)
+    if manifest is None:
+        print(f"⚠ No previous output to update for {twbx_file}; doing a full run.")
+        return None, set()
+    unchanged_files = _unchanged_hyper_files(
+        manifest, hyper_keys, workbook.table_mapping, workbook.calculated_fields, workbook.param_fields
+    )
+    print(f"🔁 Incremental run: {len(unchanged_files)} of {len(hyper_keys)} .hyper files unchanged.")
+    return manifest, unchanged_files
+
 
-    # Step 3: Find .hyper files
-    hyper_files = find_hyper_files()
-    if not hyper_files:
+def _extract_sheets(twbx_file, settings, workbook, hyper_keys, cached_tables, manifest, unchanged_files, export_root):
+    """
+    Unpacks the .hyper files still needed and reads their tables: from the
+    table cache, from the previous output (unchanged files of an incremental
+    run), or from Hyper (whole, in worker processes, or as chunk generators
+    when streaming). Returns ExtractedSheets, or None when there is no data.
+    """
+    # Unpack only the .hyper files (images and other assets stay in the archive)
+    hyper_files = extract_twbx(twbx_file, settings.extract_dir, skip=set(cached_tables) | unchanged_files)
+    if not hyper_files and not cached_tables and not unchanged_files:
         print(f"❌ No .hyper files found in {twbx_file}. Skipping extraction...")
-        return
+        return None
     all_tables = []
-    for hyper_filename, hyper_file_path in hyper_files.items():
-        tables = list_tables_in_hyper(hyper_file_path)
-        all_tables.extend(tables)
+    for hyper_file_path in hyper_files.values():
+        all_tables.extend(list_tables_in_hyper(hyper_file_path))
     print("\n📊 Extracted Table Names from .hyper files:")
     for table in all_tables:
         print(f" - {table}")
 
-    # Step 4: Extract data from each .hyper file
+    # In streaming mode only the catalog is read here; the data follows when written
+    chunk_size = settings.chunk_size
     combined_sheet_data = {}
-    for hyper_filename, hyper_file_path in hyper_files.items():
-        sheet_data = extract_hyper_to_excel_direct(hyper_file_path, hyper_filename)
-        if hyper_filename in table_mapping:
-            mapped_name = table_mapping[hyper_filename]
+    sheet_sources = {}   # sheet name -> .hyper file it comes from, in sheet order
+    fingerprints = {}    # sheet name -> fingerprint of its data and calculated fields
+    reused_sheets = []   # sheets kept as they are in the previous workbook
+    parallel = (not chunk_size and settings.extract_workers and settings.extract_workers > 1
+                and len(hyper_files) > 1)
+    if parallel:
+        # the workers open their own connections; release the listing ones
+        for hyper_file_path in hyper_files.values():
+            close_hyper_connection(hyper_file_path)
+        extracted = extract_hyper_files_parallel(
+            hyper_files, settings.extract_workers, settings.extract_backend, export_root
+        )
+    for hyper_filename in hyper_keys:
+        hyper_file_path = hyper_files.get(hyper_filename)
+        if hyper_filename in unchanged_files:
+            for sheet_name in manifest["hyper"][hyper_filename]["sheets"]:
+                sheet_sources[sheet_name] = hyper_filename
+                fingerprints[sheet_name] = manifest["sheets"][sheet_name]["fingerprint"]
+                reused_sheets.append(sheet_name)
+            continue
+        if hyper_filename in cached_tables:
+            sheet_data = cached_tables[hyper_filename]
+        elif hyper_file_path is None:
+            continue
+        elif chunk_size:
+            sheet_data = extract_hyper_chunks(hyper_file_path, hyper_filename, chunk_size)
+        else:
+            if parallel:
+                sheet_data = extracted[hyper_filename]
+            else:
+                sheet_data = extract_hyper_to_excel_direct(
+                    hyper_file_path, hyper_filename, settings.extract_backend,
+                    os.path.join(export_root, os.path.splitext(hyper_filename)[0])
+                )
+                # listing and extraction are done with this file; release it
+                close_hyper_connection(hyper_file_path)
+            if settings.use_cache and sheet_data:
+                result_cache.store_tables(
+                    result_cache.tables_key(hyper_keys[hyper_filename], settings.extract_backend),
+                    sheet_data, settings.cache_dir
+                )
+        if hyper_filename in workbook.table_mapping:
+            mapped_name = workbook.table_mapping[hyper_filename]
             if "Extract" in sheet_data:
                 sheet_data[mapped_name] = sheet_data.pop("Extract")
             else:
                 sheet_data = {mapped_name: df for _, df in sheet_data.items()}
+        for sheet_name in sheet_data:
+            sheet_sources[sheet_name] = hyper_filename
+            fingerprints[sheet_name] = _sheet_fingerprint(
+                hyper_keys[hyper_filename], sheet_name, workbook.calculated_fields, workbook.param_fields
+            )
+            # re-extracted, but its data and calculated fields did not change
+            previous = manifest["sheets"].get(sheet_name) if manifest is not None else None
+            if previous is not None and previous["fingerprint"] == fingerprints[sheet_name]:
+                reused_sheets.append(sheet_name)
         combined_sheet_data.update(sheet_data)
-    if not combined_sheet_data:
+    for sheet_name in reused_sheets:
+        combined_sheet_data.pop(sheet_name, None)
+    if not combined_sheet_data and not reused_sheets:
         print("❌ No data extracted from any .hyper file.")
-        return
+        return None
+    return ExtractedSheets(combined_sheet_data, sheet_sources, fingerprints, reused_sheets, hyper_files)
 
-    # Step 5: Apply calculated fields where applicable, skipping parameter-only fields
-    calculated_field_stats = {"applied": 0, "failed": 0, "total": 0}
-    for sheet_name, df in combined_sheet_data.items():
-        # find matching datasource
-        matching_ds = None
-        for ds in calculated_fields:
-            if ds == sheet_name or ds in sheet_name or sheet_name in ds:
-                matching_ds = ds
-                break
-        if not matching_ds:
-            continue
 
-        # filter out pure parameter fields
-        fields_to_apply = {
-            fn: details
-            for fn, details in calculated_fields[matching_ds].items()
-            if fn not in param_fields
-        }
+def _apply_sheet_calculations(sheet_data, settings, workbook, stats, fallbacks):
+    """
+    Applies the calculated fields (skipping parameter-only ones) to every sheet
+    and makes column names unique. Streamed sheets are wrapped in generators
+    that do this chunk by chunk as they are written.
+    Returns the first rows of each sheet (whole tables unless streaming), by sheet name.
+    """
+    sheet_heads = {}
+    for sheet_name, df in sheet_data.items():
+        matching_ds, fields_to_apply = _fields_for_sheet(
+            sheet_name, workbook.calculated_fields, workbook.param_fields
+        )
+        if settings.chunk_size:
+            sheet_data[sheet_name] = _stream_sheet(
+                sheet_name, df, fields_to_apply, matching_ds, stats, fallbacks, settings.calc_workers, sheet_heads
+            )
+            continue
         if not fields_to_apply:
             continue
 
         print(f"\n📊 Applying calculated fields to '{sheet_name}' (matched with '{matching_ds}')")
-        applied_fields = set()
-        max_iterations = 3
-
-        for iteration in range(max_iterations):
-            applied_in_iteration = 0
-            for field_name, details in fields_to_apply.items():
-                if field_name in applied_fields:
-                    continue
-                calculated_field_stats["total"] += 1
-                formula = details["formula"]
-                required = re.findall(r'\[([^\]]+)\]', formula)
-                if not required or all(col in df.columns for col in required):
-                    print(f"  🔄 Applying '{field_name}' calculation (iteration {iteration+1})")
-                    success = apply_tableau_formula(df, formula, field_name)
-                    if success:
-                        applied_fields.add(field_name)
-                        applied_in_iteration += 1
-                        calculated_field_stats["applied"] += 1
-                        print(f"  ✅ Successfully applied '{field_name}' calculation")
-                    else:
-                        calculated_field_stats["failed"] += 1
-                        print(f"  ⚠️ Could not apply '{field_name}' calculation")
-            if applied_in_iteration == 0:
-                break
-
-        unapplied = set(fields_to_apply) - applied_fields
-        if unapplied:
-            print(f"\n⚠️ Could not apply {len(unapplied)} calculated fields:")
-            for f in unapplied:
-                print(f"  - {f}")
-
-    print(f"\n📊 Calculated fields summary:")
-    print(f"  - Total: {calculated_field_stats['total']}")
-    print(f"  - Applied: {calculated_field_stats['applied']}")
-    print(f"  - Failed: {calculated_field_stats['failed']}")
-
-    # Step 5.5: Ensure unique column names (case-insensitive)
-    for name, df in combined_sheet_data.items():
+        applied_fields = apply_calculated_fields(df, fields_to_apply, stats, fallbacks, settings.calc_workers)
+        _report_unapplied(fields_to_apply, applied_fields)
+
+    if settings.chunk_size:
+        return sheet_heads
+    _print_calculated_field_summary(stats, fallbacks)
+    # Ensure unique column names (case-insensitive)
+    for name, df in sheet_data.items():
         if name != 'Column_Metadata':
-            combined_sheet_data[name] = ensure_unique_column_names(df)
+            sheet_data[name] = ensure_unique_column_names(df)
+    return dict(sheet_data)
 
-    # Step 6: Create a metadata sheet
-    column_metadata = []
-    for name, df in combined_sheet_data.items():
-        for col in df.columns:
-            is_calc = any(col in fields for fields in calculated_fields.values())
-            formula_text = ""
-            for fields in calculated_fields.values():
-                if col in fields:
-                    formula_text = fields[col]['formula']
-                    break
-            column_metadata.append({
-                'Sheet': name,
-                'Column': col,
-                'Data Type': str(df[col].dtype),
-                'Sample Value': str(df[col].iloc[0]) if not df.empty else '',
-                'Is Calculated': 'Yes' if is_calc else 'No',
-                'Formula': formula_text
-            })
-    metadata_df = pd.DataFrame(column_metadata)
-    combined_sheet_data['Column_Metadata'] = metadata_df
 
-    # Step 7: Write to Excel
-    base_name = os.path.splitext(os.path.basename(twbx_file))[0]
-    excel_path = os.path.join(OUTPUT_DIR, f"{base_name}.xlsx")
-    sheet_names = write_dataframes_to_excel(combined_sheet_data, excel_path)
-    print(f"\n✅ All data combined into {excel_path} with {len(sheet_names)} sheets.")
+def _hand_to_loader(sheet_data, table_loader):
+    # Whole tables go to the loader now, streamed ones chunk by chunk as they are pulled
+    for name, data in sheet_data.items():
+        if isinstance(data, pd.DataFrame):
+            table_loader(name, data)
+        else:
+            sheet_data[name] = _load_chunks(name, data, table_loader)
 
-    # Step 8: Write column summary text file
-    total_cols = sum(len(df.columns) for name, df in combined_sheet_data.items() if name != 'Column_Metadata')
-    summary_path = os.path.join(OUTPUT_DIR, f"{base_name}_column_summary.txt")
+
+def _write_sheets(sheet_data, settings, output_path, manifest, extraction, metadata_key):
+    """
+    Writes the outputs or, in an incremental run, patches the changed sheets of
+    the previous output. With no output path, streamed tables are only pulled
+    through the table loader.
+    Returns (name_map, part_names): the output sheet or file name and the
+    continuation sheets of every table written, or None when patching failed.
+    """
+    output_format, sink_options = settings.output_format, settings.sink_options
+    if output_path is None:
+        for data in sheet_data.values():
+            if not isinstance(data, pd.DataFrame):
+                for _ in data:
+                    pass
+        print(f"\n✅ All data handed to the table loader ({len(sheet_data)} tables).")
+        return {}, {}
+
+    if manifest is None:
+        name_map, part_names = {}, {}
+        # the Excel sink also reports continuation sheets, so patching can remove them
+        write_options = dict(sink_options, part_names=part_names) if output_format == "excel" else sink_options
+        sheet_names = write_outputs(sheet_data, output_format, output_path, name_map, **write_options)
+        print(f"\n✅ All data combined into {output_path} ({len(sheet_names)} tables).")
+        return name_map, part_names
+
+    name_map = {name: entry["output_name"] for name, entry in manifest["sheets"].items()}
+    part_names = {name: list(entry["parts"]) for name, entry in manifest["sheets"].items()}
+    if manifest["metadata_output"]:
+        name_map['Column_Metadata'] = manifest["metadata_output"]
+    removed = [name for name in manifest["sheets"] if name not in extraction.sources]
+    if metadata_key == manifest.get("column_metadata"):
+        del sheet_data['Column_Metadata']
+
+    if not sheet_data and not removed:
+        print(f"\n✅ {output_path} is up to date; nothing to rewrite.")
+        return name_map, part_names
+    if output_format == "excel":
+        patched = patch_excel_sheets(sheet_data, output_path, name_map, removed, part_names)
+    else:
+        # one file per table: delete the removed ones, write the changed ones
+        remove_tables(output_path, [name_map.pop(name) for name in removed if name in name_map])
+        patched = write_outputs(sheet_data, output_format, output_path, name_map, **sink_options) if sheet_data else []
+    if not patched and sheet_data:
+        print(f"❌ Could not update {output_path}; run again without incremental mode.")
+        return None
+    rewritten = len([name for name in sheet_data if name != 'Column_Metadata'])
+    print(f"\n✅ Updated {output_path}: {rewritten} sheets rewritten, "
+          f"{len(extraction.reused)} kept, {len(removed)} removed.")
+    return name_map, part_names
+
+
+def _save_run_manifest(output_path, hyper_keys, workbook, extraction, name_map, part_names, sheet_columns, metadata_key):
+    """Records what each sheet was built from, for the next incremental run."""
+    sources = extraction.sources
+    result_cache.save_manifest(output_path, {
+        "version": result_cache.MANIFEST_VERSION,
+        "hyper": {
+            hyper_filename: {
+                "key": hyper_keys[hyper_filename],
+                "mapped_name": workbook.table_mapping.get(hyper_filename),
+                "sheets": [name for name, source in sources.items() if source == hyper_filename],
+            }
+            for hyper_filename in hyper_keys if hyper_filename in sources.values()
+        },
+        "sheets": {
+            name: {
+                "fingerprint": extraction.fingerprints[name],
+                "output_name": name_map[name],
+                "parts": part_names.get(name, []),
+                "columns": sheet_columns[name],
+            }
+            for name in sources if name in name_map and name in sheet_columns
+        },
+        "column_metadata": metadata_key,
+        "metadata_output": name_map.get('Column_Metadata'),
+    })
+
+
+def _write_column_summary(summary_path, base_name, sheet_columns, field_index):
+    """Writes the column summary text file and prints each sheet's columns."""
+    total_cols = sum(len(columns) for columns in sheet_columns.values())
     with open(summary_path, 'w', encoding='utf-8') as f:
         f.write(f"# Column Summary for {base_name}\n\n")
         f.write(f"Total columns extracted: {total_cols}\n\n")
-        for name, df in combined_sheet_data.items():
-            if name == 'Column_Metadata':
-                continue
+        for name, columns in sheet_columns.items():
             f.write(f"## Sheet: {name}\n\n")
-            f.write(f"Total columns: {len(df.columns)}\n\n")
-            for i, col in enumerate(df.columns, 1):
-                is_calc = any(col in fields for fields in calculated_fields.values())
-                f.write(f"{i}. {col} ({df[col].dtype}) - Calculated: {'Yes' if is_calc else 'No'}\n")
+            f.write(f"Total columns: {len(columns)}\n\n")
+            for i, (col, dtype, _) in enumerate(columns, 1):
+                is_calc = col in field_index
+                f.write(f"{i}. {col} ({dtype}) - Calculated: {'Yes' if is_calc else 'No'}\n")
             f.write("\n")
     print(f"✅ Column summary written to {summary_path}")
 
-    # Print out sheet details
-    for name, df in combined_sheet_data.items():
-        if name == 'Column_Metadata':
-            continue
+    for name, columns in sheet_columns.items():
         print(f"\n📋 Sheet '{name}' column details:")
-        for i, col in enumerate(df.columns, 1):
-            is_calc = any(col in fields for fields in calculated_fields.values())
-            print(f"  {i}. {col} ({df[col].dtype}) - Calculated: {'Yes' if is_calc else 'No'}")
+        for i, (col, dtype, _) in enumerate(columns, 1):
+            is_calc = col in field_index
+            print(f"  {i}. {col} ({dtype}) - Calculated: {'Yes' if is_calc else 'No'}")
+
+
+def process_twbx_file(twbx_file, calc_workers=None, chunk_size=None, extract_backend="rows",
+                      extract_workers=None, output_dir=None, extract_dir=None,
+                      use_cache=True, cache_dir=None, cache_size=None, incremental=False,
+                      output_format="excel", sink_options=None, table_loader=None):
+    """
+    Orchestrates the full process from extraction to Excel with calculated fields.
+
+    Args:
+        twbx_file: Path to the Tableau .twbx workbook.
+        calc_workers: Threads used to evaluate independent calculated fields.
+        chunk_size: When set, tables are streamed from Hyper in chunks of this
+            many rows through calculated fields and into a constant-memory
+            writer, instead of being loaded whole.
+        extract_backend: "rows", "parquet" or "arrow" (see
+            extract_hyper_to_excel_direct); ignored when streaming.
+        extract_workers: When greater than 1, .hyper files are extracted in a
+            pool of this many processes (ignored when streaming).
+        output_dir: Directory for the outputs (default: output/).
+        extract_dir: Workspace the .hyper files are unpacked into (default: the shared
+            output/extracted/). Give each workbook its own to process several at once.
+        use_cache: Reuse parsed metadata, extracted tables and final outputs from
+            the content-addressed cache (see result_cache) when their inputs are
+            unchanged, and store new results there.
+        cache_dir: Cache location (default: output/cache/).
+        cache_size: Cache size limit in bytes (default: result_cache.MAX_CACHE_BYTES).
+        incremental: Update the workbook from the previous run instead of
+            rebuilding it: only sheets whose .hyper data or calculated fields
+            changed are recomputed and rewritten, removed sheets are deleted and
+            Column_Metadata is rebuilt from the stored column descriptions.
+            Directory outputs rewrite only the changed tables' files; the Excel
+            workbook is saved again in full (see patch_excel_sheets).
+            Falls back to a full run when there is no previous output; ignored
+            when streaming.
+        output_format: Output sink, one of output_sinks.SINKS: "excel" (the
+            default, one workbook) or "excel-sheets" (one workbook per table,
+            written in parallel), "parquet", "partitioned-parquet", "csv" and
+            "feather" (a directory with one file per table).
+            None writes no output files (use with table_loader).
+        sink_options: Extra keyword arguments for the sink, e.g.
+            {"compression": "zstd"} or {"partition_cols": ["Region"]}.
+        table_loader: Optional callable(sheet_name, df) that receives every
+            final table, with its dtypes, before it is written (once per chunk
+            when streaming), e.g. to load the data into a database without
+            reading the outputs back (as pasteToSql's __main__ does). It gets
+            every table, so the output cache and incremental mode are not used.
+    Returns:
+        The output path, or with output_format None the names of the sheets
+        handed to table_loader.
+    """
+    BASE_DIR, OUTPUT_DIR, _ = get_directories()
+    OUTPUT_DIR = output_dir or OUTPUT_DIR
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    EXPORT_ROOT = os.path.join(OUTPUT_DIR, "parquet")
+    CALC_FIELDS_FILE = os.path.join(OUTPUT_DIR, "calculated_fields.txt")
+
+    # Step 1: Read the workbook's table naming and calculated fields
+    workbook = _read_workbook_metadata(twbx_file, use_cache, cache_dir)
+    _write_calculated_fields(CALC_FIELDS_FILE, workbook.calculated_fields)
+
+    base_name = os.path.splitext(os.path.basename(twbx_file))[0]
+    output_path = output_path_for(output_format, OUTPUT_DIR, base_name) if output_format else None
+    summary_path = os.path.join(OUTPUT_DIR, f"{base_name}_column_summary.txt")
+    manifest_path = result_cache.manifest_path(output_path) if output_path else None
+    sink_options = dict(sink_options or {})
+    if output_format in ("excel", "excel-sheets"):
+        sink_options.setdefault("constant_memory", bool(chunk_size))
+    settings = RunSettings(
+        calc_workers, chunk_size, extract_backend, extract_workers, extract_dir,
+        use_cache, cache_dir, output_format, sink_options, table_loader,
+    )
+
+    # Content keys of the .hyper members
+    hyper_keys = result_cache.hyper_hashes(twbx_file)
+
+    # Unchanged data and formulas: the outputs of an earlier run are reused as they are
+    reuse_outputs = use_cache and output_path is not None and table_loader is None
+    if reuse_outputs:
+        outputs_key = result_cache.result_hash(
+            hyper_keys,
+            result_cache.formula_hash(workbook.table_mapping, workbook.table_names, workbook.calculated_fields),
+            base_name, extract_backend, output_format, sorted(sink_options.items())
+        )
+        if result_cache.load_outputs(outputs_key, OUTPUT_DIR, cache_dir):
+            print(f"♻ {twbx_file} is unchanged; restored {output_path} from the cache.")
+            return output_path
+    cached_tables = {}
+    if use_cache and not chunk_size:
+        for hyper_filename, hyper_key in hyper_keys.items():
+            tables = result_cache.load_tables(result_cache.tables_key(hyper_key, extract_backend), cache_dir)
+            if tables is not None:
+                cached_tables[hyper_filename] = tables
+                print(f"♻ Reusing {len(tables)} cached tables from {hyper_filename}")
+
+    # Incremental run: the previous output is patched; .hyper files whose
+    # content, naming and calculated fields are unchanged are not touched at all
+    manifest, unchanged_files = None, set()
+    if incremental:
+        manifest, unchanged_files = _plan_incremental(twbx_file, settings, workbook, output_path, hyper_keys)
+
+    # Steps 2-4: Unpack the .hyper files and extract their tables
+    extraction = _extract_sheets(
+        twbx_file, settings, workbook, hyper_keys, cached_tables, manifest, unchanged_files, EXPORT_ROOT
+    )
+    if extraction is None:
+        return
+    sheet_data = extraction.data
+
+    # Step 5: Apply calculated fields where applicable
+    calculated_field_stats = {"applied": 0, "failed": 0, "total": 0}
+    row_wise_fallbacks = []
+    sheet_heads = _apply_sheet_calculations(sheet_data, settings, workbook, calculated_field_stats, row_wise_fallbacks)
+
+    # Step 6: Create a metadata sheet; column descriptions are recomputed for
+    # rewritten sheets and kept for reused ones
+    sheet_columns = {name: manifest["sheets"][name]["columns"] for name in extraction.reused}
+    metadata_key = None
+    if chunk_size:
+        sheet_data['Column_Metadata'] = _lazy_column_metadata(sheet_heads, workbook.field_index)
+    else:
+        sheet_columns.update((name, describe_columns(df)) for name, df in sheet_heads.items())
+        sheet_columns = {name: sheet_columns[name] for name in extraction.sources if name in sheet_columns}
+        sheet_data['Column_Metadata'] = build_column_metadata(sheet_columns, workbook.field_index)
+        metadata_key = result_cache.rows_hash(sheet_data['Column_Metadata'].to_dict('records'))
+
+    # Step 7: Write the outputs (or, in an incremental run, patch the changed sheets)
+    if table_loader is not None:
+        _hand_to_loader(sheet_data, table_loader)
+    written = _write_sheets(sheet_data, settings, output_path, manifest, extraction, metadata_key)
+    if written is None:
+        return
+    name_map, part_names = written
+    if chunk_size:
+        for hyper_file_path in extraction.hyper_files.values():
+            close_hyper_connection(hyper_file_path)
+        _print_calculated_field_summary(calculated_field_stats, row_wise_fallbacks)
+        sheet_columns = {name: describe_columns(df) for name, df in sheet_heads.items()}
+
+    if output_path is not None:
+        _save_run_manifest(
+            output_path, hyper_keys, workbook, extraction, name_map, part_names, sheet_columns, metadata_key
+        )
+
+    # Step 8: Write column summary text file
+    _write_column_summary(summary_path, base_name, sheet_columns, workbook.field_index)
+
+    if reuse_outputs:
+        result_cache.store_outputs(outputs_key, [output_path, summary_path, manifest_path], cache_dir)
+    if use_cache:
+        result_cache.evict_cache(cache_size or result_cache.MAX_CACHE_BYTES, cache_dir)
 
-    return excel_path
+    if output_path is None:
+        return list(extraction.sources)
+    return output_path
@@ -1,91 +1,228 @@
+import os
 import re
 import pandas as pd
-from tableauhyperapi import HyperProcess, Connection, Telemetry, HyperException, SqlType, TableName, SchemaName
-import warnings
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from tableauhyperapi import HyperException, SqlType, TableName, SchemaName, escape_string_literal
+from hyper_session import get_hyper_connection, close_hyper_connection
+from hyper_types import build_dataframe, select_expression, quote_identifier, categorize_text
+from extract_twbx import get_directories
 
-def extract_hyper_to_excel_direct(hyper_file, hyper_filename):
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Rows per DataFrame chunk in streaming mode
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Columnar backends: Hyper writes the file itself with COPY ... TO
+COLUMNAR_FORMATS = {
+    "parquet": ("PARQUET", ".parquet"),
+    "arrow": ("ARROWSTREAM", ".arrows"),
+}
+
+
+def _iter_tables(connection):
+    """
+    Yields (sheet_name, table_ref, columns) for every table in every schema.
+    """
+    for schema in connection.catalog.get_schema_names():
+        for table in connection.catalog.get_table_names(schema):
+            # Get full table reference including schema
+            schema_name = str(table.schema_name).replace('"', '')
+            table_name_str = str(table.name).replace('"', '')
+
+            # Clean table name for Excel sheet naming
+            clean_table_name = re.sub(r'_[A-F0-9]{32}$', '', table_name_str).replace("!", "_")
+
+            # If we have multiple tables with the same cleaned name, add schema prefix
+            if schema_name != "Extract":
+                sheet_name = f"{schema_name}_{clean_table_name}"
+            else:
+                sheet_name = clean_table_name
+
+            # Get column definitions
+            table_def = connection.catalog.get_table_definition(table)
+            table_ref = f"{quote_identifier(schema_name)}.{quote_identifier(table_name_str)}"
+            yield sheet_name, table_ref, table_def.columns
+
+
+def _select_query(table_ref, columns, typed=True):
+    """
+    Query with explicit column selection to preserve order. With typed=True the
+    columns are selected in the form hyper_types.build_dataframe expects.
+    """
+    if typed:
+        column_list = ", ".join(select_expression(col) for col in columns)
+    else:
+        column_list = ", ".join(quote_identifier(str(col.name).replace('"', '')) for col in columns)
+    return f'SELECT {column_list} FROM {table_ref}'
+
+
+def iter_table_chunks(connection, table_ref, columns, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Reads a table and yields its rows as DataFrames of at most chunk_size rows
+    (all rows in one DataFrame when chunk_size is None).
+
+    Columns get their pandas dtype from the table's SqlTypes when they are built
+    (see hyper_types), so no type inference runs afterwards. Chunks keep a
+    running RangeIndex, so row positions match a full read.
+    """
+    offset = 0
+    with connection.execute_query(_select_query(table_ref, columns)) as result:
+        rows_iter = iter(result)
+        while True:
+            rows = list(rows_iter) if chunk_size is None else list(islice(rows_iter, chunk_size))
+            if not rows:
+                break
+            df = build_dataframe(rows, columns, index=pd.RangeIndex(offset, offset + len(rows)))
+            del rows
+            offset += len(df)
+            yield df
+            if chunk_size is None:
+                break
+
+
+def extract_hyper_chunks(hyper_file, hyper_filename, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Streaming counterpart of extract_hyper_to_excel_direct.
+
+    Returns a dict mapping sheet name to a generator of DataFrame chunks.
+    Only the catalog is read here; each table's query runs when its generator
+    is consumed. A Hyper connection serves one result at a time, so consume
+    the generators one after another.
+    """
+    sheet_chunks = {}
+    try:
+        connection = get_hyper_connection(hyper_file)
+        for sheet_name, table_ref, columns in _iter_tables(connection):
+            sheet_chunks[sheet_name] = iter_table_chunks(connection, table_ref, columns, chunk_size)
+        if not sheet_chunks:
+            print(f"❌ No tables found in any schema in {hyper_file}.")
+    except HyperException as e:
+        print(f"❌ Hyper API error processing {hyper_file}: {e}")
+    except Exception as e:
+        print(f"❌ Error extracting data from {hyper_file}: {e}")
+    return sheet_chunks
+
+
+def read_table_columnar(connection, sheet_name, table_ref, columns, export_dir, backend="parquet"):
+    """
+    Has Hyper export a table to Parquet or Arrow IPC with COPY ... TO,
+    then loads the file column by column through pyarrow.
+    The file carries the table's own types; dates load as datetime64.
+    The exported file is kept in export_dir for reuse.
+    """
+    hyper_format, extension = COLUMNAR_FORMATS[backend]
+    os.makedirs(export_dir, exist_ok=True)
+    file_name = re.sub(r'[\\/:*?"<>|]', '_', sheet_name) + extension
+    export_path = os.path.abspath(os.path.join(export_dir, file_name))
+
+    query = _select_query(table_ref, columns, typed=False)
+    connection.execute_command(f"COPY ({query}) TO {escape_string_literal(export_path)} WITH (FORMAT {hyper_format})")
+    if backend == "parquet":
+        table = pyarrow.parquet.read_table(export_path)
+    else:
+        with pyarrow.ipc.open_stream(export_path) as reader:
+            table = reader.read_all()
+    return table.to_pandas(date_as_object=False)
+
+
+def extract_hyper_to_excel_direct(hyper_file, hyper_filename, backend="rows", export_dir=None):
     """
     Extracts data directly from a .hyper file into a dictionary of DataFrames.
     Handles multiple schemas and ensures all columns are extracted properly.
+
+    Args:
+        hyper_file: Path to the .hyper file.
+        hyper_filename: File name used in messages.
+        backend: "rows" fetches row tuples through the Hyper API; "parquet" or
+            "arrow" let Hyper export each table to a file that pandas loads
+            through pyarrow (see read_table_columnar).
+        export_dir: Where columnar exports are kept
+            (default: output/parquet/<hyper file name>).
     """
     sheet_data = {}
+    if backend != "rows" and backend not in COLUMNAR_FORMATS:
+        print(f"❌ Unknown extraction backend '{backend}'.")
+        return sheet_data
+    if backend != "rows" and pyarrow is None:
+        print(f"⚠ pyarrow is not installed; extracting {hyper_filename} row by row instead of via {backend}.")
+        backend = "rows"
+    if backend != "rows" and export_dir is None:
+        _, OUTPUT_DIR, _ = get_directories()
+        export_dir = os.path.join(OUTPUT_DIR, "parquet", os.path.splitext(hyper_filename)[0])
+
     try:
-        with HyperProcess(telemetry=Telemetry.SEND_USAGE_DATA_TO_TABLEAU) as hyper:
-            with Connection(endpoint=hyper.endpoint, database=hyper_file) as connection:
-                # Get all schemas in the database
-                schemas = connection.catalog.get_schema_names()
-                if not schemas:
-                    print(f"❌ No schemas found in {hyper_file}.")
-                    return sheet_data
-                
-                # Process each schema
-                all_tables_count = 0
-                for schema in schemas:
-                    tables = connection.catalog.get_table_names(schema)
-                    all_tables_count += len(tables)
-                    
-                    for table in tables:
-                        # Get full table reference including schema
-                        schema_name = str(table.schema_name).replace('"', '')
-                        table_name_str = str(table.name).replace('"', '')
-                        
-                        # Clean table name for Excel sheet naming
-                        clean_table_name = re.sub(r'_[A-F0-9]{32}$', '', table_name_str).replace("!", "_")
-                        
-                        # If we have multiple tables with the same cleaned name, add schema prefix
-                        if schema_name != "Extract":
-                            sheet_name = f"{schema_name}_{clean_table_name}"
-                        else:
-                            sheet_name = clean_table_name
-                        
-                        # Get column definitions
-                        table_def = connection.catalog.get_table_definition(table)
-                        columns = table_def.columns
-                        column_names = [str(col.name).replace('"', '') for col in columns]
-                        
-                        # Construct query with explicit column selection to preserve order
-                        column_list = ", ".join([f'"{col}"' for col in column_names])
-                        query = f'SELECT {column_list} FROM "{schema_name}"."{table_name_str}"'
-                        
-                        # Execute query and convert to DataFrame
-                        rows = connection.execute_query(query)
-                        df = pd.DataFrame(rows, columns=column_names)
-                        
-                        if df.empty:
-                            print(f"⚠ Table '{sheet_name}' is empty. Skipping...")
-                            continue
-
-                        # Attempt to convert object columns to appropriate types
-                        for col in df.columns:
-                            if df[col].dtype == 'object':
-                                # Try datetime conversion
-                                try:
-                                    with warnings.catch_warnings():
-                                        warnings.simplefilter("ignore", category=UserWarning)
-                                        converted = pd.to_datetime(df[col], errors='coerce')
-                                    if converted.notna().sum() > 0.8 * len(converted):
-                                        df[col] = converted
-                                except Exception:
-                                    pass
-                                
-                                # Try numeric conversion if still object type
-                                if df[col].dtype == 'object':
-                                    try:
-                                        numeric_vals = pd.to_numeric(df[col], errors='coerce')
-                                        if numeric_vals.notna().sum() > 0.8 * len(numeric_vals):
-                                            df[col] = numeric_vals
-                                    except Exception:
-                                        pass
-                        
-                        sheet_data[sheet_name] = df
-                        print(f"✅ Extracted table '{sheet_name}' from {hyper_filename} with {len(df)} rows and {len(df.columns)} columns.")
-                
-                if all_tables_count == 0:
-                    print(f"❌ No tables found in any schema in {hyper_file}.")
-                
+        connection = get_hyper_connection(hyper_file)
+        all_tables_count = 0
+        for sheet_name, table_ref, columns in _iter_tables(connection):
+            all_tables_count += 1
+
+            # Execute query and convert to DataFrame
+            if backend == "rows":
+                chunks = list(iter_table_chunks(connection, table_ref, columns, chunk_size=None))
+                df = chunks[0] if chunks else None
+            else:
+                df = read_table_columnar(connection, sheet_name, table_ref, columns, export_dir, backend)
+            if df is None or df.empty:
+                print(f"⚠ Table '{sheet_name}' is empty. Skipping...")
+                continue
+
+            sheet_data[sheet_name] = categorize_text(df)
+            print(f"✅ Extracted table '{sheet_name}' from {hyper_filename} with {len(df)} rows and {len(df.columns)} columns.")
+
+        if all_tables_count == 0:
+            print(f"❌ No tables found in any schema in {hyper_file}.")
+
     except HyperException as e:
         print(f"❌ Hyper API error processing {hyper_file}: {e}")
     except Exception as e:
         print(f"❌ Error extracting data from {hyper_file}: {e}")
-    
-    return sheet_data
\ No newline at end of file
+
+    return sheet_data
+
+
+
+def _extract_in_worker(hyper_file, hyper_filename, backend, export_dir):
+    # Runs in a pool process, which starts its own Hyper engine and connection
+    try:
+        return extract_hyper_to_excel_direct(hyper_file, hyper_filename, backend, export_dir)
+    finally:
+        close_hyper_connection(hyper_file)
+
+
+def extract_hyper_files_parallel(hyper_files, max_workers=None, backend="rows", export_root=None):
+    """
+    Extracts several .hyper files at once in a process pool.
+
+    Args:
+        hyper_files: dict mapping .hyper file name to its path.
+        max_workers: Number of worker processes (None: one per CPU).
+        backend: Extraction backend, see extract_hyper_to_excel_direct.
+        export_root: Directory holding one columnar export folder per file
+            (default: output/parquet).
+    Returns:
+        dict mapping .hyper file name to its {sheet_name: DataFrame} dict, in the
+        order of hyper_files. A file that fails gets an empty dict; the others
+        are unaffected.
+    """
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            hyper_filename: pool.submit(
+                _extract_in_worker, hyper_file_path, hyper_filename, backend,
+                os.path.join(export_root, os.path.splitext(hyper_filename)[0]) if export_root else None
+            )
+            for hyper_filename, hyper_file_path in hyper_files.items()
+        }
+        for hyper_filename, future in futures.items():
+            try:
+                results[hyper_filename] = future.result()
+            except Exception as e:
+                print(f"❌ Error extracting data from {hyper_filename} in worker process: {e}")
+                results[hyper_filename] = {}
+    return results
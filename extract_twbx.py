@@ -1,5 +1,7 @@
 import zipfile
 import os
+import shutil
+import time
 
 # Directory settings – adjust as needed or import from a config file.
 BASE_DIR = os.getcwd()
@@ -8,16 +10,55 @@ EXTRACT_DIR = os.path.join(OUTPUT_DIR, "extracted")
 os.makedirs(EXTRACT_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def extract_twbx(twbx_file):
-    """Extracts a .twbx file into output/extracted/."""
+# Copy buffer for streaming .hyper members out of the archive
+COPY_BUFFER_SIZE = 1024 * 1024
+
+def _member_path(extract_dir, member_name):
+    """Target path for a zip member, kept inside extract_dir."""
+    parts = [p for p in member_name.replace("\\", "/").split("/") if p not in ("", ".", "..")]
+    return os.path.join(extract_dir, *parts)
+
+def _is_unpacked(path, size, mtime):
+    # an earlier run already wrote this member (same size and timestamp)
+    return os.path.exists(path) and os.path.getsize(path) == size and abs(os.path.getmtime(path) - mtime) < 2
+
+def extract_twbx(twbx_file, extract_dir=None, extensions=(".hyper",), skip=()):
+    """
+    Unpacks the data extracts of a .twbx file into output/extracted/ (or into extract_dir).
+
+    Only members ending in one of `extensions` are written, each streamed
+    straight from the archive; images and other assets stay in the zip. The
+    .twb itself is read from the archive by find_table_names. A member that
+    is already on disk with the same size and timestamp is not copied again,
+    and members whose file name is in `skip` are not unpacked at all.
+
+    Returns:
+        dict mapping each written member's file name to its path on disk.
+    """
+    extract_dir = extract_dir or EXTRACT_DIR
+    extracted = {}
     try:
+        os.makedirs(extract_dir, exist_ok=True)
         with zipfile.ZipFile(twbx_file, 'r') as zip_ref:
-            zip_ref.extractall(EXTRACT_DIR)
-        print(f"✅ Extracted {twbx_file} to {EXTRACT_DIR}")
+            for member in zip_ref.infolist():
+                if member.is_dir() or not member.filename.lower().endswith(extensions):
+                    continue
+                target = _member_path(extract_dir, member.filename)
+                if os.path.basename(target) in skip:
+                    continue
+                mtime = time.mktime(member.date_time + (0, 0, -1))
+                if not _is_unpacked(target, member.file_size, mtime):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with zip_ref.open(member) as source, open(target, 'wb') as dest:
+                        shutil.copyfileobj(source, dest, COPY_BUFFER_SIZE)
+                    os.utime(target, (mtime, mtime))
+                extracted[os.path.basename(target)] = target
+        print(f"✅ Extracted {len(extracted)} data file(s) from {twbx_file} to {extract_dir}")
     except zipfile.BadZipFile:
         print(f"❌ Error: {twbx_file} is not a valid ZIP file.")
     except Exception as e:
         print(f"❌ Error extracting {twbx_file}: {e}")
+    return extracted
 
 # Expose directories for other modules
 def get_directories():
@@ -1,12 +1,164 @@
 import os
 import re
+import zipfile
 import xml.etree.ElementTree as ET
 from extract_twbx import get_directories
 
-def find_table_names():
+def _iter_twb_streams(source):
+    """
+    Yields (label, open binary stream) for every .twb in source.
+
+    source may be a .twbx archive, whose .twb members are read straight from
+    the zip without being written to disk, a single .twb file, or a directory
+    that is searched for .twb files.
+    """
+    if os.path.isfile(source) and zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source, 'r') as zip_ref:
+            for member in zip_ref.namelist():
+                if member.lower().endswith('.twb'):
+                    with zip_ref.open(member) as stream:
+                        yield f"{source}:{member}", stream
+    elif os.path.isfile(source):
+        with open(source, 'rb') as stream:
+            yield source, stream
+    else:
+        for root, _, files in os.walk(source):
+            for file in files:
+                if file.endswith('.twb'):
+                    file_path = os.path.join(root, file)
+                    with open(file_path, 'rb') as stream:
+                        yield file_path, stream
+
+def _scan_workbook(stream, table_mapping, table_names, calculated_fields):
+    """
+    Collects hyper mappings, relations, calculated fields and parameters from a
+    .twb stream in a single iterparse pass.
+
+    Everything needed is read from start tags, and each element is cleared and
+    detached from its parent when it ends, so memory is bounded by the nesting
+    depth of the XML rather than by the size of the workbook.
+    """
+    datasource_index = {}  # datasource name -> its identifiers, for parameters
+    parameters = []        # attributes of every <parameter>
+    open_datasources = []  # identifiers of the enclosing datasources
+    open_columns = []      # enclosing <column> elements being collected
+    path = []              # open elements, root first
+
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        tag = elem.tag
+        if event == 'start':
+            path.append(elem)
+            if tag == 'datasource':
+                caption = elem.get("caption", "").strip()
+                name = elem.get("name", "").strip()
+                
+                # Use caption if available, otherwise use name
+                source_identifier = caption if caption else name
+                datasource_index.setdefault(name, {})[source_identifier] = None
+                open_datasources.append(source_identifier)
+            
+            elif tag == 'connection':
+                # Find connection information for .hyper files
+                dbname = elem.get("dbname", "").strip()
+                if dbname and dbname.endswith(".hyper"):
+                    hyper_filename = os.path.basename(dbname)
+                    for source_identifier in filter(None, open_datasources):
+                        table_mapping[hyper_filename] = source_identifier
+                        print(f"✅ Mapped hyper file '{hyper_filename}' to '{source_identifier}'")
+            
+            elif tag == 'column':
+                col_name = elem.get("name", "").strip()
+                open_columns.append({
+                    'name': col_name,
+                    'caption': elem.get("caption", "").strip() or col_name,
+                    'datatype': elem.get("datatype", "").strip(),
+                    'formula': None,
+                })
+            
+            elif tag == 'calculation':
+                # A calculation element makes the enclosing column a calculated field
+                for column in open_columns:
+                    if column['formula'] is None:
+                        column['formula'] = elem.get("formula", "").strip()
+            
+            elif tag == 'relation':
+                # Find table relations
+                tname = elem.get("name", "").strip()
+                if tname:
+                    for source_identifier in filter(None, open_datasources):
+                        table_names[tname] = source_identifier
+                        print(f"✅ Found relation '{tname}' in '{source_identifier}'")
+            
+            elif tag == 'parameter':
+                # Also look for parameters (they might be needed for calculations)
+                parameters.append(dict(elem.attrib))
+            continue
+
+        path.pop()
+        if tag == 'datasource':
+            open_datasources.pop()
+        elif tag == 'column':
+            column = open_columns.pop()
+            if column['name'] and column['formula'] is not None:
+                col_caption = column['caption']
+                for source_identifier in filter(None, open_datasources):
+                    # Store the calculated field information
+                    if source_identifier not in calculated_fields:
+                        calculated_fields[source_identifier] = {}
+                    
+                    calculated_fields[source_identifier][col_caption] = {
+                        'name': column['name'],
+                        'formula': column['formula'],
+                        'datatype': column['datatype']
+                    }
+                    print(f"✅ Found calculated field '{col_caption}' in '{source_identifier}'")
+        
+        # Done with this element: free it and drop it from its parent
+        elem.clear()
+        if path:
+            path[-1].remove(elem)
+    
+    for param in parameters:
+        param_name = param.get("name", "").strip()
+        caption = param.get("caption", "").strip() or param_name
+        
+        # Find which datasource this parameter belongs to
+        for ds_id in datasource_index.get(param.get("datasource"), ()):
+            if ds_id not in calculated_fields:
+                calculated_fields[ds_id] = {}
+            
+            # Store the parameter as a special type of calculated field
+            calculated_fields[ds_id][caption] = {
+                'name': param_name,
+                'formula': f"PARAMETER({param_name})",
+                'datatype': param.get("datatype", "").strip(),
+                'is_parameter': True
+            }
+            print(f"✅ Found parameter '{caption}' in '{ds_id}'")
+
+def build_field_index(calculated_fields):
+    """
+    Indexes calculated fields by caption across all datasources.
+    
+    Returns:
+        dict mapping each field caption to its details from the first datasource
+        defining it, so `caption in index` answers "is this column calculated?"
+        and `index[caption]['formula']` gives its formula in O(1).
+    """
+    field_index = {}
+    for fields in calculated_fields.values():
+        for caption, details in fields.items():
+            field_index.setdefault(caption, details)
+    return field_index
+
+def find_table_names(source=None):
     """
     Extracts dataset names, table names, and calculated fields from .twb files.
     
+    Args:
+        source: A .twbx workbook (read in place), a .twb file, or a directory to
+            search (default: the shared extraction directory).
+        
     Returns:
         table_mapping: dict mapping .hyper filenames to datasource captions.
         table_names: dict mapping table names to datasource captions.
@@ -22,98 +174,12 @@ def find_table_names():
         'tableau': 'http://www.tableausoftware.com/xml/tableau',
     }
     
-    for root, _, files in os.walk(EXTRACT_DIR):
-        for file in files:
-            if file.endswith('.twb'):
-                file_path = os.path.join(root, file)
-                try:
-                    # Try reading the file as text to preserve all information
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                    
-                    # Parse XML directly
-                    try:
-                        tree = ET.fromstring(content)
-                    except ET.ParseError:
-                        # Fall back to regular parsing if fromstring fails
-                        tree = ET.parse(file_path).getroot()
-                    
-                    # Process each datasource
-                    for datasource in tree.findall(".//datasource"):
-                        caption = datasource.get("caption", "").strip()
-                        name = datasource.get("name", "").strip()
-                        
-                        # Use caption if available, otherwise use name
-                        source_identifier = caption if caption else name
-                        if not source_identifier:
-                            continue
-                        
-                        # Find connection information for .hyper files
-                        for connection in datasource.findall(".//connection"):
-                            dbname = connection.get("dbname", "").strip()
-                            if dbname and dbname.endswith(".hyper"):
-                                hyper_filename = os.path.basename(dbname)
-                                table_mapping[hyper_filename] = source_identifier
-                                print(f"✅ Mapped hyper file '{hyper_filename}' to '{source_identifier}'")
-                        
-                        # Extract column information
-                        for column in datasource.findall(".//column"):
-                            col_name = column.get("name", "").strip()
-                            col_caption = column.get("caption", "").strip() or col_name
-                            
-                            if not col_name:
-                                continue
-                                
-                            # Check if it's a calculated field by looking for a calculation element
-                            calculation = column.find(".//calculation")
-                            if calculation is not None:
-                                formula = calculation.get("formula", "").strip()
-                                datatype = column.get("datatype", "").strip()
-                                
-                                # Store the calculated field information
-                                if source_identifier not in calculated_fields:
-                                    calculated_fields[source_identifier] = {}
-                                
-                                calculated_fields[source_identifier][col_caption] = {
-                                    'name': col_name,
-                                    'formula': formula,
-                                    'datatype': datatype
-                                }
-                                print(f"✅ Found calculated field '{col_caption}' in '{source_identifier}'")
-                            
-                        # Find table relations
-                        for relation in datasource.findall(".//relation"):
-                            tname = relation.get("name", "").strip()
-                            if tname:
-                                table_names[tname] = source_identifier
-                                print(f"✅ Found relation '{tname}' in '{source_identifier}'")
-                    
-                    # Also look for parameters (they might be needed for calculations)
-                    for param in tree.findall(".//parameter"):
-                        param_name = param.get("name", "").strip()
-                        caption = param.get("caption", "").strip() or param_name
-                        
-                        # Find which datasource this parameter belongs to
-                        for ds in tree.findall(".//datasource"):
-                            ds_caption = ds.get("caption", "").strip()
-                            ds_name = ds.get("name", "").strip()
-                            ds_id = ds_caption if ds_caption else ds_name
-                            
-                            if param.get("datasource") == ds_name:
-                                if ds_id not in calculated_fields:
-                                    calculated_fields[ds_id] = {}
-                                
-                                # Store the parameter as a special type of calculated field
-                                calculated_fields[ds_id][caption] = {
-                                    'name': param_name,
-                                    'formula': f"PARAMETER({param_name})",
-                                    'datatype': param.get("datatype", "").strip(),
-                                    'is_parameter': True
-                                }
-                                print(f"✅ Found parameter '{caption}' in '{ds_id}'")
-                
-                except Exception as e:
-                    print(f"❌ Error processing {file_path}: {e}")
+    for label, stream in _iter_twb_streams(source or EXTRACT_DIR):
+        try:
+            # Scan the XML straight from the stream, without building the tree
+            _scan_workbook(stream, table_mapping, table_names, calculated_fields)
+        except Exception as e:
+            print(f"❌ Error processing {label}: {e}")
     
     # Summary of what was found
     print(f"\n📊 Found {len(table_mapping)} hyper file mappings.")
@@ -0,0 +1,351 @@
+import ast
+import operator
+import numpy as np
+import pandas as pd
+from tableau_dates import DATEDIFF, DATEPART, LT, LTE, GT, GTE
+
+
+def _broadcast(value, length):
+    """Turn a scalar or Series into a NumPy array with one entry per row."""
+    if isinstance(value, pd.Series):
+        return value.to_numpy()
+    if isinstance(value, np.ndarray) and value.ndim == 1:
+        return value
+    return np.full(length, value, dtype=object)
+
+
+def _as_mask(condition, length):
+    """Turn a condition result into a boolean mask; missing values count as False."""
+    if isinstance(condition, pd.Series):
+        return condition.fillna(False).astype(bool).to_numpy()
+    if isinstance(condition, np.ndarray):
+        return np.asarray(condition, dtype=bool)
+    return np.full(length, bool(condition) if not pd.isna(condition) else False)
+
+
+def SELECT(frame, conditions, choices, default):
+    """
+    Vectorized IF/ELSEIF/ELSE: np.select over whole columns.
+    The first matching condition wins, as with nested ternaries.
+    """
+    length = len(frame)
+    condlist = [_as_mask(c, length) for c in conditions]
+    choicelist = [_broadcast(v, length) for v in choices]
+    result = np.select(condlist, choicelist, default=_broadcast(default, length))
+    return pd.Series(result, index=frame.index).infer_objects()
+
+
+def AND(*operands):
+    result = operands[0]
+    for operand in operands[1:]:
+        result = np.logical_and(result, operand)
+    return result
+
+
+def OR(*operands):
+    result = operands[0]
+    for operand in operands[1:]:
+        result = np.logical_or(result, operand)
+    return result
+
+
+def NOT(operand):
+    return np.logical_not(operand)
+
+
+def ISNULL(x):
+    if isinstance(x, pd.Series):
+        return x.isna()
+    return pd.isna(x)
+
+
+def INDEX(frame):
+    return pd.Series(frame.index + 1, index=frame.index)
+
+
+def _is_null(x):
+    # a missing scalar; Series carry their missing values themselves
+    return not isinstance(x, (pd.Series, np.ndarray)) and pd.isna(x)
+
+
+def _plain(x):
+    # categorical columns hold their values as object for arithmetic and filling
+    if isinstance(x, pd.Series) and isinstance(x.dtype, pd.CategoricalDtype):
+        return x.astype(object)
+    return x
+
+
+def _null_like(*operands):
+    # NULL shaped like the operands: a column of NaN, or NaN for scalars (so
+    # that, as in a column, comparing it is False rather than a TypeError)
+    for x in operands:
+        if isinstance(x, pd.Series):
+            return pd.Series(np.nan, index=x.index)
+    return np.nan
+
+
+def _nonzero(divisor):
+    # Tableau divides by zero to NULL, not to inf or an error
+    if isinstance(divisor, pd.Series):
+        return divisor.where(divisor != 0)
+    return None if not _is_null(divisor) and divisor == 0 else divisor
+
+
+def _arithmetic(op, divides=False):
+    def apply(a, b):
+        a, b = _plain(a), _plain(b)
+        if divides:
+            b = _nonzero(b)
+        if _is_null(a) or _is_null(b):
+            return _null_like(a, b)
+        return op(a, b)
+    return apply
+
+
+def OP_NEG(x):
+    return _null_like(x) if _is_null(x) else -x
+
+
+def _null_where_null(result, *operands):
+    # A logical result that is NULL (None, which IF treats as false) wherever
+    # an operand is NULL, as in Tableau
+    null = False
+    for x in operands:
+        null = null | (x.isna() if isinstance(x, pd.Series) else pd.isna(x))
+    if isinstance(result, pd.Series):
+        return pd.Series(np.where(null, None, result.astype(object)), index=result.index, dtype=object)
+    return None if null else result
+
+
+def OP_NE(a, b):
+    a, b = _plain(a), _plain(b)
+    return _null_where_null(a != b, a, b)
+
+
+def OP_NOT(x):
+    x = _plain(x)
+    if isinstance(x, pd.Series):
+        return _null_where_null(~x.fillna(False).astype(bool), x)
+    return None if _is_null(x) else not x
+
+
+# Tableau's arithmetic operators, for scalars (row-wise) and whole columns alike:
+# NULL in gives NULL out, and so does a zero divisor, so both forms agree.
+# <> and NOT also give NULL for NULL, where Python's != and not give True.
+ARITHMETIC_FUNCTIONS = {
+    "OP_ADD": _arithmetic(operator.add),
+    "OP_SUB": _arithmetic(operator.sub),
+    "OP_MUL": _arithmetic(operator.mul),
+    "OP_DIV": _arithmetic(operator.truediv, divides=True),
+    "OP_MOD": _arithmetic(operator.mod, divides=True),
+    "OP_POW": _arithmetic(operator.pow),
+    "OP_NEG": OP_NEG,
+    "OP_NE": OP_NE,
+    "OP_NOT": OP_NOT,
+}
+
+
+def _null_safe(scalar, column):
+    # Applies column() to a Series and scalar() to a value; NULL stays NULL
+    def apply(x, *args):
+        if isinstance(x, pd.Series):
+            return column(x, *args)
+        return _null_like(x) if _is_null(x) else scalar(x, *args)
+    return apply
+
+
+def _pairwise(scalar, column):
+    def apply(a, b):
+        a, b = _plain(a), _plain(b)
+        if isinstance(a, pd.Series) or isinstance(b, pd.Series):
+            return column(a, b)
+        return _null_like(a, b) if _is_null(a) or _is_null(b) else scalar(a, b)
+    return apply
+
+
+def _pick_column(a, b, smaller):
+    # Two-argument MIN/MAX of columns (or a column and a value); NULL if either is
+    index = (a if isinstance(a, pd.Series) else b).index
+    a = a if isinstance(a, pd.Series) else pd.Series(a, index=index, dtype=object)
+    b = b if isinstance(b, pd.Series) else pd.Series(b, index=index, dtype=object)
+    missing = a.isna() | b.isna()
+    # compare only present values: a missing side takes the other side's value
+    a, b = a.where(~missing, b), b.where(~missing, a)
+    keep = (a <= b) if smaller else (a >= b)
+    return a.where(keep.fillna(False).astype(bool), b).mask(missing).infer_objects()
+
+
+def ZN(x):
+    """The value, or 0 where it is NULL."""
+    x = _plain(x)
+    if isinstance(x, pd.Series):
+        return x.fillna(0)
+    return 0 if _is_null(x) else x
+
+
+def IFNULL(x, alternative):
+    """The value, or the alternative where it is NULL."""
+    x = _plain(x)
+    if isinstance(x, pd.Series):
+        return x.where(x.notna(), alternative)
+    return alternative if _is_null(x) else x
+
+
+# Tableau functions with one implementation for values and whole columns
+TABLEAU_FUNCTIONS = {
+    "ZN": ZN,
+    "IFNULL": IFNULL,
+    "ABS": _null_safe(abs, lambda x: x.abs()),
+    "ROUND": _null_safe(lambda x, digits=0: round(x, digits), lambda x, digits=0: x.round(digits)),
+    "STR": _null_safe(str, lambda x: x.astype(str).where(x.notna())),
+    "UPPER": _null_safe(lambda x: x.upper(), lambda x: x.str.upper()),
+    "LOWER": _null_safe(lambda x: x.lower(), lambda x: x.str.lower()),
+    "LEN": _null_safe(len, lambda x: x.str.len()),
+    "MIN": _pairwise(min, lambda a, b: _pick_column(a, b, smaller=True)),
+    "MAX": _pairwise(max, lambda a, b: _pick_column(a, b, smaller=False)),
+}
+
+
+# Functions that accept whole columns; calls to anything else are not vectorizable.
+VECTOR_FUNCTIONS = {
+    "SELECT": SELECT,
+    "AND": AND,
+    "OR": OR,
+    "NOT": NOT,
+    "ISNULL": ISNULL,
+    "INDEX": INDEX,
+    "DATEDIFF": DATEDIFF,
+    "DATEPART": DATEPART,
+    "LT": LT,
+    "LTE": LTE,
+    "GT": GT,
+    "GTE": GTE,
+    **ARITHMETIC_FUNCTIONS,
+    **TABLEAU_FUNCTIONS,
+}
+
+# Attribute calls that are safe on scalars and don't touch row values.
+_SAFE_ATTRIBUTE_CALLS = {("pd", "Timestamp")}
+
+_ALLOWED_BINOPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_ALLOWED_CMPOPS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+
+def _call(name, args):
+    return ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=args, keywords=[])
+
+
+class _Vectorizer(ast.NodeTransformer):
+    """
+    Rewrites a row-wise expression (row["Field"] references, Python ternaries)
+    into one that evaluates over the whole DataFrame bound to `row`.
+    Raises ValueError for constructs that have no column-wise equivalent.
+    """
+
+    def __init__(self, functions):
+        self.functions = functions
+
+    def generic_visit(self, node):
+        raise ValueError(f"unsupported construct '{type(node).__name__}'")
+
+    def visit_Expression(self, node):
+        node.body = self.visit(node.body)
+        return node
+
+    def visit_Constant(self, node):
+        return node
+
+    def visit_Name(self, node):
+        if node.id == "row":
+            return node
+        raise ValueError(f"unsupported name '{node.id}'")
+
+    def visit_Subscript(self, node):
+        # only row["Field"] column lookups
+        if (isinstance(node.value, ast.Name) and node.value.id == "row"
+                and isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str)):
+            return node
+        raise ValueError("unsupported subscript")
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _ALLOWED_BINOPS):
+            raise ValueError(f"unsupported operator '{type(node.op).__name__}'")
+        node.left = self.visit(node.left)
+        node.right = self.visit(node.right)
+        return node
+
+    def visit_UnaryOp(self, node):
+        operand = self.visit(node.operand)
+        if isinstance(node.op, ast.Not):
+            return _call("NOT", [operand])
+        if isinstance(node.op, (ast.USub, ast.UAdd)):
+            node.operand = operand
+            return node
+        raise ValueError(f"unsupported operator '{type(node.op).__name__}'")
+
+    def visit_BoolOp(self, node):
+        name = "AND" if isinstance(node.op, ast.And) else "OR"
+        return _call(name, [self.visit(v) for v in node.values])
+
+    def visit_Compare(self, node):
+        operands = [self.visit(node.left)] + [self.visit(c) for c in node.comparators]
+        pairs = []
+        for i, op in enumerate(node.ops):
+            if not isinstance(op, _ALLOWED_CMPOPS):
+                raise ValueError(f"unsupported comparison '{type(op).__name__}'")
+            pairs.append(ast.Compare(left=operands[i], ops=[op], comparators=[operands[i + 1]]))
+        # a < b < c  →  AND(a < b, b < c)
+        return pairs[0] if len(pairs) == 1 else _call("AND", pairs)
+
+    def visit_IfExp(self, node):
+        # flatten nested ternaries into one SELECT(row, [conds], [values], default)
+        conditions, choices = [], []
+        while isinstance(node, ast.IfExp):
+            conditions.append(self.visit(node.test))
+            choices.append(self.visit(node.body))
+            node = node.orelse
+        default = self.visit(node)
+        return _call("SELECT", [
+            ast.Name(id="row", ctx=ast.Load()),
+            ast.List(elts=conditions, ctx=ast.Load()),
+            ast.List(elts=choices, ctx=ast.Load()),
+            default,
+        ])
+
+    def visit_Call(self, node):
+        if node.keywords:
+            raise ValueError("unsupported keyword arguments")
+        func = node.func
+        if isinstance(func, ast.Name):
+            if func.id not in self.functions:
+                raise ValueError(f"function '{func.id}' has no vectorized form")
+        elif isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+            if (func.value.id, func.attr) not in _SAFE_ATTRIBUTE_CALLS:
+                raise ValueError(f"unsupported call '{func.value.id}.{func.attr}'")
+            if not all(isinstance(a, ast.Constant) for a in node.args):
+                raise ValueError(f"unsupported call '{func.value.id}.{func.attr}'")
+            return node
+        else:
+            raise ValueError("unsupported call")
+        node.args = [self.visit(a) for a in node.args]
+        return node
+
+
+def vectorize_expression(expression, functions=VECTOR_FUNCTIONS):
+    """
+    Translate a row-wise Python expression into its column-wise form.
+
+    Args:
+        expression: Expression text using row["Field"] lookups.
+        functions: Names of functions that accept whole Series.
+    Returns:
+        Expression text to eval with `row` bound to the DataFrame.
+    Raises:
+        ValueError if the expression uses something the vectorizer can't handle.
+    """
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"invalid expression: {e.msg}")
+    tree = _Vectorizer(functions).visit(tree)
+    return ast.unparse(ast.fix_missing_locations(tree))
@@ -0,0 +1,58 @@
+import atexit
+import threading
+from tableauhyperapi import HyperProcess, Connection, Telemetry
+
+# One Hyper engine per Python process, shared by table listing and extraction.
+# Usage data is not sent to Tableau.
+TELEMETRY = Telemetry.DO_NOT_SEND_USAGE_DATA_TO_TABLEAU
+
+_lock = threading.RLock()
+_hyper = None
+_connections = {}
+
+
+def get_hyper_process():
+    """Returns the process-wide HyperProcess, starting it on first use."""
+    global _hyper
+    with _lock:
+        if _hyper is None or not _hyper.is_open:
+            _hyper = HyperProcess(telemetry=TELEMETRY)
+        return _hyper
+
+
+def get_hyper_connection(hyper_file):
+    """
+    Returns the open connection to hyper_file, opening it on first use.
+    The same connection serves catalog queries and data queries for the file.
+    """
+    with _lock:
+        connection = _connections.get(hyper_file)
+        if connection is None or not connection.is_open:
+            connection = Connection(endpoint=get_hyper_process().endpoint, database=hyper_file)
+            _connections[hyper_file] = connection
+        return connection
+
+
+def close_hyper_connection(hyper_file):
+    """Closes the connection to hyper_file (if any), releasing the file."""
+    with _lock:
+        connection = _connections.pop(hyper_file, None)
+        if connection is not None and connection.is_open:
+            connection.close()
+
+
+def shutdown_hyper():
+    """Closes every open connection and stops the Hyper engine."""
+    global _hyper
+    with _lock:
+        for hyper_file in list(_connections):
+            try:
+                close_hyper_connection(hyper_file)
+            except Exception as e:
+                print(f"⚠ Error closing Hyper connection to {hyper_file}: {e}")
+        if _hyper is not None and _hyper.is_open:
+            _hyper.close()
+        _hyper = None
+
+
+atexit.register(shutdown_hyper)
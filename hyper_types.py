@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+from tableauhyperapi import TypeTag
+
+# Exact pandas dtypes for Hyper SqlTypes; columns are built with these at
+# construction time instead of being guessed afterwards.
+_INT_DTYPES = {
+    TypeTag.SMALL_INT: "Int16",
+    TypeTag.INT: "Int32",
+    TypeTag.BIG_INT: "Int64",
+}
+_DATETIME_TAGS = (TypeTag.DATE, TypeTag.TIMESTAMP, TypeTag.TIMESTAMP_TZ)
+
+# NUMERIC values with more digits than a float64 holds exactly stay Decimal
+_MAX_FLOAT_PRECISION = 15
+
+# Text columns with at most this many distinct values per row become
+# categoricals (see categorize_text)
+CATEGORY_MAX_RATIO = 0.5
+
+# DATE columns stay datetime64 (at midnight): pandas has no date-only dtype
+# other than object columns of datetime.date, which are slower and larger.
+
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def select_expression(col_def):
+    """
+    SQL to select a column so it arrives in a form that converts in bulk.
+    Dates and timestamps are fetched as epoch seconds instead of
+    tableauhyperapi Date/Timestamp objects.
+    """
+    name = quote_identifier(str(col_def.name).replace('"', ''))
+    if col_def.type.tag in _DATETIME_TAGS:
+        return f"EXTRACT(EPOCH FROM CAST({name} AS TIMESTAMP)) AS {name}"
+    return name
+
+
+def pandas_dtype(sql_type):
+    """Name of the pandas dtype a Hyper SqlType maps to."""
+    tag = sql_type.tag
+    if tag == TypeTag.BOOL:
+        return "boolean"
+    if tag in _INT_DTYPES:
+        return _INT_DTYPES[tag]
+    if tag == TypeTag.DOUBLE:
+        return "float64"
+    if tag == TypeTag.NUMERIC:
+        if sql_type.scale == 0 and sql_type.precision <= 18:
+            return "Int64"
+        if sql_type.precision <= _MAX_FLOAT_PRECISION:
+            return "float64"
+        return "object"  # decimal.Decimal values
+    if tag in _DATETIME_TAGS:
+        return "datetime64[ns]"
+    return "object"
+
+
+def build_column(values, sql_type):
+    """Builds one column from a sequence of Hyper values with its exact dtype."""
+    dtype = pandas_dtype(sql_type)
+    if dtype == "datetime64[ns]":
+        seconds = np.array(values, dtype="float64")
+        # round to microseconds: float epoch seconds carry a little noise
+        return pd.to_datetime(np.round(seconds * 1e6), unit="us").to_numpy(dtype="datetime64[ns]")
+    if dtype == "float64":
+        return np.array(values, dtype="float64")
+    if dtype == "object":
+        return np.array(values, dtype=object)
+    if sql_type.tag == TypeTag.NUMERIC:
+        values = [None if v is None else int(v) for v in values]
+    return pd.array(values, dtype=dtype)
+
+
+def categorize_text(df, max_ratio=CATEGORY_MAX_RATIO):
+    """
+    Converts low-cardinality text columns of a whole table to the category
+    dtype, in place: each distinct string is stored once and rows hold small
+    integer codes. Returns df.
+    """
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype) or not pd.api.types.is_string_dtype(series.dtype):
+            continue
+        if len(series) == 0:
+            continue
+        if pd.api.types.infer_dtype(series, skipna=True) != "string":
+            continue
+        if series.nunique(dropna=True) <= max_ratio * len(series):
+            df[col] = series.astype("category")
+    return df
+
+
+def build_dataframe(rows, columns, index=None):
+    """
+    Builds a DataFrame from Hyper result rows, one typed column at a time.
+
+    Args:
+        rows: List of row tuples, selected with select_expression.
+        columns: Column definitions from the table definition.
+        index: Optional index for the result.
+    """
+    column_names = [str(col.name).replace('"', '') for col in columns]
+    if not rows:
+        return pd.DataFrame({
+            name: pd.Series(dtype=pandas_dtype(col.type)) for name, col in zip(column_names, columns)
+        })
+    values_by_column = list(zip(*rows))
+    data = {
+        name: build_column(values, col.type)
+        for name, values, col in zip(column_names, values_by_column, columns)
+    }
+    return pd.DataFrame(data, index=index)
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+import numpy as np
+import pandas as pd
+from extract_twbx import get_directories
+
+# Local state of incremental loads (see pasteToSql.upsert_table):
+#   watermarks.json         per table: last watermark value, rows sent, load time
+#   hashes/<table key>.npy  per table loaded by key only: (key hash, row hash) pairs
+# Tables are keyed by backend, server, database and name, so loads into
+# different databases keep separate state.
+_, _OUTPUT_DIR, _ = get_directories()
+STATE_DIR = os.path.join(_OUTPUT_DIR, "load_state")
+
+_lock = threading.Lock()
+
+
+def table_key(backend, table_name):
+    """State key of table_name in the database the backend connects to."""
+    config = backend.config
+    return "|".join([backend.name or "", config.get("server", ""), str(config.get("database", "")), table_name])
+
+
+def _watermarks_path(state_dir=None):
+    return os.path.join(state_dir or STATE_DIR, "watermarks.json")
+
+
+def _hashes_path(key, state_dir=None):
+    name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(state_dir or STATE_DIR, "hashes", f"{name}.npy")
+
+
+def _replace(path, write):
+    # Write next to the target and swap it in, so readers never see a partial file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, 'wb') as f:
+        write(f)
+    os.replace(temp_path, path)
+
+
+def _read_watermarks(state_dir=None):
+    path = _watermarks_path(state_dir)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        print(f"⚠ Ignoring unreadable load state {path}")
+        return {}
+
+
+def load_table_state(key, state_dir=None):
+    """The saved state of a table (watermark, rows, loaded_at), or {} if it has none."""
+    return _read_watermarks(state_dir).get(key, {})
+
+
+def save_table_state(key, state, state_dir=None):
+    """Saves a table's state; state=None forgets it (and its row hashes)."""
+    with _lock:
+        watermarks = _read_watermarks(state_dir)
+        if state is None:
+            watermarks.pop(key, None)
+            if os.path.exists(_hashes_path(key, state_dir)):
+                os.remove(_hashes_path(key, state_dir))
+        else:
+            watermarks[key] = state
+        _replace(_watermarks_path(state_dir),
+                 lambda f: f.write(json.dumps(watermarks, indent=1, sort_keys=True).encode("utf-8")))
+
+
+def watermark_to_json(value):
+    """A watermark value (Timestamp, number or text) as JSON-serializable data."""
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value if isinstance(value, (int, float, str)) else str(value)
+
+
+def watermark_from_json(value, series):
+    """A saved (or database) watermark value converted for comparison with series."""
+    if value is None:
+        return None
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        stamp = pd.Timestamp(value)
+        tz = series.dt.tz
+        if tz is not None and stamp.tzinfo is None:
+            return stamp.tz_localize(tz)
+        if tz is None and stamp.tzinfo is not None:
+            return stamp.tz_localize(None)
+        return stamp
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return pd.to_numeric(value)
+    return str(value)
+
+
+def row_hashes(df, key_columns):
+    """(key hashes, row hashes) of every row, as uint64 arrays."""
+    keys = pd.util.hash_pandas_object(df[key_columns], index=False).to_numpy()
+    rows = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return keys, rows
+
+
+def load_row_hashes(key, state_dir=None):
+    """The (key hashes, row hashes) saved for a table, or None."""
+    path = _hashes_path(key, state_dir)
+    if not os.path.exists(path):
+        return None
+    pairs = np.load(path)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def save_row_hashes(key, hashes, state_dir=None):
+    keys, rows = hashes
+    _replace(_hashes_path(key, state_dir), lambda f: np.save(f, np.column_stack([keys, rows])))
+
+
+def changed_rows(hashes, previous):
+    """
+    Boolean mask of the rows whose key is new or whose values differ from
+    the previous load, given row_hashes of this load and of the previous one.
+    """
+    keys, rows = hashes
+    previous_keys, previous_rows = previous
+    # A key seen twice before counts with its last row
+    last = ~pd.Index(previous_keys[::-1]).duplicated()[::-1]
+    index = pd.Index(previous_keys[last])
+    positions = index.get_indexer(keys)
+    known = positions >= 0
+    changed = ~known
+    changed[known] = previous_rows[last][positions[known]] != rows[known]
+    return changed
@@ -0,0 +1,274 @@
+import inspect
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from write_to_excel import write_dataframes_to_excel, write_sheets_parallel
+
+try:
+    import pyarrow
+    import pyarrow.csv
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Rows per file in a partitioned Parquet table without partition columns
+PARTITION_ROWS = 1_000_000
+
+# File name suffixes of the compressions the CSV sink can apply
+CSV_COMPRESSION_SUFFIXES = {"gzip": ".gz", "bz2": ".bz2", "zstd": ".zst", "lz4": ".lz4"}
+
+
+def safe_file_name_for(table_name, taken):
+    """File-system-safe, unique (case-insensitively) file name stem for a table."""
+    stem = re.sub(r'[\\/:*?"<>|]', '_', str(table_name)).strip() or "table"
+    name, suffix = stem, 1
+    while name.lower() in {t.lower() for t in taken}:
+        name = f"{stem}_{suffix}"
+        suffix += 1
+    return name
+
+
+def _iter_chunks(data):
+    return [data] if isinstance(data, pd.DataFrame) else data
+
+
+def _slices(chunks, rows):
+    # Re-cuts chunks into slices of at most `rows` rows
+    for df in chunks:
+        for start in range(0, max(len(df), 1), rows):
+            yield df.iloc[start:start + rows]
+
+
+def _require_pyarrow(sink):
+    if pyarrow is None:
+        raise ImportError(f"the {sink} output needs pyarrow (pip install pyarrow)")
+
+
+def _arrow_chunks(chunks):
+    """
+    Converts DataFrame chunks to Arrow tables sharing the schema of the first
+    chunk, so later chunks (e.g. an all-null column) are cast to match.
+    """
+    schema = None
+    for df in chunks:
+        table = pyarrow.Table.from_pandas(df, schema=schema, preserve_index=False)
+        schema = table.schema
+        yield table
+
+
+def _write_tables(dataframes_dict, output_dir, name_map, suffix, write_table, max_workers=None):
+    """
+    Writes each table to <output_dir>/<safe name><suffix> with write_table(data, path).
+
+    Whole DataFrames are written concurrently in a thread pool (the Arrow
+    writers release the GIL); chunk iterables are consumed one after another
+    in dictionary order, since streamed tables share one Hyper connection.
+    Returns the list of files written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    taken = list(name_map.values()) if name_map is not None else []
+    names = {}
+    for table_name in dataframes_dict:
+        if name_map is not None and table_name in name_map:
+            names[table_name] = name_map[table_name]
+        else:
+            names[table_name] = safe_file_name_for(table_name, taken) + suffix
+            taken.append(names[table_name])
+
+    def write_one(table_name, data):
+        path = os.path.join(output_dir, names[table_name])
+        try:
+            rows = write_table(data, path)
+        except Exception as e:
+            print(f"❌ Error writing table '{table_name}' to {path}: {e}")
+            return None
+        print(f"✅ Written table '{table_name}' with {rows} rows to {path}")
+        return table_name
+
+    frames = {n: d for n, d in dataframes_dict.items() if isinstance(d, pd.DataFrame)}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(write_one, n, d) for n, d in frames.items()]
+        written = [write_one(n, d) for n, d in dataframes_dict.items() if n not in frames]
+        written += [future.result() for future in futures]
+
+    written = [n for n in written if n is not None]
+    if name_map is not None:
+        name_map.update((n, names[n]) for n in written)
+    return [names[n] for n in dataframes_dict if n in written]
+
+
+def write_excel(dataframes_dict, output_path, name_map=None, constant_memory=False, part_names=None):
+    """Excel sink: one workbook, one sheet per table (see write_dataframes_to_excel)."""
+    return write_dataframes_to_excel(dataframes_dict, output_path, name_map, constant_memory=constant_memory,
+                                     part_names=part_names)
+
+
+def write_excel_sheets(dataframes_dict, output_path, name_map=None, max_workers=None, constant_memory=False):
+    """Per-sheet Excel sink: one workbook per table, rendered in parallel (see write_sheets_parallel)."""
+    return write_sheets_parallel(dataframes_dict, output_path, name_map, max_workers, constant_memory)
+
+
+def write_parquet(dataframes_dict, output_path, name_map=None, compression="snappy", max_workers=None):
+    """Parquet sink: one .parquet file per table in the output_path directory."""
+    _require_pyarrow("Parquet")
+
+    def write_table(data, path):
+        rows = 0
+        writer = None
+        try:
+            for table in _arrow_chunks(_iter_chunks(data)):
+                if writer is None:
+                    writer = pyarrow.parquet.ParquetWriter(path, table.schema, compression=compression)
+                writer.write_table(table)
+                rows += table.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+
+    return _write_tables(dataframes_dict, output_path, name_map, ".parquet", write_table, max_workers)
+
+
+def write_partitioned_parquet(dataframes_dict, output_path, name_map=None, partition_cols=None,
+                              compression="snappy", max_workers=None):
+    """
+    Partitioned Parquet sink: one dataset directory per table. Tables having
+    the partition_cols are split Hive-style (col=value/ folders); others
+    into part files of at most PARTITION_ROWS rows.
+    """
+    _require_pyarrow("Parquet")
+
+    def write_table(data, path):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+        rows = 0
+        for i, table in enumerate(_arrow_chunks(_slices(_iter_chunks(data), PARTITION_ROWS))):
+            columns = [c for c in partition_cols or () if c in table.column_names]
+            if columns:
+                pyarrow.parquet.write_to_dataset(
+                    table, path, partition_cols=columns,
+                    basename_template=f"part-{i:05d}-{{i}}.parquet", compression=compression,
+                )
+            else:
+                pyarrow.parquet.write_table(table, os.path.join(path, f"part-{i:05d}.parquet"), compression=compression)
+            rows += table.num_rows
+        return rows
+
+    return _write_tables(dataframes_dict, output_path, name_map, "", write_table, max_workers)
+
+
+def write_csv(dataframes_dict, output_path, name_map=None, compression="gzip", max_workers=None):
+    """
+    CSV sink: one (compressed) .csv file per table in the output_path directory.
+    Uses pyarrow's multi-threaded CSV writer when available, pandas otherwise;
+    tables are written concurrently (see _write_tables).
+    """
+    suffix = ".csv" + (CSV_COMPRESSION_SUFFIXES[compression] if compression else "")
+
+    def write_table(data, path):
+        rows = 0
+        if pyarrow is not None:
+            with pyarrow.CompressedOutputStream(path, compression) if compression else pyarrow.OSFile(path, "wb") as sink:
+                writer = None
+                for table in _arrow_chunks(_iter_chunks(data)):
+                    if writer is None:
+                        writer = pyarrow.csv.CSVWriter(sink, table.schema)
+                    writer.write_table(table)
+                    rows += table.num_rows
+                if writer is not None:
+                    writer.close()
+            return rows
+        for df in _iter_chunks(data):
+            df.to_csv(path, mode="w" if rows == 0 else "a", index=False, header=rows == 0, compression=compression)
+            rows += len(df)
+        return rows
+
+    return _write_tables(dataframes_dict, output_path, name_map, suffix, write_table, max_workers)
+
+
+def write_feather(dataframes_dict, output_path, name_map=None, compression="zstd", max_workers=None):
+    """Feather (Arrow IPC file) sink: one .feather file per table in the output_path directory."""
+    _require_pyarrow("Feather")
+
+    def write_table(data, path):
+        rows = 0
+        writer = None
+        options = pyarrow.ipc.IpcWriteOptions(compression=compression)
+        try:
+            for table in _arrow_chunks(_iter_chunks(data)):
+                if writer is None:
+                    writer = pyarrow.ipc.new_file(path, table.schema, options=options)
+                writer.write_table(table)
+                rows += table.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+
+    return _write_tables(dataframes_dict, output_path, name_map, ".feather", write_table, max_workers)
+
+
+# Output formats: name -> (writer, suffix of the output path). Every writer takes
+# (dataframes_dict, output_path, name_map=None, **options), accepts a DataFrame
+# or an iterable of chunks per table, fills name_map with the sheet or file
+# name of each table written and returns the list of those names.
+SINKS = {
+    "excel": (write_excel, ".xlsx"),
+    "excel-sheets": (write_excel_sheets, "_xlsx"),
+    "parquet": (write_parquet, "_parquet"),
+    "partitioned-parquet": (write_partitioned_parquet, "_dataset"),
+    "csv": (write_csv, "_csv"),
+    "feather": (write_feather, "_feather"),
+}
+
+
+def output_path_for(output_format, output_dir, base_name):
+    """Where a workbook's output goes: a workbook file, or a directory of table files."""
+    return os.path.join(output_dir, base_name + SINKS[output_format][1])
+
+
+def sink_option_names(output_format):
+    """Names of the keyword options the writer of output_format accepts."""
+    writer, _ = SINKS[output_format]
+    parameters = list(inspect.signature(writer).parameters)
+    return parameters[3:]   # after dataframes_dict, output_path and name_map
+
+
+def remove_tables(output_path, names):
+    """Deletes table files (or dataset directories) of a directory sink."""
+    for name in names:
+        path = os.path.join(output_path, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+        print(f"🗑 Removed {path}")
+
+
+def write_outputs(dataframes_dict, output_format, output_path, name_map=None, **options):
+    """
+    Writes the tables with the sink selected by output_format (see SINKS).
+    Options the sink does not take (e.g. compression for Excel) are ignored
+    with a warning.
+    Returns the list of sheet or file names written.
+    """
+    if output_format not in SINKS:
+        print(f"❌ Unknown output format '{output_format}'. Choose from: {', '.join(SINKS)}")
+        return []
+    if not dataframes_dict:
+        print("❌ No data to write.")
+        return []
+    writer, _ = SINKS[output_format]
+    supported = sink_option_names(output_format)
+    for name in [name for name in options if name not in supported]:
+        print(f"⚠ Ignoring option '{name}': the {output_format} output does not support it.")
+        del options[name]
+    try:
+        return writer(dataframes_dict, output_path, name_map, **options)
+    except ImportError as e:
+        print(f"❌ Cannot write {output_format} output: {e}")
+        return []
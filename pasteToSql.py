@@ -1,20 +1,34 @@
+import json
 import os
 import pandas as pd
-import pyodbc
 import warnings
-from dataset_automate import process_twbx_file
+from contextlib import contextmanager
+from extract_twbx import get_directories
+from sql_pool import ConnectionPool, DEFAULT_POOL_SIZE, load_tables_parallel, print_load_report
+from sql_backends import get_backend, column_buffers, iter_row_batches
+import load_state
 
 # Connection helper using context managers
-def get_connection():
-    conn_str = (
-        r"Driver={ODBC Driver 18 for SQL Server};"
-        r"Server=tcp:decision.database.windows.net,1433;"
-        r"Database=finalDecision;"
-        r"Uid=priyank;"
-        r"Pwd=530228@mka;"
-        r"Encrypt=yes;TrustServerCertificate=yes;Connection Timeout=30;"
-    )
-    return pyodbc.connect(conn_str)
+def get_connection(backend=None):
+    """
+    Opens a connection to the configured database (see sql_backends: the
+    settings come from db_config.json or TABTOPBI_DB_* environment variables).
+    """
+    return (backend or get_backend()).connect()
+
+@contextmanager
+def borrow_connection(pool=None, backend=None):
+    """A connection from pool, or a new one (committed and closed on exit) without a pool."""
+    if pool is not None:
+        with pool.connection() as conn:
+            yield conn
+        return
+    conn = get_connection(backend)
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
 
 def auto_convert_column(series, threshold=0.8):
     """Convert series to datetime if most values can be converted."""
@@ -23,16 +37,12 @@ def auto_convert_column(series, threshold=0.8):
         converted = pd.to_datetime(series, errors='coerce')
     return converted if converted.notna().sum() >= threshold * len(converted) else series
 
-def map_dtype(series):
-    """Map a pandas series to a SQL Server data type."""
-    if pd.api.types.is_integer_dtype(series.dtype):
-        return "INT"
-    elif pd.api.types.is_float_dtype(series.dtype):
-        return "FLOAT"
-    elif pd.api.types.is_datetime64_any_dtype(series.dtype):
-        return "DATE"
-    else:
-        return "NVARCHAR(255)"
+def map_dtype(series, backend=None, precise=True):
+    """
+    Map a pandas series to a column type of the database backend; on SQL
+    Server the narrowest type for the values it holds (see schema_profile).
+    """
+    return (backend or get_backend()).column_type(series, precise)
 
 def encode_sheet_name(sheet_name):
     """Encode the sheet name as a reversible hexadecimal string."""
@@ -53,88 +63,295 @@ def clean_column_name(col):
     clean = clean.replace('(', '_').replace(')', '')
     return clean.strip()
 
-def create_table_and_insert_data(excel_file_path):
-    """Load Excel data and insert into SQL Server, skipping the Column_Metadata sheet."""
+def workbook_base_name(excel_path):
+    """
+    Base name used to prefix table names: the workbook's name, or for a
+    per-sheet output directory ("<name>_xlsx") the name of the workbook it replaces.
+    """
+    name = os.path.basename(os.path.normpath(excel_path))
+    if os.path.isdir(excel_path):
+        return name[:-len("_xlsx")] if name.endswith("_xlsx") else name
+    return os.path.splitext(name)[0]
+
+def iter_excel_sheets(excel_path):
+    """
+    Yields (sheet_name, ExcelFile) for every sheet of a workbook, or of every
+    workbook in a per-sheet output directory (see write_to_excel.write_sheets_parallel).
+    """
+    if os.path.isdir(excel_path):
+        paths = [os.path.join(excel_path, f) for f in sorted(os.listdir(excel_path)) if f.lower().endswith(".xlsx")]
+    else:
+        paths = [excel_path]
+    for path in paths:
+        xls = pd.ExcelFile(path)
+        for sheet_name in xls.sheet_names:
+            yield sheet_name, xls
+
+def create_table(conn, cursor, table_name, df, backend=None, precise=True):
+    """
+    Creates table_name with one column per DataFrame column, typed from its
+    values (or with precise=False only its dtype, see map_dtype), under its
+    name cleaned for SQL.
+    """
+    backend = backend or get_backend()
+    # Build the CREATE TABLE SQL statement.
+    columns = [(clean_column_name(str(col)), map_dtype(series, backend, precise)) for col, series in df.items()]
+    create_table_sql = backend.create_table_sql(table_name, columns)
+    print(f"Creating table: {table_name}")
+    print("Create Table SQL:")
+    print(create_table_sql)
+    cursor.execute(create_table_sql)
+    conn.commit()
+
+def insert_dataframe(conn, cursor, table_name, df, batch_size=10000, backend=None, bulk=None):
+    """
+    Inserts the DataFrame's rows into table_name in batches of batch_size rows,
+    or with bulk=True through the backend's bulk path (a staged file loaded by
+    bcp/BULK INSERT or COPY, see sql_backends). bulk=None picks bulk mode for
+    tables of at least the backend's bulk_threshold rows.
+    """
+    backend = backend or get_backend()
+    columns = [clean_column_name(str(col)) for col in df.columns]
+    if bulk is None:
+        bulk = len(df) >= backend.bulk_threshold
+    if bulk:
+        print(f"Bulk loading {len(df)} rows into {table_name}")
+        backend.bulk_load(conn, cursor, table_name, columns, df)
+    else:
+        backend.insert_dataframe(conn, cursor, table_name, columns, df, batch_size)
+    return len(df)
+
+def replace_table(conn, table_name, df, backend=None, bulk=None, precise=True):
+    """
+    (Re)creates table_name from the DataFrame and inserts its rows; safe to
+    retry, since a partly loaded table from an earlier attempt is dropped.
+    """
+    backend = backend or get_backend()
+    cursor = conn.cursor()
+    cursor.execute(backend.drop_table_sql(table_name))
+    conn.commit()
+    create_table(conn, cursor, table_name, df, backend, precise)
+    return insert_dataframe(conn, cursor, table_name, df, backend=backend, bulk=bulk)
+
+def load_dataframes_parallel(dataframes_dict, base_name, pool, backend=None, bulk=None):
+    """
+    Loads every sheet except Column_Metadata into its own table, several at
+    once over the pool's connections, retrying a failed table from scratch.
+    Values of dataframes_dict may be DataFrames or functions returning one.
+    Table names are encoded as in create_table_and_insert_data; bulk selects
+    the insert path as in insert_dataframe.
+    Returns the per-table results of sql_pool.load_tables_parallel.
+    """
+    tables = {
+        f"{base_name}_{encode_sheet_name(sheet_name)}": data
+        for sheet_name, data in dataframes_dict.items() if sheet_name != "Column_Metadata"
+    }
+    backend = backend or get_backend()
+    results = load_tables_parallel(
+        tables, lambda conn, table_name, df: replace_table(conn, table_name, df, backend, bulk), pool
+    )
+    print_load_report(results)
+    return results
+
+def _as_column_list(columns):
+    if not columns:
+        return []
+    return [columns] if isinstance(columns, str) else list(columns)
+
+def table_exists(cursor, table_name, backend=None):
+    backend = backend or get_backend()
+    cursor.execute(backend.list_tables_sql())
+    return table_name.lower() in (row[0].lower() for row in cursor.fetchall())
+
+def upsert_table(conn, table_name, df, backend=None, key=None, watermark=None, bulk=None, state_dir=None):
+    """
+    Brings table_name up to date with the DataFrame, sending only rows that
+    are new or changed since the last load instead of reloading the table.
+
+    Rows to send are picked by the watermark column (rows above the value
+    saved by the last load, or the table's MAX if none was saved) and, for
+    tables with a key but no watermark, by comparing row hashes with those
+    saved by the last load (see load_state). With key columns the rows are
+    merged on the key (MERGE on SQL Server), otherwise appended. Either way
+    they are staged in a temporary table and applied in one transaction, so
+    a failed attempt leaves the table as it was and can be retried.
+    Rows deleted from the source are not deleted from the table.
+
+    A table that does not exist yet, or whose columns changed, is (re)created
+    and fully loaded, with column types wide enough for the rows to come.
+
+    Args:
+        key: Column (or list of columns) identifying a row; values must be unique and non-null.
+        watermark: Column that only increases for new or changed rows, e.g. a modified date or ID.
+        bulk: Insert path of a full load, as in insert_dataframe.
+        state_dir: Directory of the load state (load_state.STATE_DIR by default).
+    Returns:
+        Number of rows sent to the database.
+    """
+    backend = backend or get_backend()
+    cursor = backend.cursor(conn)
+    state_key = load_state.table_key(backend, table_name)
+    key_columns = _as_column_list(key)
+    columns = [clean_column_name(str(col)) for col in df.columns]
+    sql_keys = [clean_column_name(str(col)) for col in key_columns]
+    state = load_state.load_table_state(state_key, state_dir)
+    # Row hashes are only kept for tables without a watermark to filter on
+    track_rows = bool(key_columns) and not watermark
+
+    existing = backend.table_columns(cursor, table_name) if table_exists(cursor, table_name, backend) else None
+    if existing is None or [c.lower() for c in existing] != [c.lower() for c in columns]:
+        if existing is not None:
+            print(f"⚠ Columns of {table_name} changed; reloading the whole table")
+        sent = replace_table(conn, table_name, df, backend, bulk, precise=False)
+        mark = df[watermark].max() if watermark and len(df) else None
+    else:
+        delta = df
+        mark = None
+        if watermark:
+            saved = state.get("watermark")
+            if saved is None:
+                cursor.execute(backend.max_value_sql(table_name, clean_column_name(str(watermark))))
+                saved = cursor.fetchone()[0]
+            mark = load_state.watermark_from_json(saved, df[watermark])
+            if mark is not None:
+                # Keyed rows at the watermark itself are merged again, in case
+                # more rows with that value arrived after the last load
+                delta = df[df[watermark] >= mark] if key_columns else df[df[watermark] > mark]
+            if len(df):
+                mark = df[watermark].max() if mark is None else max(mark, df[watermark].max())
+        if track_rows:
+            previous = load_state.load_row_hashes(state_key, state_dir)
+            if previous is not None:
+                delta = delta[load_state.changed_rows(load_state.row_hashes(delta, key_columns), previous)]
+        if key_columns and delta.duplicated(key_columns).any():
+            print(f"⚠ Duplicate keys in {table_name}; keeping the last row of each")
+            delta = delta.drop_duplicates(key_columns, keep="last")
+
+        sent = len(delta)
+        if delta.empty:
+            print(f"♻ {table_name} is up to date ({len(df)} rows unchanged)")
+        else:
+            stage_name = backend.stage_table_name(table_name)
+            cursor.execute(backend.create_stage_sql(stage_name, table_name))
+            in_transaction = False
+            try:
+                backend.insert_dataframe(conn, cursor, stage_name, columns, delta)
+                backend.begin(conn)
+                in_transaction = True
+                for statement in backend.merge_sql(table_name, stage_name, columns, sql_keys):
+                    cursor.execute(statement)
+                conn.commit()
+            except Exception:
+                # Only the merge runs in a transaction; the staged rows are dropped below
+                if in_transaction:
+                    conn.rollback()
+                raise
+            finally:
+                cursor.execute(backend.drop_table_sql(stage_name))
+                conn.commit()
+            action = "Merged" if key_columns else "Appended"
+            print(f"🔁 {action} {sent} new or changed rows into {table_name} ({len(df) - sent} unchanged)")
+
+    load_state.save_table_state(state_key, {
+        "watermark": load_state.watermark_to_json(mark),
+        "rows": len(df),
+        "loaded_at": pd.Timestamp.now().isoformat(timespec="seconds"),
+    }, state_dir)
+    if track_rows:
+        load_state.save_row_hashes(state_key, load_state.row_hashes(df, key_columns), state_dir)
+    return sent
+
+def load_dataframes_incremental(dataframes_dict, pool, backend=None, settings=None, bulk=None, state_dir=None):
+    """
+    Loads every sheet except Column_Metadata into the table of the same name
+    (the name rename_tables gives it), several at once over the pool, with
+    upsert_table for sheets that have settings and a full reload otherwise.
+
+    settings maps sheet names to {"key": column or [columns], "watermark":
+    column}; by default the backend's "incremental" setting (db_config.json).
+    Returns the per-table results of sql_pool.load_tables_parallel.
+    """
+    backend = backend or get_backend()
+    if settings is None:
+        settings = backend.config.get("incremental", {})
+        if isinstance(settings, str):   # from TABTOPBI_DB_INCREMENTAL
+            settings = json.loads(settings)
+    tables = {sheet_name: data for sheet_name, data in dataframes_dict.items() if sheet_name != "Column_Metadata"}
+    for sheet_name in tables:
+        if sheet_name not in settings:
+            print(f"⚠ No incremental settings for {sheet_name}; it is reloaded in full")
+
+    def load(conn, table_name, df):
+        table_settings = settings.get(table_name)
+        if table_settings is None:
+            return replace_table(conn, table_name, df, backend, bulk)
+        return upsert_table(conn, table_name, df, backend, table_settings.get("key"),
+                            table_settings.get("watermark"), bulk, state_dir)
+
+    results = load_tables_parallel(tables, load, pool)
+    print_load_report(results)
+    return results
+
+def read_excel_sheet(xls, sheet_name):
+    """Reads a sheet back from Excel, re-detecting date columns stored as text."""
+    df = pd.read_excel(xls, sheet_name=sheet_name)
+
+    # Attempt automatic conversion for columns with object dtype.
+    for col in df.columns:
+        if df[col].dtype == 'object':
+            df[col] = auto_convert_column(df[col])
+    return df
+
+def create_table_and_insert_data(excel_file_path, pool=None, backend=None, bulk=None, incremental=False):
+    """
+    Load Excel data and insert into SQL Server, skipping the Column_Metadata sheet.
+    excel_file_path may also be a directory holding one workbook per sheet.
+    bulk: True loads every sheet in bulk mode, False never; None (default)
+    only sheets above the backend's row threshold (see insert_dataframe).
+    incremental: Update the tables named after the sheets in place, sending
+    only new and changed rows (see load_dataframes_incremental), instead of
+    loading new encoded-name tables to be renamed.
+    """
     if not os.path.exists(excel_file_path):
         print(f"❌ Error: Excel file not found at {excel_file_path}")
         return
 
-    xls = pd.ExcelFile(excel_file_path)
-    base_name = os.path.splitext(os.path.basename(excel_file_path))[0]
-
-    with get_connection() as conn:
-        with conn.cursor() as cursor:
-            for sheet_name in xls.sheet_names:
-                # Skip the metadata sheet
-                if sheet_name == "Column_Metadata":
-                    continue
-
-                # Encode the sheet name
-                encoded_sheet_name = encode_sheet_name(sheet_name)
-                table_name = f"{base_name}_{encoded_sheet_name}"
-
-                # Read the sheet into a DataFrame.
-                df = pd.read_excel(xls, sheet_name=sheet_name)
-
-                # Attempt automatic conversion for columns with object dtype.
-                for col in df.columns:
-                    if df[col].dtype == 'object':
-                        df[col] = auto_convert_column(df[col])
-
-                # Clean column names for SQL.
-                cleaned_cols = [clean_column_name(col) for col in df.columns]
-                df.columns = cleaned_cols
-
-                # Build the CREATE TABLE SQL statement.
-                columns = [f"[{col}] {map_dtype(df[col])}" for col in df.columns]
-                create_table_sql = f"CREATE TABLE [{table_name}] (\n  " + ",\n  ".join(columns) + "\n);"
-                print(f"Creating table: {table_name}")
-                print("Create Table SQL:")
-                print(create_table_sql)
-                cursor.execute(create_table_sql)
-                conn.commit()
+    base_name = workbook_base_name(excel_file_path)
+    sheets = {
+        sheet_name: read_excel_sheet(xls, sheet_name)
+        for sheet_name, xls in iter_excel_sheets(excel_file_path)
+        if sheet_name != "Column_Metadata"
+    }
+
+    def load(pool):
+        if incremental:
+            return load_dataframes_incremental(sheets, pool, backend, bulk=bulk)
+        return load_dataframes_parallel(sheets, base_name, pool, backend, bulk)
+
+    if pool is not None:
+        return load(pool)
+    backend = backend or get_backend()
+    with ConnectionPool(backend.connect, DEFAULT_POOL_SIZE) as pool:
+        return load(pool)
 
-                # Prepare the INSERT statement.
-                placeholders = ", ".join("?" for _ in df.columns)
-                columns_sql = ", ".join(f"[{col}]" for col in df.columns)
-                insert_sql = f"INSERT INTO {table_name} ({columns_sql}) VALUES ({placeholders})"
-                print("Insert SQL:")
-                print(insert_sql)
-                cursor.fast_executemany = True
-
-                # Batch insert using executemany.
-                batch_size = 10000
-                data_batch = []
-                for i, (_, row) in enumerate(df.iterrows(), start=1):
-                    row_values = tuple(None if pd.isna(val) else val for val in row)
-                    data_batch.append(row_values)
-                    if i % batch_size == 0:
-                        cursor.executemany(insert_sql, data_batch)
-                        conn.commit()
-                        data_batch = []
-                if data_batch:
-                    cursor.executemany(insert_sql, data_batch)
-                    conn.commit()
-
-                print(f"Data inserted successfully into table: {table_name}\n")
-
-def get_all_table_names():
-    """Fetch all table names from the SQL Server database."""
-    with get_connection() as conn:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE'")
-            tables = [row[0] for row in cursor.fetchall()]
+def get_all_table_names(pool=None, backend=None):
+    """Fetch all table names from the database."""
+    backend = backend or get_backend()
+    with borrow_connection(pool, backend) as conn:
+        cursor = conn.cursor()
+        cursor.execute(backend.list_tables_sql())
+        tables = [row[0] for row in cursor.fetchall()]
     return tables
 
-def get_filtered_decoded_table_names(excel_path):
+def get_filtered_decoded_table_names(excel_path, pool=None, backend=None):
     """
     Retrieve and filter table names from the database based on the TWBX file's base name.
     Skip tables with decoded name "Column_Metadata".
     Returns a dictionary mapping the original table name to the decoded name.
     """
-    base_name = os.path.splitext(os.path.basename(excel_path))[0]
+    base_name = workbook_base_name(excel_path)
     mapping = {}
-    for table in get_all_table_names():
+    for table in get_all_table_names(pool, backend):
         if table.startswith(base_name + "_"):
             encoded_part = table[len(base_name) + 1:]
             decoded = decode_sheet_name(encoded_part)
@@ -143,20 +360,21 @@ def get_filtered_decoded_table_names(excel_path):
             mapping[table] = decoded
     return mapping
 
-def rename_tables(rename_mapping):
+def rename_tables(rename_mapping, pool=None, backend=None):
     """
-    Rename SQL tables using sp_rename so that the table name becomes the decoded name.
+    Rename SQL tables (sp_rename on SQL Server) so that the table name becomes the decoded name.
     Skip renaming for any table mapped to "Column_Metadata".
     """
-    with get_connection() as conn:
-        with conn.cursor() as cursor:
-            for original, decoded in rename_mapping.items():
-                if decoded == "Column_Metadata":
-                    continue
-                rename_sql = f"EXEC sp_rename '{original}', '{decoded}'"
-                print(f"Renaming table: {original} --> {decoded}")
-                cursor.execute(rename_sql)
-                conn.commit()
+    backend = backend or get_backend()
+    with borrow_connection(pool, backend) as conn:
+        cursor = conn.cursor()
+        for original, decoded in rename_mapping.items():
+            if decoded == "Column_Metadata":
+                continue
+            rename_sql = backend.rename_table_sql(original, decoded)
+            print(f"Renaming table: {original} --> {decoded}")
+            cursor.execute(rename_sql)
+            conn.commit()
 
 def generate_mscript_for_sql(server_name, database_name, selected_tables):
     """
@@ -228,22 +446,51 @@ in
     return mscript
 
 if __name__ == '__main__':
+    # Imported here: extraction needs the Tableau Hyper API, loading does not
+    from dataset_automate import process_twbx_file
+
     twbx_file = input("🔹 Enter the path to the Tableau .twbx file: ").strip()
     if not os.path.exists(twbx_file):
         print("❌ Error: The provided .twbx file does not exist.")
     else:
-        excel_path = process_twbx_file(twbx_file)
-        create_table_and_insert_data(excel_path)
-        table_mapping = get_filtered_decoded_table_names(excel_path)
-        rename_tables(table_mapping)
-
-        # Generate the list of decoded table names (for SQL tables) to pass to the M script.
-        selected_tables = list(table_mapping.values())
-
-        SERVER_NAME = "decision.database.windows.net"
-        DATABASE_NAME = "finalDecision"
-        mscript = generate_mscript_for_sql(SERVER_NAME, DATABASE_NAME, selected_tables)
-        MSCRIPT_FILE = os.path.join(os.path.dirname(excel_path), "powerbi_mscript_sql.txt")
-        with open(MSCRIPT_FILE, "w", encoding="utf-8") as file:
-            file.write(mscript)
-        print(f"\n✅ Power BI M script (SQL version) saved to: {MSCRIPT_FILE}")
+        write_excel = input("🔹 Also write the Excel workbook? [y/N]: ").strip().lower() in ("y", "yes")
+        incremental = input("🔹 Update existing tables with new and changed rows only? [y/N]: ").strip().lower() in ("y", "yes")
+        base_name = workbook_base_name(twbx_file)
+
+        # Load the extracted DataFrames straight into the database (no Excel
+        # round trip), several tables at once over a pool of connections
+        backend = get_backend()
+        chunks = {}
+        process_twbx_file(
+            twbx_file, output_format="excel" if write_excel else None,
+            table_loader=lambda sheet_name, df: chunks.setdefault(sheet_name, []).append(df),
+        )
+        # Streamed tables arrive in several chunks (once per chunk_size rows)
+        tables = {
+            sheet_name: parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+            for sheet_name, parts in chunks.items()
+        }
+        with ConnectionPool(backend.connect, int(backend.config.get("pool_size", DEFAULT_POOL_SIZE))) as pool:
+            if incremental:
+                # Tables keep their final names between runs and are updated in place
+                results = load_dataframes_incremental(tables, pool, backend)
+                selected_tables = [r["table"] for r in results if r["status"] == "ok"]
+            else:
+                load_dataframes_parallel(tables, base_name, pool, backend)
+                table_mapping = get_filtered_decoded_table_names(twbx_file, pool, backend)
+                rename_tables(table_mapping, pool, backend)
+                # Generate the list of decoded table names (for SQL tables) to pass to the M script.
+                selected_tables = list(table_mapping.values())
+
+        if backend.name != "sqlserver":
+            print(f"⚠ Loaded into {backend.name}; the Power BI M script is only generated for SQL Server.")
+        else:
+            # e.g. "tcp:myserver.database.windows.net,1433" -> "myserver.database.windows.net"
+            SERVER_NAME = backend.config.get("server", "").removeprefix("tcp:").split(",")[0]
+            DATABASE_NAME = backend.config.get("database", "")
+            mscript = generate_mscript_for_sql(SERVER_NAME, DATABASE_NAME, selected_tables)
+            _, OUTPUT_DIR, _ = get_directories()
+            MSCRIPT_FILE = os.path.join(OUTPUT_DIR, "powerbi_mscript_sql.txt")
+            with open(MSCRIPT_FILE, "w", encoding="utf-8") as file:
+                file.write(mscript)
+            print(f"\n✅ Power BI M script (SQL version) saved to: {MSCRIPT_FILE}")
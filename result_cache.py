@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+import zipfile
+import pandas as pd
+from extract_twbx import get_directories
+
+# On-disk cache of conversion results, addressed by content hashes:
+#   metadata/<twb hash>/       parsed table mapping, relations and calculated fields
+#   tables/<tables key>/       one Parquet file per table extracted from a .hyper
+#                              (its hash and the extraction backend)
+#   outputs/<result hash>/     final output files of a whole conversion
+# Entries are evicted least-recently-used first once the cache outgrows its size.
+_, _OUTPUT_DIR, _ = get_directories()
+CACHE_DIR = os.path.join(_OUTPUT_DIR, "cache")
+MAX_CACHE_BYTES = 5 * 1024 ** 3
+
+_READ_SIZE = 1024 * 1024
+
+# Layout version of the manifests written next to outputs; others are ignored
+MANIFEST_VERSION = 3
+
+
+def _digest(*parts):
+    sha = hashlib.sha256()
+    for part in parts:
+        sha.update(str(part).encode("utf-8"))
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+
+def twb_hash(twbx_file):
+    """SHA-256 of the workbook XML (.twb members), streamed from the archive."""
+    sha = hashlib.sha256()
+    with zipfile.ZipFile(twbx_file, 'r') as zip_ref:
+        for member in sorted(zip_ref.namelist()):
+            if member.lower().endswith('.twb'):
+                sha.update(member.encode("utf-8"))
+                with zip_ref.open(member) as stream:
+                    for block in iter(lambda: stream.read(_READ_SIZE), b""):
+                        sha.update(block)
+    return sha.hexdigest()
+
+
+def hyper_hashes(twbx_file):
+    """SHA-256 of each .hyper member's content, by file name, streamed from the archive."""
+    hashes = {}
+    with zipfile.ZipFile(twbx_file, 'r') as zip_ref:
+        for member in zip_ref.infolist():
+            if member.filename.lower().endswith('.hyper'):
+                sha = hashlib.sha256()
+                with zip_ref.open(member) as stream:
+                    for block in iter(lambda: stream.read(_READ_SIZE), b""):
+                        sha.update(block)
+                hashes[os.path.basename(member.filename)] = sha.hexdigest()
+    return hashes
+
+
+def tables_key(hyper_key, extract_backend):
+    """Key of the tables extracted from a .hyper file; each backend gives its own dtypes."""
+    return _digest("tables", hyper_key, extract_backend)
+
+
+def formula_hash(table_mapping, table_names, calculated_fields):
+    """Hash of the parsed metadata that shapes the output (mappings and formulas)."""
+    return _digest(json.dumps([table_mapping, table_names, calculated_fields], sort_keys=True))
+
+
+def rows_hash(rows):
+    """Hash of JSON-serializable rows, e.g. a DataFrame's to_dict('records')."""
+    return _digest(json.dumps(rows, sort_keys=True, default=str))
+
+
+def result_hash(hyper_keys, formulas_key, *options):
+    """Key of a whole conversion: its data, its formulas and any output-affecting options."""
+    return _digest(*sorted(hyper_keys.items()), formulas_key, *options)
+
+
+def _entry_dir(stage, key, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, stage, key)
+
+
+def _lookup(stage, key, cache_dir=None):
+    """Returns the entry directory on a hit (marking it recently used), else None."""
+    path = _entry_dir(stage, key, cache_dir)
+    if not os.path.isdir(path):
+        return None
+    os.utime(path)
+    return path
+
+
+def _store(stage, key, fill, cache_dir=None):
+    """
+    Creates an entry by letting fill(temp_dir) write into a private directory,
+    then moving it into place, so readers never see a half-written entry.
+    """
+    path = _entry_dir(stage, key, cache_dir)
+    temp_dir = f"{path}.{uuid.uuid4().hex}.tmp"
+    os.makedirs(temp_dir)
+    try:
+        fill(temp_dir)
+        try:
+            os.replace(temp_dir, path)
+        except OSError:
+            # another process stored the same entry first
+            pass
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return path
+
+
+def load_metadata(key, cache_dir=None):
+    """Returns (table_mapping, table_names, calculated_fields) for a .twb hash, or None."""
+    path = _lookup("metadata", key, cache_dir)
+    if path is None:
+        return None
+    with open(os.path.join(path, "metadata.json"), 'r', encoding='utf-8') as f:
+        return tuple(json.load(f))
+
+
+def store_metadata(key, metadata, cache_dir=None):
+    def fill(temp_dir):
+        with open(os.path.join(temp_dir, "metadata.json"), 'w', encoding='utf-8') as f:
+            json.dump(list(metadata), f)
+    _store("metadata", key, fill, cache_dir)
+
+
+def load_tables(key, cache_dir=None):
+    """Returns the {sheet_name: DataFrame} dict cached under a tables_key, or None."""
+    path = _lookup("tables", key, cache_dir)
+    if path is None:
+        return None
+    with open(os.path.join(path, "tables.json"), 'r', encoding='utf-8') as f:
+        files = json.load(f)
+    return {sheet_name: pd.read_parquet(os.path.join(path, file_name)) for sheet_name, file_name in files}
+
+
+def store_tables(key, sheet_data, cache_dir=None):
+    """
+    Caches the tables extracted from one .hyper file as Parquet.
+    Returns False (caching nothing) when they cannot be written, e.g. without pyarrow.
+    """
+    def fill(temp_dir):
+        files = []
+        for i, (sheet_name, df) in enumerate(sheet_data.items()):
+            file_name = f"table_{i}.parquet"
+            df.to_parquet(os.path.join(temp_dir, file_name))
+            files.append((sheet_name, file_name))
+        with open(os.path.join(temp_dir, "tables.json"), 'w', encoding='utf-8') as f:
+            json.dump(files, f)
+    try:
+        _store("tables", key, fill, cache_dir)
+        return True
+    except Exception as e:
+        print(f"⚠ Could not cache extracted tables: {e}")
+        return False
+
+
+def load_outputs(key, output_dir, cache_dir=None):
+    """Copies the cached output files of a conversion into output_dir; returns their paths or None."""
+    path = _lookup("outputs", key, cache_dir)
+    if path is None:
+        return None
+    os.makedirs(output_dir, exist_ok=True)
+    restored = []
+    for file_name in sorted(os.listdir(path)):
+        source, target = os.path.join(path, file_name), os.path.join(output_dir, file_name)
+        if os.path.isdir(source):
+            # directory outputs (one file per table) replace the previous ones
+            shutil.rmtree(target, ignore_errors=True)
+            shutil.copytree(source, target)
+        else:
+            shutil.copyfile(source, target)
+        restored.append(target)
+    return restored
+
+
+def store_outputs(key, output_paths, cache_dir=None):
+    def fill(temp_dir):
+        for output_path in output_paths:
+            target = os.path.join(temp_dir, os.path.basename(output_path))
+            if os.path.isdir(output_path):
+                shutil.copytree(output_path, target)
+            else:
+                shutil.copyfile(output_path, target)
+    _store("outputs", key, fill, cache_dir)
+
+
+def _tree_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return total
+
+
+def evict_cache(max_bytes=MAX_CACHE_BYTES, cache_dir=None):
+    """
+    Removes least-recently-used entries until the cache fits in max_bytes.
+    Returns the number of entries removed.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    entries = []
+    for stage in ("metadata", "tables", "outputs"):
+        stage_dir = os.path.join(cache_dir, stage)
+        if not os.path.isdir(stage_dir):
+            continue
+        for key in os.listdir(stage_dir):
+            path = os.path.join(stage_dir, key)
+            if key.endswith(".tmp"):
+                continue
+            try:
+                entries.append((os.path.getmtime(path), _tree_size(path), path))
+            except OSError:
+                pass
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed += 1
+    if removed:
+        print(f"🧹 Evicted {removed} cache entries; cache is now {total / 1024 ** 2:.1f} MB.")
+    return removed
+
+
+def sheet_fingerprint(hyper_key, sheet_name, fields):
+    """
+    Fingerprint of one output sheet: the .hyper content it comes from, its name
+    and the calculated field definitions applied to it.
+    """
+    formulas = {name: details.get('formula', '') for name, details in fields.items()}
+    return _digest(hyper_key, sheet_name, json.dumps(formulas, sort_keys=True))
+
+
+def manifest_path(output_path):
+    """The manifest kept next to an output (workbook or directory) for incremental runs."""
+    return os.path.splitext(output_path)[0] + ".manifest.json"
+
+
+def load_manifest(output_path):
+    """
+    Returns the manifest of the last run that wrote output_path, or None when
+    the output or its manifest is missing or unreadable.
+    """
+    path = manifest_path(output_path)
+    if not (os.path.exists(output_path) and os.path.exists(path)):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠ Ignoring unreadable manifest {path}: {e}")
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        print(f"⚠ Ignoring manifest {path} from an older version.")
+        return None
+    return manifest
+
+
+def save_manifest(output_path, manifest):
+    """
+    Writes the manifest for output_path. It records, per .hyper file, its content
+    key and the sheets it produced, and per sheet its fingerprint, output sheet
+    or file name and column descriptions.
+    """
+    path = manifest_path(output_path)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(temp_path, path)
+    return path
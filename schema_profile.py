@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+# Largest scale tried for DECIMAL(p,s), and the significant digits a float64
+# holds exactly enough to be stored as a decimal
+MAX_DECIMAL_SCALE = 6
+MAX_EXACT_DIGITS = 15
+
+# Largest precision of a SQL Server DECIMAL
+MAX_DECIMAL_PRECISION = 38
+
+# Column length limits of SQL Server; longer text needs (N)VARCHAR(MAX)
+MAX_VARCHAR = 8000
+MAX_NVARCHAR = 4000
+
+# Integer types by the range they hold (TINYINT is unsigned)
+INTEGER_TYPES = [
+    ("TINYINT", 0, 255),
+    ("SMALLINT", -2 ** 15, 2 ** 15 - 1),
+    ("INT", -2 ** 31, 2 ** 31 - 1),
+    ("BIGINT", -2 ** 63, 2 ** 63 - 1),
+]
+
+
+def is_integral(values):
+    """True when every value of a float array is a whole number."""
+    return bool(np.all(values == np.rint(values)))
+
+
+def _decimal_scale(values):
+    """Smallest scale (digits after the point) that represents every value exactly, or None."""
+    for scale in range(MAX_DECIMAL_SCALE + 1):
+        scaled = values * 10.0 ** scale
+        if np.all(np.abs(scaled - np.rint(scaled)) <= 1e-9 * np.maximum(1.0, np.abs(scaled))):
+            return scale
+    return None
+
+
+def _integer_digits(max_abs):
+    return int(np.floor(np.log10(max_abs))) + 1 if max_abs >= 1 else 1
+
+
+def _profile_decimals(values):
+    """
+    Profile of decimal.Decimal values (wide NUMERIC columns, see hyper_types):
+    the digits left and right of the point, read from each value's digits
+    and exponent.
+    """
+    integer_digits = 0
+    scale = 0
+    for value in values:
+        _, digits, exponent = value.as_tuple()
+        if not isinstance(exponent, int):
+            # Infinity (NaN is dropped as missing)
+            return {"kind": "float", "bits": 64}
+        integer_digits = max(integer_digits, len(digits) + exponent)
+        scale = max(scale, -exponent)
+    if integer_digits > MAX_DECIMAL_PRECISION:
+        return {"kind": "float", "bits": 64}
+    # Past 38 digits the fraction is rounded; the whole part always fits
+    scale = min(scale, MAX_DECIMAL_PRECISION - integer_digits)
+    return {"kind": "decimal", "precision": integer_digits + scale, "scale": scale}
+
+
+def profile_column(series):
+    """
+    Scans a column once (vectorized) and describes the values it actually holds.
+
+    Returns a dict with "kind" ("empty", "bool", "integer", "decimal", "float",
+    "date", "datetime", "text") and, depending on the kind: "min"/"max" for
+    integers, "precision"/"scale" for decimals, "fraction_digits" and "tz"
+    for datetimes, "max_length" and "ascii" for text.
+    """
+    values = series.dropna()
+    dtype = series.dtype
+    if values.empty:
+        return {"kind": "empty"}
+    if pd.api.types.is_bool_dtype(dtype):
+        return {"kind": "bool"}
+    if pd.api.types.is_integer_dtype(dtype):
+        return {"kind": "integer", "min": int(values.min()), "max": int(values.max())}
+    if pd.api.types.is_float_dtype(dtype):
+        numbers = values.to_numpy(dtype="float64")
+        if not np.isfinite(numbers).all():
+            return {"kind": "float", "bits": 64}
+        if is_integral(numbers) and np.abs(numbers).max() < 2 ** 63:
+            # whole numbers stored as floats (an integer column with missing values)
+            return {"kind": "integer", "min": int(numbers.min()), "max": int(numbers.max())}
+        scale = _decimal_scale(numbers)
+        digits = _integer_digits(float(np.abs(numbers).max()))
+        if scale is None or digits + scale > MAX_EXACT_DIGITS:
+            return {"kind": "float", "bits": 32 if dtype == np.float32 else 64}
+        return {"kind": "decimal", "precision": digits + scale, "scale": scale}
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        timestamps = values.dt.tz_localize(None) if values.dt.tz is not None else values
+        fraction = timestamps - timestamps.dt.floor("s")
+        if (fraction.dt.total_seconds() == 0).all():
+            fraction_digits = 0
+            if (timestamps == timestamps.dt.normalize()).all() and values.dt.tz is None:
+                return {"kind": "date"}
+        elif (fraction % pd.Timedelta(milliseconds=1) == pd.Timedelta(0)).all():
+            fraction_digits = 3
+        else:
+            fraction_digits = 7
+        return {"kind": "datetime", "fraction_digits": fraction_digits, "tz": values.dt.tz is not None}
+
+    inferred = pd.api.types.infer_dtype(values, skipna=True)
+    if inferred == "date":
+        return {"kind": "date"}
+    if inferred == "boolean":
+        return {"kind": "bool"}
+    if inferred == "integer":
+        return profile_column(values.astype("int64"))
+    if inferred == "decimal":
+        return _profile_decimals(values)
+    text = values.astype(str)
+    lengths = text.str.len()
+    # ASCII-only exactly when no character needs more than one UTF-8 byte
+    encoded_lengths = text.str.encode("utf-8").str.len()
+    return {
+        "kind": "text",
+        "max_length": int(lengths.max()),
+        "ascii": bool((encoded_lengths == lengths).all()),
+    }
+
+
+def _bucket(length, limit):
+    # Next power of two, so similar columns share a type and values can grow a little
+    size = 1
+    while size < length:
+        size *= 2
+    return str(size) if size <= limit else "MAX"
+
+
+def sql_server_type(profile):
+    """The narrowest SQL Server column type holding every value of a profiled column."""
+    kind = profile["kind"]
+    if kind == "empty":
+        return "NVARCHAR(255)"
+    if kind == "bool":
+        return "BIT"
+    if kind == "integer":
+        for type_name, low, high in INTEGER_TYPES:
+            if low <= profile["min"] and profile["max"] <= high:
+                return type_name
+        return "DECIMAL(38, 0)"
+    if kind == "decimal":
+        return f"DECIMAL({max(profile['precision'], 1)}, {profile['scale']})"
+    if kind == "float":
+        return "REAL" if profile["bits"] == 32 else "FLOAT"
+    if kind == "date":
+        return "DATE"
+    if kind == "datetime":
+        type_name = "DATETIMEOFFSET" if profile["tz"] else "DATETIME2"
+        return f"{type_name}({profile['fraction_digits']})"
+    if profile["ascii"]:
+        return f"VARCHAR({_bucket(profile['max_length'], MAX_VARCHAR)})"
+    return f"NVARCHAR({_bucket(profile['max_length'], MAX_NVARCHAR)})"
+
+
+def profile_dataframe(df):
+    """profile_column for every column, by column name."""
+    return {col: profile_column(series) for col, series in df.items()}
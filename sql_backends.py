@@ -0,0 +1,509 @@
+import csv
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import threading
+import uuid
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from extract_twbx import get_directories
+from schema_profile import profile_column, sql_server_type, is_integral
+
+try:
+    import pyodbc
+except ImportError:
+    pyodbc = None
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Database settings are read from this JSON file (or the one named by
+# $TABTOPBI_DB_CONFIG), then overridden by TABTOPBI_DB_<KEY> environment
+# variables, e.g. TABTOPBI_DB_BACKEND=sqlite TABTOPBI_DB_DATABASE=output/load.db.
+# See db_config.example.json. Keep credentials out of the source tree.
+_BASE_DIR, _OUTPUT_DIR, _ = get_directories()
+CONFIG_FILE = os.path.join(_BASE_DIR, "db_config.json")
+ENV_PREFIX = "TABTOPBI_DB_"
+
+# Tables of at least this many rows are bulk loaded from a staged file
+# (setting "bulk_threshold"); staged files go to "staging_dir"
+BULK_THRESHOLD_ROWS = 1_000_000
+STAGING_DIR = os.path.join(_OUTPUT_DIR, "bulk")
+
+# Field and row terminators of staged delimited files (ASCII unit and record
+# separators, which do not occur in ordinary text)
+FIELD_TERMINATOR = "\x1f"
+ROW_TERMINATOR = "\x1e"
+
+_lock = threading.Lock()
+_configured = None
+
+
+def column_buffers(df):
+    """
+    Converts a DataFrame to one list of ODBC-friendly values per column.
+    Each column is converted at once: numpy scalars are unboxed to Python
+    objects in bulk and missing values (NaN, NaT, NA) become None by mask.
+    Float columns of whole numbers are passed as ints, matching the integer
+    column types schema_profile gives them.
+    """
+    buffers = []
+    for _, series in df.items():
+        series = _as_integers(series)
+        values = series.to_numpy(dtype=object)
+        missing = series.isna().to_numpy()
+        if missing.any():
+            values[missing] = None
+        buffers.append(values)
+    return buffers
+
+
+def _as_integers(series):
+    # float column holding only whole numbers (and missing values) -> Int64
+    if pd.api.types.is_float_dtype(series.dtype):
+        numbers = series.dropna().to_numpy(dtype="float64")
+        if len(numbers) and np.isfinite(numbers).all() and is_integral(numbers) and np.abs(numbers).max() < 2 ** 63:
+            return series.astype("Int64")
+    return series
+
+
+def iter_row_batches(df, batch_size=10000):
+    """
+    Yields the DataFrame's rows as lists of at most batch_size tuples for
+    executemany, built from column buffers (see column_buffers) one batch at
+    a time, without a Series per row.
+    """
+    for start in range(0, len(df), batch_size):
+        yield list(zip(*column_buffers(df.iloc[start:start + batch_size])))
+
+
+@contextmanager
+def staged_file(staging_dir, suffix):
+    """A unique file path in staging_dir, deleted when the block ends."""
+    os.makedirs(staging_dir, exist_ok=True)
+    path = os.path.join(staging_dir, f"stage_{uuid.uuid4().hex}{suffix}")
+    try:
+        yield path
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def stage_delimited(df, path):
+    """
+    Writes the DataFrame as a headerless UTF-8 file delimited by
+    FIELD_TERMINATOR/ROW_TERMINATOR, with missing values as empty fields,
+    booleans as 1/0 and timestamps in ISO format (with their UTC offset
+    when timezone-aware, for DATETIMEOFFSET).
+    """
+    staged = {}
+    for col, series in df.items():
+        series = _as_integers(series)
+        text = pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories = series.cat.categories.dtype
+            text = pd.api.types.is_object_dtype(categories) or pd.api.types.is_string_dtype(categories)
+        if pd.api.types.is_bool_dtype(series.dtype):
+            series = series.astype("Int8")
+        elif isinstance(series.dtype, pd.DatetimeTZDtype):
+            # date_format below has no offset; +0100 is written as +01:00
+            offsets = series.dt.strftime("%z")
+            series = (series.dt.strftime("%Y-%m-%d %H:%M:%S.%f ")
+                      + offsets.str[:3] + ":" + offsets.str[3:])
+        elif pd.api.types.is_float_dtype(series.dtype):
+            # bulk copy reads DECIMAL columns without exponents: spell tiny and huge values out
+            magnitude = series.abs()
+            scientific = ((magnitude < 1e-4) & (magnitude > 0)) | (magnitude >= 1e16)
+            if scientific.any():
+                series = series.astype(object)
+                series[scientific] = series[scientific].map(lambda v: np.format_float_positional(v, trim="-"))
+        elif text:
+            # a terminator inside a value would shift the fields
+            series = series.astype("string").str.replace(f"[{FIELD_TERMINATOR}{ROW_TERMINATOR}]", " ", regex=True)
+        staged[col] = series
+    pd.DataFrame(staged).to_csv(
+        path, sep=FIELD_TERMINATOR, lineterminator=ROW_TERMINATOR, header=False, index=False,
+        na_rep="", date_format="%Y-%m-%d %H:%M:%S.%f", quoting=csv.QUOTE_NONE, encoding="utf-8",
+    )
+
+
+def load_db_config(path=None):
+    """
+    Returns the database settings as a dict (see CONFIG_FILE).
+
+    Keys: backend ("sqlserver", "sqlite" or "duckdb"); for SQL Server either
+    connection_string or driver, server, database, uid and pwd (plus an
+    optional options string); for SQLite and DuckDB database, the file path.
+    """
+    path = path or os.environ.get(ENV_PREFIX + "CONFIG") or CONFIG_FILE
+    config = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    for key, value in os.environ.items():
+        if key.startswith(ENV_PREFIX) and key != ENV_PREFIX + "CONFIG":
+            config[key[len(ENV_PREFIX):].lower()] = value
+    return config
+
+
+class SqlBackend:
+    """
+    What the load path needs from a database: connecting, quoting, type
+    mapping, DDL, inserting rows, renaming and listing tables. Subclasses
+    override the parts that differ from this ANSI-style default.
+    """
+    name = None
+
+    def __init__(self, config):
+        self.config = config
+
+    def connect(self):
+        raise NotImplementedError
+
+    def quote(self, identifier):
+        return '"' + str(identifier).replace('"', '""') + '"'
+
+    def cursor(self, conn):
+        """
+        Handle to run statements on, in the connection's own session (its
+        temporary tables and transaction).
+        """
+        return conn.cursor()
+
+    def begin(self, conn):
+        """Starts a transaction; DB-API drivers open one with the first statement."""
+
+    def column_type(self, series, precise=True):
+        """
+        Column type for a pandas Series. With precise=True it may be sized to
+        the values present (see schema_profile); precise=False gives a type
+        wide enough for any value of the dtype, for tables that are created
+        before all their rows are seen.
+        """
+        raise NotImplementedError
+
+    def create_table_sql(self, table_name, columns):
+        """CREATE TABLE for [(column name, column type), ...]."""
+        column_defs = ",\n  ".join(f"{self.quote(col)} {col_type}" for col, col_type in columns)
+        return f"CREATE TABLE {self.quote(table_name)} (\n  {column_defs}\n);"
+
+    def drop_table_sql(self, table_name):
+        return f"DROP TABLE IF EXISTS {self.quote(table_name)}"
+
+    def insert_sql(self, table_name, columns):
+        placeholders = ", ".join("?" for _ in columns)
+        columns_sql = ", ".join(self.quote(col) for col in columns)
+        return f"INSERT INTO {self.quote(table_name)} ({columns_sql}) VALUES ({placeholders})"
+
+    def insert_rows(self, conn, cursor, insert_sql, rows):
+        """Inserts one batch of row tuples."""
+        cursor.executemany(insert_sql, rows)
+
+    def insert_dataframe(self, conn, cursor, table_name, columns, df, batch_size=10000):
+        """
+        Inserts the DataFrame's rows into the given columns of table_name,
+        committing after every batch of batch_size rows.
+        """
+        insert_sql = self.insert_sql(table_name, columns)
+        print("Insert SQL:")
+        print(insert_sql)
+        for rows in iter_row_batches(df, batch_size):
+            self.insert_rows(conn, cursor, insert_sql, rows)
+            conn.commit()
+
+    @property
+    def bulk_threshold(self):
+        return int(self.config.get("bulk_threshold", BULK_THRESHOLD_ROWS))
+
+    @property
+    def staging_dir(self):
+        return self.config.get("staging_dir", STAGING_DIR)
+
+    def bulk_load(self, conn, cursor, table_name, columns, df):
+        """
+        Loads the DataFrame into a freshly created table_name with the
+        database's bulk facility. This default has none and inserts all
+        rows in a single batch.
+        """
+        self.insert_dataframe(conn, cursor, table_name, columns, df, batch_size=max(len(df), 1))
+
+    def rename_table_sql(self, old_name, new_name):
+        return f"ALTER TABLE {self.quote(old_name)} RENAME TO {self.quote(new_name)}"
+
+    def list_tables_sql(self):
+        return "SELECT table_name FROM information_schema.tables WHERE table_type = 'BASE TABLE'"
+
+    def table_columns(self, cursor, table_name):
+        """Column names of the existing table_name, in order."""
+        cursor.execute(f"SELECT * FROM {self.quote(table_name)} WHERE 1 = 0")
+        columns = [d[0] for d in cursor.description]
+        cursor.fetchall()
+        return columns
+
+    def max_value_sql(self, table_name, column):
+        return f"SELECT MAX({self.quote(column)}) FROM {self.quote(table_name)}"
+
+    def stage_table_name(self, table_name):
+        """Name for a session-private staging table of table_name."""
+        return f"_stage_{uuid.uuid4().hex[:12]}"
+
+    def create_stage_sql(self, stage_name, table_name):
+        """A temporary table with the columns and types of table_name, and no rows."""
+        return f"CREATE TEMP TABLE {self.quote(stage_name)} AS SELECT * FROM {self.quote(table_name)} WHERE 1 = 0"
+
+    def merge_sql(self, table_name, stage_name, columns, key_columns):
+        """
+        Statements applying the rows of stage_name to table_name: a staged row
+        replaces the row with the same key_columns values, or is added if
+        there is none. Without key_columns every staged row is appended.
+        """
+        target, stage = self.quote(table_name), self.quote(stage_name)
+        columns_sql = ", ".join(self.quote(col) for col in columns)
+        statements = []
+        if key_columns:
+            match = " AND ".join(f"{stage}.{self.quote(col)} = {target}.{self.quote(col)}" for col in key_columns)
+            statements.append(f"DELETE FROM {target} WHERE EXISTS (SELECT 1 FROM {stage} WHERE {match})")
+        statements.append(f"INSERT INTO {target} ({columns_sql}) SELECT {columns_sql} FROM {stage}")
+        return statements
+
+
+class SqlServerBackend(SqlBackend):
+    """SQL Server / Azure SQL over pyodbc."""
+    name = "sqlserver"
+    DEFAULT_DRIVER = "ODBC Driver 18 for SQL Server"
+    DEFAULT_OPTIONS = "Encrypt=yes;TrustServerCertificate=yes;Connection Timeout=30;"
+
+    def connection_string(self):
+        config = self.config
+        if config.get("connection_string"):
+            return config["connection_string"]
+        missing = [key for key in ("server", "database") if not config.get(key)]
+        if missing:
+            raise ValueError(f"SQL Server settings missing: {', '.join(missing)} (see {CONFIG_FILE})")
+        parts = [
+            f"Driver={{{config.get('driver', self.DEFAULT_DRIVER)}}};",
+            f"Server={config['server']};",
+            f"Database={config['database']};",
+        ]
+        if config.get("uid"):
+            parts.append(f"Uid={config['uid']};Pwd={config.get('pwd', '')};")
+        parts.append(config.get("options", self.DEFAULT_OPTIONS))
+        return "".join(parts)
+
+    def connect(self):
+        if pyodbc is None:
+            raise ImportError("the SQL Server backend needs pyodbc (pip install pyodbc)")
+        return pyodbc.connect(self.connection_string())
+
+    def quote(self, identifier):
+        return "[" + str(identifier).replace("]", "]]") + "]"
+
+    def column_type(self, series, precise=True):
+        # Narrowest type for the profiled values: TINYINT..BIGINT, DECIMAL(p,s),
+        # DATE vs DATETIME2(n), VARCHAR vs NVARCHAR(n)
+        if precise:
+            return sql_server_type(profile_column(series))
+        if pd.api.types.is_bool_dtype(series.dtype):
+            return "BIT"
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            return "BIGINT"
+        elif pd.api.types.is_float_dtype(series.dtype):
+            return "FLOAT"
+        elif pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return "DATETIMEOFFSET(7)" if getattr(series.dt, "tz", None) is not None else "DATETIME2(7)"
+        else:
+            return "NVARCHAR(MAX)"
+
+    def insert_rows(self, conn, cursor, insert_sql, rows):
+        # pyodbc binds the whole batch as parameter arrays in one round trip
+        cursor.fast_executemany = True
+        cursor.executemany(insert_sql, rows)
+
+    def bulk_load(self, conn, cursor, table_name, columns, df):
+        """
+        Stages the DataFrame as a delimited file and bulk copies it in with
+        TABLOCK into the new heap table, which SQL Server logs minimally under
+        the simple or bulk-logged recovery model. Uses the bcp utility when it
+        is installed (setting "bcp": its path); otherwise BULK INSERT, which
+        reads the file on the server, so "staging_dir" must then be a path the
+        server can reach. Falls back to batched inserts when neither works.
+        """
+        bcp = self.config.get("bcp") or shutil.which("bcp")
+        if not bcp and not self.config.get("staging_dir"):
+            print(f"⚠ No bcp utility and no server-visible staging_dir; inserting {table_name} in batches.")
+            return self.insert_dataframe(conn, cursor, table_name, columns, df)
+        with staged_file(self.staging_dir, ".dat") as path:
+            stage_delimited(df, path)
+            if bcp:
+                self._run_bcp(bcp, table_name, path)
+            else:
+                cursor.execute(
+                    f"BULK INSERT {self.quote(table_name)} FROM '{path.replace(chr(39), chr(39) * 2)}' "
+                    f"WITH (FIELDTERMINATOR = '0x1f', ROWTERMINATOR = '0x1e', CODEPAGE = '65001', "
+                    f"KEEPNULLS, TABLOCK, BATCHSIZE = {max(self.bulk_threshold, 1)})"
+                )
+                conn.commit()
+
+    def _run_bcp(self, bcp, table_name, path):
+        config = self.config
+        target = f"{config.get('schema', 'dbo')}.{self.quote(table_name)}"
+        command = [
+            bcp, target, "in", path, "-S", config["server"], "-d", config["database"],
+            "-c", "-C", "65001", "-t", "0x1f", "-r", "0x1e", "-k", "-h", "TABLOCK",
+            "-b", str(max(self.bulk_threshold, 1)),
+        ]
+        if config.get("uid"):
+            command += ["-U", config["uid"], "-P", config.get("pwd", "")]
+        else:
+            command.append("-T")
+        if "trustservercertificate=yes" in config.get("options", self.DEFAULT_OPTIONS).lower():
+            command.append("-u")
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"bcp failed for {table_name}: {(result.stdout + result.stderr).strip()}")
+
+    def rename_table_sql(self, old_name, new_name):
+        old_name, new_name = (name.replace("'", "''") for name in (old_name, new_name))
+        return f"EXEC sp_rename '{old_name}', '{new_name}'"
+
+    def list_tables_sql(self):
+        return "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE'"
+
+    def stage_table_name(self, table_name):
+        # A local temporary table, dropped with the session
+        return f"#stage_{uuid.uuid4().hex[:12]}"
+
+    def create_stage_sql(self, stage_name, table_name):
+        return f"SELECT TOP 0 * INTO {self.quote(stage_name)} FROM {self.quote(table_name)}"
+
+    def merge_sql(self, table_name, stage_name, columns, key_columns):
+        if not key_columns:
+            return super().merge_sql(table_name, stage_name, columns, key_columns)
+        match = " AND ".join(f"t.{self.quote(col)} = s.{self.quote(col)}" for col in key_columns)
+        updates = ", ".join(f"t.{self.quote(col)} = s.{self.quote(col)}" for col in columns if col not in key_columns)
+        columns_sql = ", ".join(self.quote(col) for col in columns)
+        values_sql = ", ".join(f"s.{self.quote(col)}" for col in columns)
+        merge = f"MERGE INTO {self.quote(table_name)} WITH (HOLDLOCK) AS t\nUSING {self.quote(stage_name)} AS s ON {match}\n"
+        if updates:
+            merge += f"WHEN MATCHED THEN UPDATE SET {updates}\n"
+        merge += f"WHEN NOT MATCHED BY TARGET THEN INSERT ({columns_sql}) VALUES ({values_sql});"
+        return [merge]
+
+
+class SqliteBackend(SqlBackend):
+    """Local stand-in: a SQLite file (or :memory:), shareable across pool threads."""
+    name = "sqlite"
+
+    def connect(self):
+        # SQLite binds datetimes by exact type; store timestamps as ISO text
+        sqlite3.register_adapter(pd.Timestamp, lambda ts: ts.isoformat(sep=" "))
+        return sqlite3.connect(
+            self.config.get("database", ":memory:"), timeout=float(self.config.get("timeout", 30)),
+            check_same_thread=False,
+        )
+
+    def column_type(self, series, precise=True):
+        if pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_integer_dtype(series.dtype):
+            return "INTEGER"
+        elif pd.api.types.is_float_dtype(series.dtype):
+            return "REAL"
+        elif pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return "TIMESTAMP"
+        else:
+            return "TEXT"
+
+    def bulk_load(self, conn, cursor, table_name, columns, df):
+        """
+        SQLite has no bulk copy: all rows go in one transaction, with the
+        rollback journal kept in memory and no fsync until it commits.
+        """
+        journal_mode = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+        synchronous = cursor.execute("PRAGMA synchronous").fetchone()[0]
+        cursor.execute("PRAGMA journal_mode = MEMORY")
+        cursor.execute("PRAGMA synchronous = OFF")
+        try:
+            self.insert_dataframe(conn, cursor, table_name, columns, df, batch_size=max(len(df), 1))
+        finally:
+            cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+            cursor.execute(f"PRAGMA synchronous = {int(synchronous)}")
+
+    def list_tables_sql(self):
+        return "SELECT name FROM sqlite_master WHERE type = 'table'"
+
+
+class DuckDbBackend(SqlBackend):
+    """Local stand-in: an embedded DuckDB database file."""
+    name = "duckdb"
+
+    def connect(self):
+        if duckdb is None:
+            raise ImportError("the DuckDB backend needs duckdb (pip install duckdb)")
+        return duckdb.connect(self.config.get("database", ":memory:"))
+
+    def column_type(self, series, precise=True):
+        if pd.api.types.is_bool_dtype(series.dtype):
+            return "BOOLEAN"
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            return "BIGINT"
+        elif pd.api.types.is_float_dtype(series.dtype):
+            return "DOUBLE"
+        elif pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return "TIMESTAMP"
+        else:
+            return "VARCHAR"
+
+    def cursor(self, conn):
+        # A DuckDB cursor is a separate connection, which would not see the
+        # connection's temporary tables; statements run on the connection itself
+        return conn
+
+    def begin(self, conn):
+        # DuckDB connections autocommit each statement until a transaction is begun
+        conn.begin()
+
+    def insert_dataframe(self, conn, cursor, table_name, columns, df, batch_size=10000):
+        # DuckDB scans the DataFrame itself; no rows are converted in Python
+        view = f"_load_{threading.get_ident()}"
+        conn.register(view, df)
+        try:
+            conn.execute(f"INSERT INTO {self.quote(table_name)} SELECT * FROM {view}")
+        finally:
+            conn.unregister(view)
+        conn.commit()
+
+    def bulk_load(self, conn, cursor, table_name, columns, df):
+        """Stages the DataFrame as Parquet and loads it with COPY ... FROM."""
+        with staged_file(self.staging_dir, ".parquet") as path:
+            df.to_parquet(path, index=False)
+            conn.execute(f"COPY {self.quote(table_name)} FROM '{path.replace(chr(39), chr(39) * 2)}' (FORMAT PARQUET)")
+            conn.commit()
+
+
+# Backends by name (the "backend" setting)
+BACKENDS = {
+    "sqlserver": SqlServerBackend,
+    "sqlite": SqliteBackend,
+    "duckdb": DuckDbBackend,
+}
+
+
+def make_backend(config):
+    """Backend for a settings dict (see load_db_config); SQL Server by default."""
+    backend = config.get("backend", "sqlserver").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown database backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+    return BACKENDS[backend](config)
+
+
+def get_backend():
+    """The backend configured for this process, built on first use."""
+    global _configured
+    with _lock:
+        if _configured is None:
+            _configured = make_backend(load_db_config())
+        return _configured
@@ -0,0 +1,136 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Connections kept open at once, and so tables loaded at once
+DEFAULT_POOL_SIZE = 4
+
+# Attempts per table, and the wait before the first retry (doubled after each)
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 2.0
+
+
+def _close(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """
+    A bounded pool of database connections made by connect() (any DB-API
+    connect function, e.g. pasteToSql.get_connection or sqlite3.connect bound
+    to a file). Connections are opened on first use, at most `size` of them,
+    and are handed out one per thread with connection().
+    """
+
+    def __init__(self, connect, size=DEFAULT_POOL_SIZE):
+        self.connect = connect
+        self.size = size
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(None)   # a free slot without an open connection yet
+        self._lock = threading.Lock()
+        self._open = set()
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrows a connection, waiting while all are in use. A connection whose
+        user raised is closed and replaced on next use, since it may be broken.
+        """
+        conn = self._idle.get()
+        try:
+            if conn is None:
+                conn = self.connect()
+                with self._lock:
+                    self._open.add(conn)
+            yield conn
+        except BaseException:
+            if conn is not None:
+                with self._lock:
+                    self._open.discard(conn)
+                _close(conn)
+                conn = None
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        """Closes every connection the pool opened."""
+        with self._lock:
+            connections, self._open = list(self._open), set()
+        for conn in connections:
+            _close(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _load_with_retry(pool, table_name, data, load_table, attempts, retry_delay):
+    start = time.perf_counter()
+    error = ""
+    for attempt in range(1, attempts + 1):
+        try:
+            df = data() if callable(data) else data
+            with pool.connection() as conn:
+                rows = load_table(conn, table_name, df)
+            seconds = time.perf_counter() - start
+            print(f"✅ Loaded {rows} rows into {table_name} in {seconds:.1f}s ({rows / max(seconds, 1e-9):,.0f} rows/s)")
+            return {"table": table_name, "status": "ok", "rows": rows, "seconds": seconds,
+                    "attempts": attempt, "error": ""}
+        except Exception as e:
+            error = str(e)
+            if attempt < attempts:
+                delay = retry_delay * 2 ** (attempt - 1)
+                print(f"⚠ Loading {table_name} failed (attempt {attempt}/{attempts}): {e}; retrying in {delay:.0f}s")
+                time.sleep(delay)
+    print(f"❌ Giving up on {table_name} after {attempts} attempts: {error}")
+    return {"table": table_name, "status": "failed", "rows": 0, "seconds": time.perf_counter() - start,
+            "attempts": attempts, "error": error}
+
+
+def load_tables_parallel(tables, load_table, pool, attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY):
+    """
+    Loads several tables at once, each on its own pooled connection.
+
+    Args:
+        tables: dict mapping table name to a DataFrame, or to a function
+            returning one (called in the worker, on every attempt).
+        load_table: load_table(conn, table_name, df) -> rows loaded. It is
+            re-run from scratch on a retry, so it must replace the table,
+            or apply its rows in one transaction, rather than append batches.
+        pool: ConnectionPool; as many tables load at once as it has connections.
+        attempts: Tries per table before it is reported as failed.
+        retry_delay: Seconds before the first retry, doubled after each.
+    Returns:
+        List of result dicts (table, status, rows, seconds, attempts, error),
+        in the order of tables.
+    """
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        futures = [
+            executor.submit(_load_with_retry, pool, table_name, data, load_table, attempts, retry_delay)
+            for table_name, data in tables.items()
+        ]
+        return [future.result() for future in futures]
+
+
+def print_load_report(results):
+    """Prints a per-table rows, time and throughput table."""
+    if not results:
+        return
+    name_width = max([len("Table")] + [len(r["table"]) for r in results])
+    print(f"\n{'Table':<{name_width}}  {'Status':<6}  {'Rows':>10}  {'Seconds':>8}  {'Rows/s':>10}  Tries")
+    print(f"{'-' * name_width}  {'-' * 6}  {'-' * 10}  {'-' * 8}  {'-' * 10}  {'-' * 5}")
+    for r in results:
+        rate = r["rows"] / r["seconds"] if r["seconds"] else 0.0
+        print(f"{r['table']:<{name_width}}  {r['status']:<6}  {r['rows']:>10}  {r['seconds']:>8.1f}  {rate:>10,.0f}  {r['attempts']:>5}")
+    ok = [r for r in results if r["status"] == "ok"]
+    rows = sum(r["rows"] for r in ok)
+    print(f"\n📊 {len(ok)}/{len(results)} tables loaded, {rows} rows.")
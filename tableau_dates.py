@@ -0,0 +1,122 @@
+import pandas as pd
+
+try:
+    from tableauhyperapi import Timestamp as HyperTimestamp
+except ImportError:
+    HyperTimestamp = ()
+
+
+def to_datetime(x):
+    """
+    Coerce a scalar or a whole Series to datetime.
+    Series are converted in one pass (datetime64 columns pass through untouched);
+    scalars such as tableauhyperapi.Timestamp go through their string form.
+    """
+    if isinstance(x, pd.Series):
+        if pd.api.types.is_datetime64_any_dtype(x.dtype):
+            return x
+        return pd.to_datetime(x.astype(str), errors='coerce', format='mixed')
+    if isinstance(x, pd.Timestamp):
+        return x
+    return pd.to_datetime(str(x), errors='coerce')
+
+
+def _dt(x):
+    # Series expose date fields through .dt, Timestamp/Timedelta directly
+    return x.dt if isinstance(x, pd.Series) else x
+
+
+def _is_missing_scalar(*values):
+    return any(not isinstance(v, pd.Series) and pd.isna(v) for v in values)
+
+
+def _sunday_weekday(d):
+    # Tableau weeks start on Sunday: Sunday=0 … Saturday=6
+    return (_dt(d).dayofweek + 1) % 7
+
+
+def _week_start(d):
+    days = _sunday_weekday(d)
+    if isinstance(d, pd.Series):
+        return d.dt.normalize() - pd.to_timedelta(days, unit='D')
+    return d.normalize() - pd.Timedelta(days=days)
+
+
+# DATEDIFF parts counted on the clock, by pandas frequency
+_TIME_UNITS = {'hour': 'h', 'minute': 'min', 'second': 's'}
+
+
+# helpers to compare possibly-mixed datetime types
+def LT(a, b):
+    return to_datetime(a) <  to_datetime(b)
+
+def LTE(a, b):
+    return to_datetime(a) <= to_datetime(b)
+
+def GT(a, b):
+    return to_datetime(a) >  to_datetime(b)
+
+def GTE(a, b):
+    return to_datetime(a) >= to_datetime(b)
+
+
+def DATEDIFF(part, start, end):
+    """
+    Tableau DATEDIFF over scalars or whole Series.
+    Works even if start/end are tableauhyperapi.Timestamp.
+    """
+    start = to_datetime(start)
+    end   = to_datetime(end)
+    if _is_missing_scalar(start, end):
+        return None
+
+    p = part.lower()
+    s, e = _dt(start), _dt(end)
+    if p == 'year':
+        return e.year - s.year
+    if p == 'quarter':
+        return (e.year - s.year) * 4 + (e.quarter - s.quarter)
+    if p == 'month':
+        return (e.year - s.year) * 12 + (e.month - s.month)
+    if p == 'week':
+        return _dt(_week_start(end) - _week_start(start)).days // 7
+    if p in ('day', 'dayofyear', 'weekday'):
+        # midnights crossed, not whole 24-hour spans
+        return (_dt(end).floor('D') - _dt(start).floor('D')) // pd.Timedelta(1, unit='D')
+    if p in _TIME_UNITS:
+        # whole hour/minute/second boundaries crossed, like the other parts
+        unit = _TIME_UNITS[p]
+        return (_dt(end).floor(unit) - _dt(start).floor(unit)) // pd.Timedelta(1, unit=unit)
+    return None
+
+
+def DATEPART(part, dt):
+    """
+    Tableau DATEPART over a scalar or a whole Series.
+    Works even if dt is tableauhyperapi.Timestamp.
+    """
+    dt = to_datetime(dt)
+    if _is_missing_scalar(dt):
+        return None
+
+    p = part.lower()
+    d = _dt(dt)
+    if p == 'year':      return d.year
+    if p == 'quarter':   return d.quarter
+    if p == 'month':     return d.month
+    if p == 'day':       return d.day
+    if p == 'hour':      return d.hour
+    if p == 'minute':    return d.minute
+    if p == 'second':    return d.second
+    if p == 'dayofyear': return d.dayofyear
+    if p == 'weekday':   return _sunday_weekday(dt) + 1   # 1 = Sunday … 7 = Saturday
+    if p == 'week':
+        # week 1 is the (Sunday-start) week containing January 1st
+        jan1_weekday = (_sunday_weekday(dt) - (d.dayofyear - 1)) % 7
+        return (d.dayofyear - 1 + jan1_weekday) // 7 + 1
+    if p in ('iso-year', 'iso-week', 'iso-weekday'):
+        field = {'iso-year': 0, 'iso-week': 1, 'iso-weekday': 2}[p]
+        if isinstance(dt, pd.Series):
+            return d.isocalendar().iloc[:, field]
+        return dt.isocalendar()[field]
+    return None
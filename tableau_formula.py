@@ -0,0 +1,462 @@
+import re
+import pandas as pd
+from collections import namedtuple
+from functools import lru_cache
+from formula_vectorizer import (
+    vectorize_expression, ISNULL, ARITHMETIC_FUNCTIONS, TABLEAU_FUNCTIONS, VECTOR_FUNCTIONS,
+)
+from tableau_dates import DATEDIFF, DATEPART, LT, LTE, GT, GTE
+
+
+# Upper bound on distinct formulas kept compiled; identical formulas across
+# datasources and workbooks are served from the cache.
+FORMULA_CACHE_SIZE = 1024
+
+CompiledFormula = namedtuple(
+    "CompiledFormula",
+    ["normalized", "source", "row_code", "vector_source", "vector_code", "vector_error", "references"],
+)
+
+# Names visible to the row-wise (fallback) and column-wise formula code.
+ROW_GLOBALS = {
+    "pd": pd,
+    "DATEDIFF": DATEDIFF,
+    "DATEPART": DATEPART,
+    "ISNULL": ISNULL,
+    "INDEX": lambda row: row.name + 1,
+    "LT": LT,
+    "LTE": LTE,
+    "GT": GT,
+    "GTE": GTE,
+    **ARITHMETIC_FUNCTIONS,
+    **TABLEAU_FUNCTIONS,
+}
+VECTOR_GLOBALS = {"pd": pd, **VECTOR_FUNCTIONS}
+
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+|//[^\n]*)
+  | (?P<field>\[(?:[^\]]|\]\])*\](?:\.\[(?:[^\]]|\]\])*\])*)
+  | (?P<string>'(?:[^']|'')*'|"(?:[^"]|"")*")
+  | (?P<date>\#[^#]*\#)
+  | (?P<number>(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op><>|<=|>=|==|!=|[-+*/%^=<>(),{}:])
+""", re.VERBOSE)
+
+_KEYWORDS = {
+    "IF", "THEN", "ELSEIF", "ELSE", "END", "CASE", "WHEN",
+    "AND", "OR", "NOT", "TRUE", "FALSE", "NULL",
+}
+
+_COMPARISONS = {"=": "==", "==": "==", "<>": "!=", "!=": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+_DATE_COMPARISONS = {"<": "LT", "<=": "LTE", ">": "GT", ">=": "GTE"}
+# Tableau functions the evaluator provides (besides those compiled specially in
+# to_python); formulas calling anything else are rejected when compiled
+SUPPORTED_FUNCTIONS = {"DATEDIFF", "DATEPART", "ISNULL", *TABLEAU_FUNCTIONS}
+# Arithmetic goes through NULL-propagating helpers (see formula_vectorizer)
+_ARITHMETIC = {"+": "OP_ADD", "-": "OP_SUB", "*": "OP_MUL", "/": "OP_DIV", "%": "OP_MOD", "^": "OP_POW"}
+
+
+def _field_name(text):
+    """[Datasource].[Field] → Field, with ]] unescaped."""
+    last = re.findall(r'\[((?:[^\]]|\]\])*)\]', text)[-1]
+    return last.replace("]]", "]")
+
+
+def tokenize(formula):
+    """
+    Splits a Tableau formula into (kind, value) tokens.
+    Keywords and function names are upper-cased; comments and whitespace dropped.
+    """
+    tokens = []
+    pos = 0
+    while pos < len(formula):
+        m = _TOKEN_RE.match(formula, pos)
+        if not m:
+            raise ValueError(f"unexpected character {formula[pos]!r} at position {pos}")
+        pos = m.end()
+        kind = m.lastgroup
+        text = m.group()
+        if kind == "ws":
+            continue
+        if kind == "field":
+            tokens.append(("field", _field_name(text)))
+        elif kind == "string":
+            quote = text[0]
+            tokens.append(("string", text[1:-1].replace(quote * 2, quote)))
+        elif kind == "date":
+            tokens.append(("date", text[1:-1].strip()))
+        elif kind == "name":
+            upper = text.upper()
+            tokens.append(("keyword" if upper in _KEYWORDS else "name", upper))
+        else:
+            tokens.append((kind, text))
+    return tokens
+
+
+def normalize_formula(formula):
+    """Canonical text of a formula: case, whitespace, quoting and comments normalized."""
+    parts = []
+    for kind, value in tokenize(formula):
+        if kind == "field":
+            parts.append("[" + value.replace("]", "]]") + "]")
+        elif kind == "string":
+            parts.append("'" + value.replace("'", "''") + "'")
+        elif kind == "date":
+            parts.append(f"#{value}#")
+        else:
+            parts.append(value)
+    return " ".join(parts)
+
+
+class _Parser:
+    """
+    Recursive-descent parser for Tableau's row-level calculation language.
+    Nodes are tuples: ("field", name), ("number", text), ("string", text),
+    ("date", text), ("bool", value), ("null",), ("call", name, args),
+    ("unary", op, operand), ("binary", op, left, right),
+    ("if", [(cond, value), ...], else_value) and ("case", subject, [(when, value), ...], else_value).
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self, kind=None, value=None):
+        if self.pos >= len(self.tokens):
+            return None
+        tok = self.tokens[self.pos]
+        if kind is not None and tok[0] != kind:
+            return None
+        if value is not None and tok[1] != value:
+            return None
+        return tok
+
+    def accept(self, kind, value=None):
+        tok = self.peek(kind, value)
+        if tok:
+            self.pos += 1
+        return tok
+
+    def expect(self, kind, value=None):
+        tok = self.accept(kind, value)
+        if not tok:
+            found = self.tokens[self.pos][1] if self.pos < len(self.tokens) else "end of formula"
+            raise ValueError(f"expected {value or kind} but found {found!r}")
+        return tok
+
+    def parse(self):
+        if self.peek("op", "{"):
+            raise ValueError("level of detail expressions are not supported")
+        node = self.parse_or()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"unexpected {self.tokens[self.pos][1]!r}")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.accept("keyword", "OR"):
+            node = ("binary", "OR", node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.accept("keyword", "AND"):
+            node = ("binary", "AND", node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.accept("keyword", "NOT"):
+            return ("unary", "NOT", self.parse_not())
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        node = self.parse_additive()
+        while True:
+            tok = self.peek("op")
+            if not tok or tok[1] not in _COMPARISONS:
+                return node
+            self.pos += 1
+            node = ("binary", tok[1], node, self.parse_additive())
+
+    def parse_additive(self):
+        node = self.parse_multiplicative()
+        while True:
+            tok = self.accept("op", "+") or self.accept("op", "-")
+            if not tok:
+                return node
+            node = ("binary", tok[1], node, self.parse_multiplicative())
+
+    def parse_multiplicative(self):
+        node = self.parse_unary()
+        while True:
+            tok = self.accept("op", "*") or self.accept("op", "/") or self.accept("op", "%")
+            if not tok:
+                return node
+            node = ("binary", tok[1], node, self.parse_unary())
+
+    def parse_unary(self):
+        if self.accept("op", "-"):
+            return ("unary", "-", self.parse_unary())
+        if self.accept("op", "+"):
+            return self.parse_unary()
+        return self.parse_power()
+
+    def parse_power(self):
+        node = self.parse_primary()
+        if self.accept("op", "^"):
+            node = ("binary", "^", node, self.parse_unary())
+        return node
+
+    def parse_primary(self):
+        tok = self.peek()
+        if tok is None:
+            raise ValueError("unexpected end of formula")
+        kind, value = tok
+        if kind in ("field", "number", "string", "date"):
+            self.pos += 1
+            return (kind, value)
+        if kind == "op" and value == "(":
+            self.pos += 1
+            node = self.parse_or()
+            self.expect("op", ")")
+            return node
+        if kind == "op" and value == "{":
+            raise ValueError("level of detail expressions are not supported")
+        if kind == "keyword":
+            if value in ("TRUE", "FALSE"):
+                self.pos += 1
+                return ("bool", value == "TRUE")
+            if value == "NULL":
+                self.pos += 1
+                return ("null",)
+            if value == "IF":
+                return self.parse_if()
+            if value == "CASE":
+                return self.parse_case()
+        if kind == "name":
+            self.pos += 1
+            self.expect("op", "(")
+            args = []
+            if not self.accept("op", ")"):
+                args.append(self.parse_or())
+                while self.accept("op", ","):
+                    args.append(self.parse_or())
+                self.expect("op", ")")
+            return ("call", value, args)
+        raise ValueError(f"unexpected {value!r}")
+
+    def parse_if(self):
+        self.expect("keyword", "IF")
+        branches = []
+        cond = self.parse_or()
+        self.expect("keyword", "THEN")
+        branches.append((cond, self.parse_or()))
+        while self.accept("keyword", "ELSEIF"):
+            cond = self.parse_or()
+            self.expect("keyword", "THEN")
+            branches.append((cond, self.parse_or()))
+        else_value = self.parse_or() if self.accept("keyword", "ELSE") else ("null",)
+        self.expect("keyword", "END")
+        return ("if", branches, else_value)
+
+    def parse_case(self):
+        self.expect("keyword", "CASE")
+        subject = self.parse_or()
+        branches = []
+        while self.accept("keyword", "WHEN"):
+            when = self.parse_or()
+            self.expect("keyword", "THEN")
+            branches.append((when, self.parse_or()))
+        if not branches:
+            raise ValueError("CASE without WHEN")
+        else_value = self.parse_or() if self.accept("keyword", "ELSE") else ("null",)
+        self.expect("keyword", "END")
+        return ("case", subject, branches, else_value)
+
+
+def parse_formula(formula):
+    """Parses a Tableau formula into a tuple-based AST (see _Parser)."""
+    tokens = tokenize(formula)
+    if not tokens:
+        raise ValueError("empty formula")
+    return _Parser(tokens).parse()
+
+
+def _is_date_node(node):
+    if node[0] == "date":
+        return True
+    return node[0] == "call" and node[1] in ("TODAY", "NOW")
+
+
+def to_python(node):
+    """Emits the row-wise Python expression for an AST node (fields as row["Field"])."""
+    kind = node[0]
+    if kind == "field":
+        return f"row[{node[1]!r}]"
+    if kind == "number":
+        return node[1]
+    if kind == "string":
+        return repr(node[1])
+    if kind == "date":
+        return f"pd.Timestamp({node[1]!r})"
+    if kind == "bool":
+        return repr(node[1])
+    if kind == "null":
+        return "None"
+    if kind == "unary":
+        operand = to_python(node[2])
+        if node[1] == "NOT":
+            return f"OP_NOT({operand})"
+        return f"(-{operand})" if node[2][0] == "number" else f"OP_NEG({operand})"
+    if kind == "binary":
+        op, left, right = node[1], node[2], node[3]
+        if op in _DATE_COMPARISONS and (_is_date_node(left) or _is_date_node(right)):
+            return f"{_DATE_COMPARISONS[op]}({to_python(left)}, {to_python(right)})"
+        if op in _ARITHMETIC:
+            return f"{_ARITHMETIC[op]}({to_python(left)}, {to_python(right)})"
+        if op in ("<>", "!="):
+            return f"OP_NE({to_python(left)}, {to_python(right)})"
+        py_op = {"AND": "and", "OR": "or"}.get(op, _COMPARISONS.get(op, op))
+        return f"({to_python(left)} {py_op} {to_python(right)})"
+    if kind == "if":
+        expr = to_python(node[2])
+        for cond, value in reversed(node[1]):
+            expr = f"({to_python(value)} if {to_python(cond)} else {expr})"
+        return expr
+    if kind == "case":
+        subject = to_python(node[1])
+        expr = to_python(node[3])
+        for when, value in reversed(node[2]):
+            expr = f"({to_python(value)} if ({subject} == {to_python(when)}) else {expr})"
+        return expr
+    if kind == "call":
+        name, args = node[1], node[2]
+        if name in ("TODAY", "NOW") and not args:
+            return 'pd.Timestamp("today")'
+        if name == "INDEX" and not args:
+            return "INDEX(row)"
+        if name == "IIF" and len(args) in (2, 3):
+            else_value = to_python(args[2]) if len(args) == 3 else "None"
+            return f"({to_python(args[1])} if {to_python(args[0])} else {else_value})"
+        if name in ("MIN", "MAX") and len(args) == 1:
+            # row-level aggregate of a single value is the value itself
+            return to_python(args[0])
+        if name not in SUPPORTED_FUNCTIONS:
+            raise ValueError(f"unsupported function '{name}'")
+        return f"{name}({', '.join(to_python(a) for a in args)})"
+    raise ValueError(f"unknown node {kind!r}")
+
+
+def formula_references(node, found=None):
+    """Field names referenced by an AST, in first-use order."""
+    if found is None:
+        found = []
+    if node[0] == "field":
+        if node[1] not in found:
+            found.append(node[1])
+        return found
+    # node[0] is the kind, except in the (condition, value) pairs of IF and CASE
+    for child in node if isinstance(node[0], tuple) else node[1:]:
+        if isinstance(child, tuple):
+            formula_references(child, found)
+        elif isinstance(child, list):
+            for item in child:
+                formula_references(item, found)
+    return found
+
+
+def _rename_fields(node, renames):
+    """Copy of an AST with field names replaced per renames."""
+    if node[0] == "field":
+        return ("field", renames.get(node[1], node[1]))
+    return tuple(
+        _rename_fields(child, renames) if isinstance(child, tuple)
+        else [_rename_fields(item, renames) for item in child] if isinstance(child, list)
+        else child
+        for child in node
+    )
+
+
+def resolve_references(references, columns, aliases=None):
+    """
+    Maps each referenced field to the column it names: the column of exactly
+    that name, else the column of the field it is an alias of (a calculated
+    field's internal name, see calc_graph.field_aliases), else one whose name
+    matches ignoring case, as Tableau does. References matching no column are
+    left out.
+    """
+    exact = set(columns)
+    by_lower = {}
+    for col in columns:
+        by_lower.setdefault(str(col).lower(), col)
+    alias_lower = {str(name).lower(): target for name, target in (aliases or {}).items()}
+    resolved = {}
+    for ref in references:
+        name = ref if ref in exact else alias_lower.get(ref.lower(), ref)
+        if name in exact:
+            resolved[ref] = name
+        elif str(name).lower() in by_lower:
+            resolved[ref] = by_lower[str(name).lower()]
+    return resolved
+
+
+@lru_cache(maxsize=FORMULA_CACHE_SIZE)
+def _parse_normalized(normalized):
+    tree = parse_formula(normalized)
+    return tree, tuple(formula_references(tree))
+
+
+@lru_cache(maxsize=FORMULA_CACHE_SIZE)
+def _compile_normalized(normalized, renames=()):
+    tree, references = _parse_normalized(normalized)
+    if renames:
+        tree = _rename_fields(tree, dict(renames))
+    source = to_python(tree)
+    row_code = compile(source, "<tableau formula>", "eval")
+    try:
+        vector_source = vectorize_expression(source)
+        vector_code = compile(vector_source, "<tableau formula>", "eval")
+        vector_error = None
+    except ValueError as e:
+        vector_source, vector_code, vector_error = None, None, str(e)
+    return CompiledFormula(
+        normalized, source, row_code, vector_source, vector_code, vector_error, references,
+    )
+
+
+def compile_formula(formula, columns=None, aliases=None):
+    """
+    Parses and compiles a Tableau formula once, memoized by its normalized text.
+
+    Args:
+        formula: Tableau formula text.
+        columns: Columns of the table it runs on; field references are then
+            resolved against them ignoring case (see resolve_references).
+        aliases: Optional dict of other names fields may be referred to by
+            (internal name -> column), used with columns.
+    Returns:
+        CompiledFormula with the row-wise code object, the column-wise code
+        object (None when the formula can't be vectorized, with the reason in
+        vector_error) and the referenced field names.
+    Raises:
+        ValueError on syntax errors or unsupported constructs and functions.
+    """
+    normalized = normalize_formula(formula)
+    if columns is None:
+        return _compile_normalized(normalized)
+    _, references = _parse_normalized(normalized)
+    renames = tuple(
+        (ref, col) for ref, col in resolve_references(references, list(columns), aliases).items() if ref != col
+    )
+    return _compile_normalized(normalized, renames)
+
+
+def formula_cache_info():
+    """Hit/miss counters and size of the compiled-formula cache."""
+    return _compile_normalized.cache_info()
+
+
+def clear_formula_cache():
+    _parse_normalized.cache_clear()
+    _compile_normalized.cache_clear()
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from sql_backends import FIELD_TERMINATOR, ROW_TERMINATOR, stage_delimited
+
+
+def _staged_rows(df, tmp_path):
+    path = str(tmp_path / "stage.txt")
+    stage_delimited(df, path)
+    with open(path, encoding="utf-8") as f:
+        return [row.split(FIELD_TERMINATOR) for row in f.read().split(ROW_TERMINATOR)[:-1]]
+
+
+def test_timezone_aware_values_keep_their_offset(tmp_path):
+    stamps = pd.to_datetime(["2024-01-01 10:00:00.500000", None, "2024-07-01 00:00:00.000000"])
+    df = pd.DataFrame({"id": [1, 2, 3], "t": stamps.tz_localize("Europe/Paris")})
+    assert _staged_rows(df, tmp_path) == [
+        ["1", "2024-01-01 10:00:00.500000 +01:00"], ["2", ""], ["3", "2024-07-01 00:00:00.000000 +02:00"],
+    ]
+
+
+def test_naive_timestamps_have_no_offset(tmp_path):
+    df = pd.DataFrame({"t": pd.to_datetime(["2024-01-01 10:00:00.000000"])})
+    assert _staged_rows(df, tmp_path) == [["2024-01-01 10:00:00.000000"]]
+
+
+def test_terminators_in_text_are_replaced(tmp_path):
+    values = [f"a{FIELD_TERMINATOR}b", f"x{ROW_TERMINATOR}y", None]
+    df = pd.DataFrame({
+        "text": values,
+        "category": pd.Series(values, dtype="category"),
+        "codes": pd.Series([1, 2, 1], dtype="category"),
+    })
+    assert _staged_rows(df, tmp_path) == [["a b", "a b", "1"], ["x y", "x y", "2"], ["", "", "1"]]
+
+
+def test_booleans_and_whole_floats(tmp_path):
+    df = pd.DataFrame({"flag": [True, False], "count": [1.0, None], "tiny": [1e-6, 2.5]})
+    assert _staged_rows(df, tmp_path) == [["1", "1", "0.000001"], ["0", "", "2.5"]]
@@ -0,0 +1,104 @@
+import pandas as pd
+
+from calc_graph import build_calc_graph, field_aliases
+from tableau_formula import VECTOR_GLOBALS, compile_formula
+
+
+def _fields(**formulas):
+    return {name: {"formula": formula} for name, formula in formulas.items()}
+
+
+def test_levels_follow_dependencies():
+    fields = _fields(Profit="[Sales] - [Cost]", Margin="[Profit] / [Sales]", Flag="[Margin] > 0.5")
+    levels, dependencies, problems = build_calc_graph(fields, ["Sales", "Cost"])
+    assert problems == {}
+    assert levels == [["Profit"], ["Margin"], ["Flag"]]
+    assert dependencies["Margin"] == {"Profit"}
+
+
+def test_independent_fields_share_a_level():
+    fields = _fields(A="[Sales] * 2", B="[Cost] * 2", C="[A] + [B]")
+    levels, _, problems = build_calc_graph(fields, ["Sales", "Cost"])
+    assert problems == {}
+    assert sorted(levels[0]) == ["A", "B"] and levels[1] == ["C"]
+
+
+def test_cycle_is_reported():
+    fields = _fields(A="[B] + 1", B="[A] + 1", C="[Sales]")
+    levels, _, problems = build_calc_graph(fields, ["Sales"])
+    assert levels == [["C"]]
+    assert problems["A"] == problems["B"] == "dependency cycle among: A, B"
+
+
+def test_field_depending_on_a_cycle_is_reported_separately():
+    fields = _fields(A="[B]", B="[A]", C="[A] + 1")
+    _, _, problems = build_calc_graph(fields, [])
+    assert problems["C"] == "depends on unavailable field(s): A"
+
+
+def test_missing_input_is_reported():
+    fields = _fields(A="[Sales] + [Discount]")
+    levels, _, problems = build_calc_graph(fields, ["Sales"])
+    assert levels == []
+    assert problems["A"] == "missing input(s): Discount"
+
+
+def test_invalid_formula_is_reported():
+    _, _, problems = build_calc_graph(_fields(A="NOSUCH([Sales])"), ["Sales"])
+    assert problems["A"].startswith("invalid formula:")
+
+
+def test_references_ignore_case():
+    fields = _fields(Profit="[sales] - [COST]", Margin="[profit] / [Sales]")
+    levels, dependencies, problems = build_calc_graph(fields, ["Sales", "Cost"])
+    assert problems == {}
+    assert levels == [["Profit"], ["Margin"]]
+    assert dependencies["Margin"] == {"Profit"}
+
+
+def test_empty_formula_has_no_dependencies():
+    levels, dependencies, problems = build_calc_graph(_fields(Blank=""), [])
+    assert problems == {} and levels == [["Blank"]] and dependencies["Blank"] == set()
+
+
+def test_fields_referenced_by_internal_name():
+    fields = {
+        "Profit": {"name": "[Calculation_1]", "formula": "[Sales] - [Cost]"},
+        "Margin": {"name": "[Calculation_2]", "formula": "[Calculation_1] / [Sales]"},
+        "Flag": {"name": "[Calculation_3]", "formula": "[calculation_2] > 0.5"},
+    }
+    levels, dependencies, problems = build_calc_graph(fields, ["Sales", "Cost"])
+    assert problems == {}
+    assert levels == [["Profit"], ["Margin"], ["Flag"]]
+    assert dependencies["Margin"] == {"Profit"} and dependencies["Flag"] == {"Margin"}
+
+
+def test_internal_names_are_evaluated_against_caption_columns():
+    fields = {
+        "Profit": {"name": "[Calculation_1]", "formula": "[Sales] - [Cost]"},
+        "Margin": {"name": "[Calculation_2]", "formula": "[Calculation_1] / [Sales]"},
+    }
+    df = pd.DataFrame({"Sales": [10.0, 20.0], "Cost": [4.0, 15.0]})
+    levels, _, _ = build_calc_graph(fields, df.columns)
+    aliases = field_aliases(fields)
+    for level in levels:
+        for name in level:
+            compiled = compile_formula(fields[name]["formula"], df.columns, aliases)
+            df[name] = eval(compiled.vector_code, VECTOR_GLOBALS, {"row": df})
+    assert df["Margin"].tolist() == [0.6, 0.25]
+
+
+def test_field_aliases():
+    fields = {
+        "Profit": {"name": "[Calculation_1]", "formula": ""},
+        "[Uncaptioned]": {"name": "[Uncaptioned]", "formula": ""},
+        "Same": {"name": "Same", "formula": ""},
+    }
+    assert field_aliases(fields) == {"Calculation_1": "Profit", "Uncaptioned": "[Uncaptioned]"}
+
+
+def test_condition_references_are_dependencies():
+    fields = _fields(Margin="[Sales] / 2", Band="IF [Margin] > 5 THEN 'high' ELSE 'low' END")
+    levels, dependencies, _ = build_calc_graph(fields, ["Sales"])
+    assert levels == [["Margin"], ["Band"]]
+    assert dependencies["Band"] == {"Margin"}
@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+from tableau_formula import ROW_GLOBALS, VECTOR_GLOBALS, compile_formula
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "x": [1.0, 2.0, None, 4.0],
+        "y": [0, 1, 2, 3],
+        "Region": ["East", None, "West", "east"],
+        "Flag": [True, None, False, True],
+    })
+
+
+def _values(result, length):
+    """Result of either evaluation as a list, with every NULL as None."""
+    if not isinstance(result, pd.Series):
+        result = pd.Series([result] * length)
+    return [None if pd.isna(value) else value for value in result.tolist()]
+
+
+def _both_ways(df, formula):
+    compiled = compile_formula(formula, df.columns)
+    assert compiled.vector_code is not None, compiled.vector_error
+    vectorized = eval(compiled.vector_code, VECTOR_GLOBALS, {"row": df})
+    row_wise = df.apply(lambda row: eval(compiled.row_code, ROW_GLOBALS, {"row": row}), axis=1)
+    return _values(vectorized, len(df)), _values(row_wise, len(df))
+
+
+@pytest.mark.parametrize("formula", [
+    "[x] + [y]",
+    "[x] / [y]",
+    "[x] / 0",
+    "[x] % [y]",
+    "-[x]",
+    "[x] ^ 2",
+    "-3 + [y]",
+    "[y] - NULL",
+    "[Region] + '-x'",
+    "[x] <> 1",
+    "NOT [Flag]",
+    "NOT ([x] > 1)",
+    "[x] <> 1 AND [Flag]",
+    "IF [x] / [y] > 1 THEN 'big' ELSE 'small' END",
+    "IF [x] <> 1 THEN 'other' ELSE 'one' END",
+    "IIF(NOT [Flag], 'off', 'on')",
+    "IIF(ISNULL([Region]), 'none', [Region])",
+    "ZN([x])",
+    "IFNULL([Region], 'n/a')",
+    "MIN([x], [y])",
+    "MAX([Region], 'M')",
+    "UPPER([Region])",
+])
+def test_row_wise_and_vectorized_agree(df, formula):
+    vectorized, row_wise = _both_ways(df, formula)
+    assert vectorized == row_wise
+
+
+def test_division_by_zero_is_null(df):
+    vectorized, row_wise = _both_ways(df, "[x] / 0")
+    assert vectorized == row_wise == [None] * len(df)
+
+
+def test_null_text_concatenation_is_null(df):
+    vectorized, row_wise = _both_ways(df, "[Region] + '-x'")
+    assert vectorized == row_wise == ["East-x", None, "West-x", "east-x"]
+
+
+def test_not_equal_and_not_are_null_for_null(df):
+    assert _both_ways(df, "[x] <> 1") == ([False, True, None, True],) * 2
+    assert _both_ways(df, "NOT [Flag]") == ([False, None, True, False],) * 2
+
+
+def test_null_condition_takes_the_else_branch(df):
+    vectorized, row_wise = _both_ways(df, "IF [x] <> 1 THEN 'other' ELSE 'one' END")
+    assert vectorized == row_wise == ["one", "other", "one", "other"]
@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+
+import pasteToSql
+from sql_backends import make_backend
+from sql_pool import ConnectionPool
+
+
+@pytest.fixture(params=["sqlite", "duckdb"])
+def backend(request, tmp_path):
+    if request.param == "duckdb":
+        pytest.importorskip("duckdb")
+    return make_backend({"backend": request.param, "database": str(tmp_path / f"load.{request.param}")})
+
+
+def _rows(backend, table_name):
+    conn = backend.connect()
+    try:
+        cursor = backend.cursor(conn)
+        cursor.execute(f"SELECT * FROM {backend.quote(table_name)} ORDER BY 1, 2")
+        return [tuple(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def _load(backend, tables, settings, state_dir):
+    # one connection, so DuckDB's single-writer file is not opened twice
+    with ConnectionPool(backend.connect, 1) as pool:
+        results = pasteToSql.load_dataframes_incremental(tables, pool, backend, settings, state_dir=state_dir)
+    assert [r["error"] for r in results if r["status"] != "ok"] == []
+    return {r["table"]: r["rows"] for r in results}
+
+
+def test_load_dataframes_incremental(backend, tmp_path):
+    settings = {"Orders": {"key": "id", "watermark": "modified"}, "Customers": {"key": ["region", "id"]}}
+    orders = pd.DataFrame({
+        "id": [1, 2, 3],
+        "modified": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03"]),
+        "amount": [1.0, 2.0, 3.0],
+    })
+    customers = pd.DataFrame({"region": ["A", "A", "B"], "id": [1, 2, 1], "name": ["x", "y", "z"]})
+    other = pd.DataFrame({"q": [1]})
+    state_dir = tmp_path / "state"
+
+    first = _load(backend, {"Orders": orders, "Customers": customers, "Other": other}, settings, state_dir)
+    assert first == {"Orders": 3, "Customers": 3, "Other": 1}
+    # nothing changed: only the row at the watermark is merged again, and
+    # tables without settings are reloaded
+    again = _load(backend, {"Orders": orders, "Customers": customers, "Other": other}, settings, state_dir)
+    assert again == {"Orders": 1, "Customers": 0, "Other": 1}
+
+    orders = pd.concat([orders[orders["id"] != 2], pd.DataFrame({
+        "id": [2, 4], "modified": pd.to_datetime(["2024-01-05", "2024-01-06"]), "amount": [9.0, 4.0],
+    })])
+    customers.loc[1, "name"] = "Y"
+    sent = _load(backend, {"Orders": orders, "Customers": customers}, settings, state_dir)
+    # the row at the saved watermark is merged again with the two newer ones
+    assert sent == {"Orders": 3, "Customers": 1}
+    assert [(row[0], row[2]) for row in _rows(backend, "Orders")] == [(1, 1.0), (2, 9.0), (3, 3.0), (4, 4.0)]
+    assert _rows(backend, "Customers") == [("A", 1, "x"), ("A", 2, "Y"), ("B", 1, "z")]
+
+
+def test_changed_columns_reload_the_table(backend, tmp_path):
+    settings = {"Events": {"watermark": "event_id"}}
+    events = pd.DataFrame({"event_id": [1, 2], "value": ["a", "b"]})
+    _load(backend, {"Events": events}, settings, tmp_path)
+    sent = _load(backend, {"Events": events.assign(extra=1)}, settings, tmp_path)
+    assert sent == {"Events": 2}
+    assert _rows(backend, "Events") == [(1, "a", 1), (2, "b", 1)]
+
+
+def test_failed_merge_leaves_the_table_as_it_was(backend, tmp_path, monkeypatch):
+    conn = backend.connect()
+    try:
+        df = pd.DataFrame({"id": [1, 2], "value": ["a", "b"]})
+        pasteToSql.upsert_table(conn, "Items", df, backend, key="id", state_dir=tmp_path)
+        # the delete runs, then the insert fails
+        monkeypatch.setattr(backend, "merge_sql", lambda *args: ['DELETE FROM "Items"', "INSERT INTO no_such_table VALUES (1)"])
+        changed = pd.DataFrame({"id": [1, 2], "value": ["A", "B"]})
+        with pytest.raises(Exception) as error:
+            pasteToSql.upsert_table(conn, "Items", changed, backend, key="id", state_dir=tmp_path)
+        assert "no_such_table" in str(error.value)
+    finally:
+        conn.close()
+    assert _rows(backend, "Items") == [(1, "a"), (2, "b")]
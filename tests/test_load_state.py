@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+import load_state
+
+
+def _hashes(df):
+    return load_state.row_hashes(df, ["id"])
+
+
+def test_changed_rows_marks_new_and_changed_rows():
+    previous = pd.DataFrame({"id": [1, 2, 3], "value": ["a", "b", "c"]})
+    current = pd.DataFrame({"id": [1, 2, 3, 4], "value": ["a", "B", "c", "d"]})
+    changed = load_state.changed_rows(_hashes(current), _hashes(previous))
+    assert changed.tolist() == [False, True, False, True]
+
+
+def test_changed_rows_ignores_row_order():
+    previous = pd.DataFrame({"id": [1, 2, 3], "value": ["a", "b", "c"]})
+    current = previous.iloc[::-1].reset_index(drop=True)
+    assert not load_state.changed_rows(_hashes(current), _hashes(previous)).any()
+
+
+def test_changed_rows_compares_with_the_last_row_of_a_repeated_key():
+    previous = pd.DataFrame({"id": [1, 1], "value": ["old", "new"]})
+    current = pd.DataFrame({"id": [1, 1], "value": ["new", "old"]})
+    assert load_state.changed_rows(_hashes(current), _hashes(previous)).tolist() == [False, True]
+
+
+def test_changed_rows_with_nothing_loaded_before():
+    current = pd.DataFrame({"id": [1, 2], "value": ["a", "b"]})
+    empty = (np.array([], dtype=np.uint64), np.array([], dtype=np.uint64))
+    assert load_state.changed_rows(_hashes(current), empty).all()
+
+
+def test_row_hashes_round_trip(tmp_path):
+    df = pd.DataFrame({"id": [1, 2], "value": ["a", "b"]})
+    load_state.save_row_hashes("table", _hashes(df), tmp_path)
+    keys, rows = load_state.load_row_hashes("table", tmp_path)
+    assert (keys == _hashes(df)[0]).all() and (rows == _hashes(df)[1]).all()
+    assert load_state.load_row_hashes("other", tmp_path) is None
+
+
+def test_table_state_round_trip_and_forget(tmp_path):
+    load_state.save_table_state("table", {"watermark": 3, "rows": 10}, tmp_path)
+    load_state.save_row_hashes("table", (np.array([1], dtype=np.uint64), np.array([2], dtype=np.uint64)), tmp_path)
+    assert load_state.load_table_state("table", tmp_path) == {"watermark": 3, "rows": 10}
+    load_state.save_table_state("table", None, tmp_path)
+    assert load_state.load_table_state("table", tmp_path) == {}
+    assert load_state.load_row_hashes("table", tmp_path) is None
+
+
+def test_watermark_json_round_trip():
+    series = pd.Series(pd.to_datetime(["2024-01-02 03:04:05"]))
+    saved = load_state.watermark_to_json(series.max())
+    assert saved == "2024-01-02T03:04:05"
+    assert load_state.watermark_from_json(saved, series) == series.max()
+    assert load_state.watermark_to_json(np.int64(7)) == 7
+    assert load_state.watermark_to_json(None) is None
@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+import pasteToSql
+from sql_backends import make_backend
+from sql_pool import ConnectionPool, load_tables_parallel
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return make_backend({"backend": "sqlite", "database": str(tmp_path / "load.db")})
+
+
+def _rows(backend, table_name):
+    conn = backend.connect()
+    try:
+        return conn.execute(f"SELECT * FROM {backend.quote(table_name)} ORDER BY 1").fetchall()
+    finally:
+        conn.close()
+
+
+def test_load_dataframes_parallel(backend):
+    tables = {
+        "Orders": pd.DataFrame({"id": [1, 2, 3], "amount": [1.5, 2.0, 3.25]}),
+        "Regions": lambda: pd.DataFrame({"name": ["East", "West"]}),
+        "Column_Metadata": pd.DataFrame({"Column": ["id"]}),
+    }
+    with ConnectionPool(backend.connect, 2) as pool:
+        results = pasteToSql.load_dataframes_parallel(tables, "Book", pool, backend)
+    assert [(r["status"], r["rows"]) for r in results] == [("ok", 3), ("ok", 2)]
+    orders = f"Book_{pasteToSql.encode_sheet_name('Orders')}"
+    assert _rows(backend, orders) == [(1, 1.5), (2, 2.0), (3, 3.25)]
+    # a second load replaces the table rather than appending to it
+    with ConnectionPool(backend.connect, 2) as pool:
+        pasteToSql.load_dataframes_parallel(tables, "Book", pool, backend)
+    assert len(_rows(backend, orders)) == 3
+
+
+def test_failed_table_is_retried_then_reported(backend):
+    attempts = []
+
+    def load_table(conn, table_name, df):
+        attempts.append(table_name)
+        if table_name == "Bad":
+            raise RuntimeError("boom")
+        return len(df)
+
+    tables = {"Good": pd.DataFrame({"a": [1]}), "Bad": pd.DataFrame({"a": [1, 2]})}
+    with ConnectionPool(backend.connect, 2) as pool:
+        results = load_tables_parallel(tables, load_table, pool, attempts=2, retry_delay=0)
+    assert [(r["table"], r["status"], r["attempts"]) for r in results] == [("Good", "ok", 1), ("Bad", "failed", 2)]
+    assert results[1]["error"] == "boom"
+    assert attempts.count("Bad") == 2
+
+
+def test_pool_never_opens_more_connections_than_its_size(backend):
+    opened = []
+
+    def connect():
+        opened.append(1)
+        return backend.connect()
+
+    tables = {f"T{i}": pd.DataFrame({"a": range(i + 1)}) for i in range(6)}
+    with ConnectionPool(connect, 2) as pool:
+        load_tables_parallel(tables, lambda conn, name, df: pasteToSql.replace_table(conn, name, df, backend), pool)
+    assert len(opened) <= 2
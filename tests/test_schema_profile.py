@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from schema_profile import profile_column, sql_server_type
+
+
+@pytest.mark.parametrize("values, expected", [
+    (pd.Series([None, None], dtype=object), "NVARCHAR(255)"),
+    (pd.Series([True, False]), "BIT"),
+    (pd.Series([0, 200]), "TINYINT"),
+    (pd.Series([-1, 200]), "SMALLINT"),
+    (pd.Series([0, 70000]), "INT"),
+    (pd.Series([0, 2 ** 40]), "BIGINT"),
+    # whole numbers stored as floats because of a missing value
+    (pd.Series([1.0, None, 3.0]), "TINYINT"),
+    (pd.Series([1.25, 10.5]), "DECIMAL(4, 2)"),
+    (pd.Series([np.pi, 1.0]), "FLOAT"),
+    (pd.Series([np.inf, 1.0]), "FLOAT"),
+    (pd.Series([1.5], dtype="float32"), "DECIMAL(2, 1)"),
+    (pd.Series(pd.to_datetime(["2024-01-01", "2024-02-01"])), "DATE"),
+    (pd.Series(pd.to_datetime(["2024-01-01 10:00:00", "2024-02-01 00:00:00"])), "DATETIME2(0)"),
+    (pd.Series(pd.to_datetime(["2024-01-01 10:00:00.123"])), "DATETIME2(3)"),
+    (pd.Series(pd.to_datetime(["2024-01-01 10:00:00.123456"])), "DATETIME2(7)"),
+    (pd.Series(pd.to_datetime(["2024-01-01 10:00:00"]).tz_localize("UTC")), "DATETIMEOFFSET(0)"),
+    (pd.Series(["abc", "defgh"]), "VARCHAR(8)"),
+    (pd.Series(["café"]), "NVARCHAR(4)"),
+    (pd.Series(["x" * 9000]), "VARCHAR(MAX)"),
+    (pd.Series(["é" * 5000]), "NVARCHAR(MAX)"),
+])
+def test_sql_server_type(values, expected):
+    assert sql_server_type(profile_column(values)) == expected
+
+
+def test_integers_out_of_bigint_range_become_decimal():
+    assert sql_server_type({"kind": "integer", "min": 0, "max": 2 ** 64}) == "DECIMAL(38, 0)"
+
+
+def test_float32_keeps_its_width():
+    assert sql_server_type(profile_column(pd.Series([np.float32(np.pi)]))) == "REAL"
+
+
+@pytest.mark.parametrize("values, expected", [
+    ([Decimal("12345678901234567890.12"), Decimal("-1.5"), None], "DECIMAL(22, 2)"),
+    ([Decimal("0.001"), Decimal("0.05")], "DECIMAL(3, 3)"),
+    ([Decimal("1.20E+3"), Decimal("7")], "DECIMAL(4, 0)"),
+    ([Decimal("1" * 30 + "." + "1" * 20)], "DECIMAL(38, 8)"),
+    ([Decimal("1" * 40)], "FLOAT"),
+    ([Decimal("Infinity"), Decimal("1.5")], "FLOAT"),
+])
+def test_decimal_values(values, expected):
+    assert sql_server_type(profile_column(pd.Series(values, dtype=object))) == expected
@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("tableauhyperapi")
+
+from dataset_automate import _stream_sheet
+
+
+def _stream(chunks, fields):
+    stats = {"applied": 0, "failed": 0, "total": 0}
+    sheet_heads = {}
+    return list(_stream_sheet("Sheet", iter(chunks), fields, "Sheet", stats, [], None, sheet_heads))
+
+
+def test_field_failing_on_a_later_chunk_keeps_column_order():
+    fields = {"A": {"formula": "[x] + 1"}, "B": {"formula": "[y] * 10"}}
+    chunks = [
+        pd.DataFrame({"x": [1, 2], "y": [1, 2]}),
+        # [x] + 1 fails on text, B still works
+        pd.DataFrame({"x": ["p", "q"], "y": [3, 4]}),
+    ]
+    first, second = _stream(chunks, fields)
+    assert list(second.columns) == list(first.columns) == ["x", "y", "A", "B"]
+    assert second["B"].tolist() == [30, 40]
+    assert second["A"].isna().all()
+    assert second["x"].tolist() == ["p", "q"]
+
+
+def test_field_depending_on_a_failed_one_is_left_empty():
+    fields = {"A": {"formula": "[x] + 1"}, "B": {"formula": "[A] * 10"}, "C": {"formula": "[y] * 2"}}
+    chunks = [
+        pd.DataFrame({"x": [1], "y": [1]}),
+        pd.DataFrame({"x": ["p"], "y": [5]}),
+    ]
+    first, second = _stream(chunks, fields)
+    assert list(second.columns) == list(first.columns)
+    assert first[["A", "B", "C"]].iloc[0].tolist() == [2, 20, 2]
+    assert second["C"].tolist() == [10]
+    assert second[["A", "B"]].isna().all().all()
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from tableau_dates import DATEDIFF, DATEPART
+
+STARTS = pd.Series(pd.to_datetime(["2024-01-01 10:15:30", "2024-03-02 08:00:00", None, "2024-12-31 23:59:59"]))
+ENDS = pd.Series(pd.to_datetime(["2024-01-01 11:14:29", "2024-03-05 09:30:00", "2024-06-01 00:00:00", "2025-01-01 00:00:01"]))
+
+
+def _values(result):
+    return [None if pd.isna(value) else value for value in result.tolist()]
+
+
+def test_weekday_counts_from_sunday():
+    # 2024-01-01 was a Monday, 2024-03-02 a Saturday, 2024-12-31 a Tuesday
+    assert _values(DATEPART("weekday", STARTS)) == [2, 7, None, 3]
+    assert DATEPART("weekday", pd.Timestamp("2024-01-07")) == 1
+
+
+@pytest.mark.parametrize("part, expected", [
+    ("day", [0, 3, None, 1]),
+    ("hour", [1, 73, None, 1]),
+    ("minute", [59, 4410, None, 1]),
+    ("second", [3539, 264600, None, 2]),
+])
+def test_datediff_counts_boundaries_crossed(part, expected):
+    result = _values(DATEDIFF(part, STARTS, ENDS))
+    assert result == expected
+    assert all(isinstance(value, int) or float(value).is_integer() for value in result if value is not None)
+
+
+@pytest.mark.parametrize("part", ["weekday", "year", "month", "day", "hour"])
+def test_datepart_row_wise_matches_column_wise(part):
+    column = _values(DATEPART(part, STARTS))
+    assert column == [None if pd.isna(ts) else DATEPART(part, ts) for ts in STARTS]
+
+
+@pytest.mark.parametrize("part", ["day", "hour", "minute", "second"])
+def test_datediff_row_wise_matches_column_wise(part):
+    column = _values(DATEDIFF(part, STARTS, ENDS))
+    row_wise = [None if pd.isna(start) else DATEDIFF(part, start, end) for start, end in zip(STARTS, ENDS)]
+    assert column == row_wise
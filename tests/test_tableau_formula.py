@@ -0,0 +1,26 @@
+import pytest
+
+from tableau_formula import compile_formula, resolve_references
+
+
+def test_references_include_if_and_case_conditions():
+    formula = "IF [Margin] > 0.5 THEN [x] ELSEIF [q] = 1 THEN 'a' ELSE [z] END"
+    assert compile_formula(formula).references == ("Margin", "x", "q", "z")
+    assert compile_formula("CASE [k] WHEN 'a' THEN [v] ELSE [w] END").references == ("k", "v", "w")
+
+
+def test_condition_fields_are_resolved_ignoring_case():
+    compiled = compile_formula("IF [margin] > 0.5 THEN 'y' ELSE 'n' END", ["Margin"])
+    assert "row['Margin']" in compiled.source
+
+
+@pytest.mark.parametrize("formula", ["FOO([x])", "STR_LEFT([x], 2)", "[x] + BAR()"])
+def test_unknown_functions_are_rejected(formula):
+    with pytest.raises(ValueError, match="unsupported function"):
+        compile_formula(formula)
+
+
+def test_resolve_references_prefers_the_exact_column():
+    assert resolve_references(["sales", "Cost", "Other"], ["Sales", "sales", "COST"]) == {
+        "sales": "sales", "Cost": "COST",
+    }
@@ -45,14 +45,176 @@
 
 import pandas as pd
 import os
+import re
+import xlsxwriter
+from concurrent.futures import ProcessPoolExecutor
 
-def write_dataframes_to_excel(dataframes_dict, output_path):
+HEADER_COLOR = '#D7E4BC'
+MAX_COLUMN_WIDTH = 50
+
+# Excel's row limit; one row of every sheet holds the header
+EXCEL_MAX_ROWS = 1_048_576
+MAX_DATA_ROWS = EXCEL_MAX_ROWS - 1
+
+# Constant-memory mode: rows converted to Python values at a time, and rows
+# sampled from each such batch to size the columns
+WRITE_BATCH_ROWS = 50_000
+AUTOFIT_SAMPLE_ROWS = 1_000
+
+def safe_sheet_name_for(sheet_name, taken):
+    """
+    Excel-safe, unique sheet name for sheet_name, given the names already in use.
+    """
+    # Excel sheet names have a 31 character limit
+    # Replace invalid characters and truncate if necessary
+    safe_sheet_name = str(sheet_name).replace('/', '_').replace('\\', '_').replace('*', '_').replace('?', '_').replace('[', '_').replace(']', '_').replace(':', '_')
+    if len(safe_sheet_name) > 31:
+        safe_sheet_name = safe_sheet_name[:30] + '~'
+    
+    # Check for duplicate sheet names
+    if safe_sheet_name in taken:
+        # Add a suffix to make it unique
+        base_name = safe_sheet_name[:27] if len(safe_sheet_name) > 27 else safe_sheet_name
+        suffix = 1
+        while f"{base_name}_{suffix}" in taken:
+            suffix += 1
+        safe_sheet_name = f"{base_name}_{suffix}"
+    return safe_sheet_name
+
+def part_sheet_name(sheet_name, part):
+    """
+    Name of the part-th continuation sheet (0 = the sheet itself) of a table
+    too long for one sheet: 'Sales', 'Sales (2)', 'Sales (3)', ...
+    """
+    if part == 0:
+        return sheet_name
+    suffix = f" ({part + 1})"
+    return sheet_name[:31 - len(suffix)] + suffix
+
+def iter_sheet_parts(chunks, max_rows=MAX_DATA_ROWS):
+    """
+    Yields (part, chunk) pairs, cutting chunks so that no part holds more
+    than max_rows rows. Part 0 goes on the sheet itself, part n on
+    part_sheet_name(sheet, n).
+    """
+    part, rows_in_part = 0, 0
+    for df in chunks:
+        if df.empty:
+            yield part, df
+            continue
+        start = 0
+        while start < len(df):
+            if rows_in_part == max_rows:
+                part, rows_in_part = part + 1, 0
+            take = min(len(df) - start, max_rows - rows_in_part)
+            yield part, df.iloc[start:start + take]
+            rows_in_part += take
+            start += take
+
+def _iter_batches(chunks, batch_rows):
+    # Splits DataFrames (or chunks) into row slices of at most batch_rows
+    for df in chunks:
+        if df.empty:
+            yield df
+        for start in range(0, len(df), batch_rows):
+            yield df.iloc[start:start + batch_rows]
+
+def _column_widths(df, sample_rows=None):
+    """
+    Display length of the widest value per column, computed vectorized over
+    all rows or estimated from at most sample_rows evenly spaced rows (plus the
+    exact min/max of numeric columns).
+    """
+    sample = df if sample_rows is None else df.iloc[::max(1, len(df) // sample_rows)].head(sample_rows)
+    widths = []
+    for col in df.columns:
+        width = sample[col].astype(str).str.len().max() if len(sample) else 0
+        values = df[col]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values) and values.notna().any():
+            width = max(width, len(str(values.min())), len(str(values.max())))
+        widths.append(int(width) if pd.notna(width) else 0)
+    return widths
+
+def _excel_rows(df):
+    # Row tuples of plain Python values; missing values become blank cells
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+def _write_constant_memory(dataframes_dict, output_path, name_map, part_names=None):
+    """
+    Streaming variant of write_dataframes_to_excel: xlsxwriter's constant_memory
+    mode flushes each row to disk as soon as the next one starts, so rows are
+    written strictly in order, batch by batch, and memory stays flat however
+    long the sheets are. Column widths come from running maxima over sampled
+    rows of each batch instead of every value.
+    """
+    workbook = xlsxwriter.Workbook(output_path, {
+        'constant_memory': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+    })
+    try:
+        header_format = workbook.add_format({
+            'bold': True,
+            'fg_color': HEADER_COLOR,
+            'border': 1
+        })
+        sheet_names = []
+        
+        for sheet_name, data in dataframes_dict.items():
+            safe_sheet_name = safe_sheet_name_for(sheet_name, sheet_names)
+            chunks = [data] if isinstance(data, pd.DataFrame) else data
+            parts = []  # [worksheet, name, max_lens, row_count] per sheet of this table
+            for part, df in iter_sheet_parts(_iter_batches(chunks, WRITE_BATCH_ROWS)):
+                if part == len(parts):
+                    # first rows of the table, or it outgrew the previous sheet
+                    taken = sheet_names + [safe_sheet_name] + [p[1] for p in parts]
+                    name = safe_sheet_name if part == 0 else safe_sheet_name_for(part_sheet_name(safe_sheet_name, part), taken)
+                    worksheet = workbook.add_worksheet(name)
+                    columns = list(df.columns)
+                    worksheet.write_row(0, 0, [str(col) for col in columns], header_format)
+                    parts.append([worksheet, name, [len(str(col)) for col in columns], 0])
+                current = parts[part]
+                for values in _excel_rows(df):
+                    current[3] += 1
+                    current[0].write_row(current[3], 0, values)
+                if not df.empty:
+                    current[2] = [max(a, b) for a, b in zip(current[2], _column_widths(df, AUTOFIT_SAMPLE_ROWS))]
+
+            if not parts:
+                print(f"⚠ Sheet '{safe_sheet_name}' has no data. Skipping...")
+                continue
+            if name_map is not None:
+                name_map[sheet_name] = safe_sheet_name
+            if part_names is not None:
+                part_names[sheet_name] = [p[1] for p in parts[1:]]
+            
+            for worksheet, name, max_lens, row_count in parts:
+                sheet_names.append(name)
+                # Auto-fit columns (widths are stored apart from the flushed rows)
+                for col_num, max_len in enumerate(max_lens):
+                    worksheet.set_column(col_num, col_num, min(max_len + 2, MAX_COLUMN_WIDTH))
+                print(f"✅ Written sheet '{name}' with {row_count} rows and {len(columns)} columns to Excel.")
+    finally:
+        workbook.close()
+    return sheet_names
+
+def write_dataframes_to_excel(dataframes_dict, output_path, name_map=None, constant_memory=False, part_names=None):
     """
     Writes multiple DataFrames to a single Excel file with improved formatting.
     
     Args:
-        dataframes_dict: Dictionary mapping sheet_name to DataFrame.
+        dataframes_dict: Dictionary mapping sheet_name to a DataFrame, or to an
+            iterable of DataFrame chunks with the same columns (streaming mode).
+            Chunks are consumed one sheet at a time, in dictionary order.
+            Tables longer than Excel's row limit continue on numbered sheets
+            ('Sales (2)', ...) instead of failing.
         output_path: Path where the Excel file will be saved.
+        name_map: Optional dict that receives sheet_name -> Excel sheet name
+            (of its first sheet) for every table written.
+        constant_memory: Stream rows to disk in xlsxwriter's constant_memory
+            mode with sampled autofit (see _write_constant_memory), so memory
+            does not grow with the size of the sheets.
+        part_names: Optional dict that receives sheet_name -> names of its
+            continuation sheets (empty for tables that fit on one sheet).
         
     Returns:
         List of sheet names that were written.
@@ -62,58 +224,74 @@ def write_dataframes_to_excel(dataframes_dict, output_path):
         print("❌ No data to write to Excel.")
         return []
     
+    if constant_memory:
+        try:
+            sheet_names = _write_constant_memory(dataframes_dict, output_path, name_map, part_names)
+            print(f"✅ Data written and formatted in Excel file: {output_path}")
+            return sheet_names
+        except Exception as e:
+            print(f"❌ Error writing to Excel: {e}")
+            return []
+    
     # Create a Pandas Excel writer using XlsxWriter as the engine
     try:
         writer = pd.ExcelWriter(output_path, engine='xlsxwriter')
         sheet_names = []
         
-        for sheet_name, df in dataframes_dict.items():
-            # Excel sheet names have a 31 character limit
-            # Replace invalid characters and truncate if necessary
-            safe_sheet_name = str(sheet_name).replace('/', '_').replace('\\', '_').replace('*', '_').replace('?', '_').replace('[', '_').replace(']', '_').replace(':', '_')
-            if len(safe_sheet_name) > 31:
-                safe_sheet_name = safe_sheet_name[:30] + '~'
-            
-            # Check for duplicate sheet names
-            if safe_sheet_name in sheet_names:
-                # Add a suffix to make it unique
-                base_name = safe_sheet_name[:27] if len(safe_sheet_name) > 27 else safe_sheet_name
-                suffix = 1
-                while f"{base_name}_{suffix}" in sheet_names:
-                    suffix += 1
-                safe_sheet_name = f"{base_name}_{suffix}"
-            
-            # Write the DataFrame to Excel
-            df.to_excel(writer, sheet_name=safe_sheet_name, index=False)
-            sheet_names.append(safe_sheet_name)
+        for sheet_name, data in dataframes_dict.items():
+            safe_sheet_name = safe_sheet_name_for(sheet_name, sheet_names)
+            chunks = [data] if isinstance(data, pd.DataFrame) else data
+            columns = None
+            parts = []  # [name, max_lens, row_count] per sheet of this table
+            for part, df in iter_sheet_parts(chunks):
+                # Write the DataFrame (or chunk) to Excel below the rows already written;
+                # a table longer than Excel's row limit continues on numbered sheets
+                if part == len(parts):
+                    taken = sheet_names + [safe_sheet_name] + [p[0] for p in parts]
+                    name = safe_sheet_name if part == 0 else safe_sheet_name_for(part_sheet_name(safe_sheet_name, part), taken)
+                    df.to_excel(writer, sheet_name=name, index=False)
+                    columns = list(df.columns)
+                    parts.append([name, [len(str(col)) for col in columns], 0])
+                else:
+                    df.to_excel(writer, sheet_name=parts[part][0], index=False, header=False, startrow=parts[part][2] + 1)
+                parts[part][2] += len(df)
+
+                # Track the maximum length of column data across chunks
+                if not df.empty:
+                    parts[part][1] = [max(a, b) for a, b in zip(parts[part][1], _column_widths(df))]
+
+            if columns is None:
+                print(f"⚠ Sheet '{safe_sheet_name}' has no data. Skipping...")
+                continue
+            if name_map is not None:
+                name_map[sheet_name] = safe_sheet_name
+            if part_names is not None:
+                part_names[sheet_name] = [p[0] for p in parts[1:]]
             
-            # Get the xlsxwriter workbook and worksheet objects
+            # Get the xlsxwriter workbook object
             workbook = writer.book
-            worksheet = writer.sheets[safe_sheet_name]
             
             # Add a header format
             header_format = workbook.add_format({
                 'bold': True,
-                'fg_color': '#D7E4BC',
+                'fg_color': HEADER_COLOR,
                 'border': 1
             })
             
-            # Format the header row
-            for col_num, value in enumerate(df.columns.values):
-                worksheet.write(0, col_num, value, header_format)
-            
-            # Auto-fit columns
-            for col_num, col in enumerate(df.columns):
-                # Find maximum length of column data
-                max_len = max(
-                    df[col].astype(str).map(len).max(),
-                    len(str(col))
-                ) + 2  # Add a little extra space
+            for name, max_lens, row_count in parts:
+                sheet_names.append(name)
+                worksheet = writer.sheets[name]
                 
-                # Set column width to a maximum of 50 characters
-                worksheet.set_column(col_num, col_num, min(max_len, 50))
-            
-            print(f"✅ Written sheet '{safe_sheet_name}' with {len(df)} rows and {len(df.columns)} columns to Excel.")
+                # Format the header row
+                for col_num, value in enumerate(columns):
+                    worksheet.write(0, col_num, value, header_format)
+                
+                # Auto-fit columns
+                for col_num, max_len in enumerate(max_lens):
+                    # Set column width to a maximum of 50 characters
+                    worksheet.set_column(col_num, col_num, min(max_len + 2, MAX_COLUMN_WIDTH))  # Add a little extra space
+                
+                print(f"✅ Written sheet '{name}' with {row_count} rows and {len(columns)} columns to Excel.")
         
         # Save the Excel file
         writer.close()
@@ -122,4 +300,179 @@ def write_dataframes_to_excel(dataframes_dict, output_path):
         
     except Exception as e:
         print(f"❌ Error writing to Excel: {e}")
-        return []
\ No newline at end of file
+        return []
+
+
+def sheet_file_name(safe_sheet_name, taken):
+    """
+    File name (unique case-insensitively among taken) of the per-sheet workbook
+    holding safe_sheet_name; characters Excel allows in sheet names but file
+    systems do not are replaced.
+    """
+    stem = re.sub(r'[<>|"]', '_', safe_sheet_name).strip() or "sheet"
+    name, suffix = stem, 1
+    while f"{name}.xlsx".lower() in {t.lower() for t in taken}:
+        name = f"{stem}_{suffix}"
+        suffix += 1
+    return f"{name}.xlsx"
+
+def _write_sheet_workbook(sheet_name, data, path, constant_memory):
+    # Runs in a pool process: one workbook holding one table (and its continuation sheets)
+    return write_dataframes_to_excel({sheet_name: data}, path, constant_memory=constant_memory)
+
+def write_sheets_parallel(dataframes_dict, output_dir, name_map=None, max_workers=None, constant_memory=False):
+    """
+    Parallel variant of write_dataframes_to_excel: every table goes to its own
+    workbook in output_dir, rendered by a worker process, so the sheets are
+    serialized and zipped on all cores at once.
+
+    Sheet names are sanitized and de-duplicated across all tables exactly as in
+    the single workbook, and each file holds a sheet of that name, so readers
+    that go by sheet names (pasteToSql, MSriptConverter) find the same tables.
+    Tables given as chunk iterables are streamed from a live Hyper connection,
+    which cannot be handed to another process; they are written here while
+    the pool works on the others.
+
+    Args:
+        dataframes_dict: Dictionary mapping sheet_name to a DataFrame or an
+            iterable of DataFrame chunks (see write_dataframes_to_excel).
+        output_dir: Directory receiving one .xlsx file per table.
+        name_map: Optional dict that receives sheet_name -> file name for every
+            table written; tables already in it keep their file.
+        max_workers: Number of worker processes (None: one per CPU).
+        constant_memory: Passed on to write_dataframes_to_excel.
+    Returns:
+        List of file names that were written.
+    """
+    if not dataframes_dict:
+        print("❌ No data to write to Excel.")
+        return []
+    os.makedirs(output_dir, exist_ok=True)
+
+    sheet_names, files = [], {}
+    taken_files = list(name_map.values()) if name_map is not None else []
+    for sheet_name in dataframes_dict:
+        safe_sheet_name = safe_sheet_name_for(sheet_name, sheet_names)
+        sheet_names.append(safe_sheet_name)
+        if name_map is not None and sheet_name in name_map:
+            file_name = name_map[sheet_name]
+        else:
+            file_name = sheet_file_name(safe_sheet_name, taken_files)
+            taken_files.append(file_name)
+        files[sheet_name] = (safe_sheet_name, file_name)
+
+    frames = [sheet_name for sheet_name, data in dataframes_dict.items() if isinstance(data, pd.DataFrame)]
+    if len(frames) < 2 or (max_workers or os.cpu_count() or 1) < 2:
+        # nothing to overlap; skip the cost of starting workers and pickling frames
+        frames = []
+
+    written = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            sheet_name: pool.submit(
+                _write_sheet_workbook, files[sheet_name][0], dataframes_dict[sheet_name],
+                os.path.join(output_dir, files[sheet_name][1]), constant_memory,
+            )
+            for sheet_name in frames
+        }
+        for sheet_name, data in dataframes_dict.items():
+            if sheet_name not in futures and _write_sheet_workbook(
+                    files[sheet_name][0], data, os.path.join(output_dir, files[sheet_name][1]), constant_memory):
+                written.append(sheet_name)
+        for sheet_name, future in futures.items():
+            try:
+                if future.result():
+                    written.append(sheet_name)
+            except Exception as e:
+                print(f"❌ Error writing sheet '{sheet_name}' in worker process: {e}")
+
+    written = [sheet_name for sheet_name in dataframes_dict if sheet_name in written]
+    if name_map is not None:
+        name_map.update((sheet_name, files[sheet_name][1]) for sheet_name in written)
+    print(f"✅ {len(written)} of {len(dataframes_dict)} sheets written to {output_dir}")
+    return [files[sheet_name][1] for sheet_name in written]
+
+
+def patch_excel_sheets(dataframes_dict, output_path, name_map, remove=(), part_names=None):
+    """
+    Updates an existing workbook: rewrites the given sheets, adds new ones and
+    deletes removed ones, carrying the other sheets over as they are.
+
+    openpyxl loads the whole workbook and saves all of it again, so the file is
+    rewritten in full either way, and for large workbooks this is slower than a
+    fresh write. What a patch saves is recomputing the unchanged sheets.
+
+    Args:
+        dataframes_dict: Dictionary mapping sheet_name to the DataFrame to (re)write.
+        output_path: Existing Excel file written by write_dataframes_to_excel.
+        name_map: dict of sheet_name -> Excel sheet name for the sheets already in
+            the workbook; updated with the names of added sheets and without removed ones.
+        remove: Sheet names to delete from the workbook.
+        part_names: dict of sheet_name -> continuation sheet names of the
+            tables already in the workbook (see write_dataframes_to_excel);
+            only these are deleted with their table, and it is updated with
+            the continuation sheets written.
+        
+    Returns:
+        List of Excel sheet names that were written.
+    """
+    from openpyxl.styles import Border, Font, PatternFill, Side
+    from openpyxl.utils import get_column_letter
+
+    header_font = Font(bold=True)
+    header_fill = PatternFill(fill_type='solid', fgColor=HEADER_COLOR.lstrip('#'))
+    thin = Side(style='thin')
+    header_border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    try:
+        written = []
+        with pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
+            book = writer.book
+
+            parts_written = {} if part_names is None else part_names
+
+            def drop_continuations(sheet_name):
+                # numbered sheets holding the rest of a table over the row limit
+                for name in parts_written.pop(sheet_name, []):
+                    if name in book.sheetnames:
+                        del book[name]
+
+            for sheet_name in remove:
+                excel_name = name_map.pop(sheet_name, None)
+                drop_continuations(sheet_name)
+                if excel_name in book.sheetnames:
+                    del book[excel_name]
+                    print(f"🗑 Removed sheet '{excel_name}' from Excel.")
+
+            for sheet_name, table in dataframes_dict.items():
+                if sheet_name not in name_map:
+                    name_map[sheet_name] = safe_sheet_name_for(sheet_name, book.sheetnames)
+                drop_continuations(sheet_name)
+                parts_written[sheet_name] = []
+                for part, df in iter_sheet_parts([table]):
+                    safe_sheet_name = name_map[sheet_name]
+                    if part:
+                        safe_sheet_name = safe_sheet_name_for(part_sheet_name(safe_sheet_name, part), book.sheetnames)
+                        parts_written[sheet_name].append(safe_sheet_name)
+                    df.to_excel(writer, sheet_name=safe_sheet_name, index=False)
+                    worksheet = writer.sheets[safe_sheet_name]
+
+                    # Same header format and column widths as write_dataframes_to_excel
+                    widths = _column_widths(df)
+                    for col_num, col in enumerate(df.columns, start=1):
+                        cell = worksheet.cell(row=1, column=col_num)
+                        cell.font, cell.fill, cell.border = header_font, header_fill, header_border
+                        max_len = max(len(str(col)), widths[col_num - 1])
+                        worksheet.column_dimensions[get_column_letter(col_num)].width = min(max_len + 2, MAX_COLUMN_WIDTH)
+                    written.append(safe_sheet_name)
+                    print(f"✅ Rewrote sheet '{safe_sheet_name}' with {len(df)} rows and {len(df.columns)} columns in Excel.")
+
+            # Keep Column_Metadata as the last sheet
+            if 'Column_Metadata' in book.sheetnames:
+                metadata_sheet = book['Column_Metadata']
+                book.move_sheet(metadata_sheet, offset=len(book.sheetnames) - 1 - book.index(metadata_sheet))
+        print(f"✅ Patched {len(written)} sheets in Excel file (file rewritten in full): {output_path}")
+        return written
+        
+    except Exception as e:
+        print(f"❌ Error patching Excel file: {e}")
+        return []